@@ -0,0 +1,76 @@
+"""
+Micro-benchmark: streaming DOCX extractor vs. the python-docx object model
+that extract_text used to build.
+
+    python benchmarks/bench_docx.py [--paragraphs N] [--tables N] [--repeat R]
+"""
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import docx  # noqa: E402
+from docx_extraction import extract_docx  # noqa: E402
+
+def object_model(path):
+    # Paragraphs only: tables, headers and footers were never read
+    document = docx.Document(path)
+    return "\n".join(para.text for para in document.paragraphs)
+
+def streaming(path):
+    return extract_docx(None, path)["text"]
+
+def build(path, paragraphs: int, tables: int):
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "ACME Bank - Statement"
+    per_table = max(1, paragraphs // max(1, tables))
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            document.add_heading(f"Section {i // 50 + 1}", level=1)
+        document.add_paragraph(f"Paragraph {i}: the parties acknowledge the terms set out herein.")
+        if tables and i % per_table == 0:
+            table = document.add_table(rows=10, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"r{r}c{c}"
+    document.save(path)
+
+def measure(repeat, fn, path):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(path)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    text = fn(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, len(text)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "large.docx"
+        build(path, args.paragraphs, args.tables)
+        print(f"document: {path.stat().st_size / 1e6:.2f} MB, {args.paragraphs} paragraphs, "
+              f"{args.tables} tables")
+        print(f"{'engine':<14}{'seconds':>10}{'peak MB':>10}{'chars':>12}")
+        results = {}
+        for name, fn in (("python-docx", object_model), ("streaming", streaming)):
+            seconds, peak, chars = results[name] = measure(args.repeat, fn, path)
+            print(f"{name:<14}{seconds:>10.3f}{peak / 1e6:>10.1f}{chars:>12}")
+        print(f"speed-up: {results['python-docx'][0] / results['streaming'][0]:.1f}x, "
+              f"memory: {results['python-docx'][1] / results['streaming'][1]:.1f}x less")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+End-to-end benchmark suite: extraction for every document kind, and
+summarize / risk / schema validation for every template, rubric and schema
+in configs/, on a synthetic corpus.
+
+    python benchmarks/bench_suite.py [--docs N] [--pages N] [--kinds txt,docx,pdf,image]
+                                     [--repeat R] [--json results.json]
+                                     [--save-baseline baseline.json]
+                                     [--baseline baseline.json] [--tolerance 0.2]
+
+Each group of cases runs in a fresh process, so the peak RSS reported is
+that group's own. With --baseline the run exits with status 1 when any case
+is slower, or uses more memory, than the baseline by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+def _setup():
+    import config_loader
+    config_loader.CONFIG_DIR = str(ROOT / "configs")
+    return config_loader
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _case(seconds: float, items: int, unit: str) -> dict:
+    return {"seconds": round(seconds, 4), "items": items, "unit": unit,
+            "throughput": round(items / seconds, 2) if seconds > 0 else None}
+
+def _timed(repeat: int, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def _texts(storage_dir, names):
+    from document_processor import DocumentProcessor
+    processor = DocumentProcessor(storage_dir, pdf_workers=1, ocr_workers=1)
+    return {name: processor.extract_text(name) for name in names}
+
+# --- Groups: each runs in its own process and returns {case: result} ---
+
+def group_extract(kind, storage_dir, docs, repeat):
+    _setup()
+    from document_processor import DocumentProcessor
+    names = [name for name, _, _ in docs]
+    pages = sum(p for _, _, p in docs)
+    shutil.rmtree(Path(storage_dir) / ".idp", ignore_errors=True)
+    processor = DocumentProcessor(storage_dir, pdf_workers=1, ocr_workers=1)
+    started = time.perf_counter()
+    for name in names:
+        text = processor.extract_text(name)
+        if text.startswith("Error"):
+            raise RuntimeError(text)
+    cold = time.perf_counter() - started
+    warm = _timed(repeat, lambda: [processor.extract_text(name) for name in names])
+    return {
+        f"extract_text/{kind}/cold": _case(cold, pages, "pages/s"),
+        f"extract_text/{kind}/cached": _case(warm, pages, "pages/s"),
+    }
+
+def group_summarize(storage_dir, docs, repeat):
+    config_loader = _setup()
+    from analysis import summarize_text
+    texts = _texts(storage_dir, [name for name, _, _ in docs])
+    results = {}
+    for template in config_loader.get_templates():
+        template_id = template["template_id"]
+        own = [(name, texts[name]) for name, t, _ in docs if t == template_id]
+        seconds = _timed(repeat, lambda: [summarize_text(n, text, template_id) for n, text in own])
+        results[f"summarize_sections/{template_id}"] = _case(seconds, len(own), "docs/s")
+    return results
+
+def group_risks(storage_dir, docs, repeat):
+    config_loader = _setup()
+    from analysis import assess_risks
+    texts = _texts(storage_dir, [name for name, _, _ in docs])
+    results = {}
+    for rubric in config_loader.get_rubrics():
+        rubric_id = rubric["rubric_id"]
+        seconds = _timed(repeat, lambda: [assess_risks(n, text, rubric_id) for n, text in texts.items()])
+        results[f"identify_risks/{rubric_id}"] = _case(seconds, len(texts), "docs/s")
+    return results
+
+def group_validate(storage_dir, docs, repeat):
+    _setup()
+    os.environ["DATA_PATH"] = str(storage_dir)
+    from analysis import summarize_text
+    from server import validate_output
+    texts = _texts(storage_dir, [name for name, _, _ in docs])
+    outputs = [summarize_text(name, texts[name], template_id) for name, template_id, _ in docs]
+    results = {}
+    for schema in sorted(p.stem for p in (ROOT / "configs" / "schemas").glob("*.json")):
+        seconds = _timed(repeat, lambda: [validate_output(dict(o), schema) for o in outputs])
+        results[f"validate_output/{schema}"] = _case(seconds, len(outputs), "docs/s")
+    return results
+
+def _run_group(queue, fn, args):
+    try:
+        results = fn(*args)
+        peak = round(_peak_rss_mb(), 1)
+        for result in results.values():
+            result["peak_rss_mb"] = peak
+        queue.put(results)
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+def run_group(fn, *args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_group, args=(queue, fn, args))
+    process.start()
+    results = queue.get()
+    process.join()
+    return results
+
+def tesseract_available() -> bool:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+# Cases faster than this are timer noise and are not compared.
+MIN_COMPARABLE_SECONDS = 0.005
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Names of cases that regressed in throughput or peak RSS beyond the tolerance."""
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if not base or not result.get("throughput") or not base.get("throughput"):
+            continue
+        if max(result["seconds"], base["seconds"]) < MIN_COMPARABLE_SECONDS:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{case}: throughput {result['throughput']} < baseline {base['throughput']}")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{case}: peak RSS {result['peak_rss_mb']} MB > baseline {base['peak_rss_mb']} MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=2, help="documents per template and kind")
+    parser.add_argument("--pages", type=int, default=5, help="pages per document")
+    parser.add_argument("--kinds", default="txt,docx,pdf,image")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--corpus", help="directory to keep the generated corpus in")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--baseline", help="compare against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    config_loader = _setup()
+    from corpus import generate
+    kinds = [k for k in args.kinds.split(",") if k]
+    if "image" in kinds and not tesseract_available():
+        print("tesseract not installed: skipping image extraction")
+        kinds.remove("image")
+
+    corpus_dir = Path(args.corpus or tempfile.mkdtemp(prefix="idp-bench-"))
+    corpus = generate(corpus_dir, config_loader.get_templates(), config_loader.get_rubrics(),
+                      kinds + ([] if "txt" in kinds else ["txt"]), args.docs, args.pages, args.seed)
+    total_mb = sum(f.stat().st_size for f in corpus_dir.rglob("*") if f.is_file()) / 1e6
+    print(f"corpus: {corpus_dir} ({total_mb:.1f} MB, {args.docs} docs x {args.pages} pages per template)")
+
+    results = {}
+    errors = {}
+    groups = [(f"extract/{kind}", group_extract, kind, str(corpus_dir / kind), corpus[kind], args.repeat)
+              for kind in kinds]
+    txt = (str(corpus_dir / "txt"), corpus["txt"], args.repeat)
+    groups += [("summarize", group_summarize, *txt), ("risks", group_risks, *txt),
+               ("validate", group_validate, *txt)]
+    for label, fn, *group_args in groups:
+        outcome = run_group(fn, *group_args)
+        if "error" in outcome:
+            errors[label] = outcome["error"]
+            print(f"{label}: FAILED {outcome['error']}")
+        else:
+            results.update(outcome)
+
+    print(f"{'case':<48}{'seconds':>10}{'throughput':>16}{'peak RSS MB':>13}")
+    for case, r in results.items():
+        print(f"{case:<48}{r['seconds']:>10.3f}{r['throughput'] or 0:>10.1f} {r['unit']:<6}{r['peak_rss_mb']:>12.1f}")
+
+    report = {"args": vars(args), "results": results, "errors": errors}
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+        print(f"baseline saved to {args.save_baseline}")
+    if not args.corpus:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    failed = bool(errors)
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Synthetic document corpora for the benchmarks, generated offline from the
+templates and rubrics in configs/.
+
+Every document is built from one template: each page carries the template's
+section keywords as headings, a "Label: value" line for each extraction
+rule, filler prose, and now and then a rubric indicator, so every engine has
+real work to do. The same seed always produces the same corpus.
+"""
+import random
+from pathlib import Path
+
+KINDS = ("txt", "docx", "pdf", "image")
+EXTENSIONS = {"txt": ".txt", "docx": ".docx", "pdf": ".pdf", "image": ".png"}
+
+LINES_PER_PAGE = 40
+WORDS = (
+    "agreement party term payment schedule notice period record review account balance "
+    "statement report section clause provision obligation delivery service client provider "
+    "history summary details amount date reference number total annual monthly"
+).split()
+
+def _labels(template):
+    from rule_engine import _literal_labels
+    labels = []
+    for rule in template.get("extraction_rules", []):
+        found = _literal_labels(rule.get("pattern", ""))
+        labels.append((found[0] if found else rule["field"].replace("_", " ")).strip().title())
+    return labels
+
+def _value(rng):
+    if rng.random() < 0.3:
+        return f"{rng.randint(1000, 999999):,}"
+    return " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 3)))
+
+def page_texts(template, indicators, rng, pages: int):
+    """The pages of one synthetic document for `template`."""
+    keywords = [k for s in template.get("sections", []) for k in s.get("keywords", [])[:1]]
+    labels = _labels(template)
+    result = []
+    for _ in range(pages):
+        lines = []
+        for keyword in keywords:
+            lines.append(f"{keyword}:")
+            lines.extend(f"{label} {_value(rng)}" if label.endswith(":") else f"{label}: {_value(rng)}"
+                         for label in rng.sample(labels, min(len(labels), 2)))
+            lines.append("")
+        while len(lines) < LINES_PER_PAGE:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 14))]
+            if indicators and rng.random() < 0.25:
+                words.insert(rng.randrange(len(words)), rng.choice(indicators))
+            lines.append(" ".join(words).capitalize() + ".")
+        result.append("\n".join(lines[:LINES_PER_PAGE]))
+    return result
+
+def _pdf(pages):
+    """A PDF with one Helvetica text line per line of each page."""
+    def escape(line):
+        return line.encode("latin-1", "replace").decode("latin-1") \
+            .replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        body = " T* ".join(f"({escape(line)}) Tj" for line in page.split("\n"))
+        stream = f"BT /F1 10 Tf 12 TL 40 760 Td {body} ET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+def _write(kind: str, path: Path, pages):
+    if kind == "txt":
+        path.write_text("\n".join(pages) + "\n", encoding="utf-8")
+    elif kind == "pdf":
+        path.write_bytes(_pdf(pages))
+    elif kind == "docx":
+        import docx
+        document = docx.Document()
+        for page in pages:
+            for line in page.split("\n"):
+                document.add_paragraph(line)
+        document.save(path)
+    elif kind == "image":
+        # A scanned first page; OCR cost grows with pixels, not page count
+        from PIL import Image, ImageDraw
+        lines = pages[0].split("\n")
+        image = Image.new("L", (1275, 24 * len(lines) + 100), 255)
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(lines):
+            draw.text((50, 50 + 24 * i), line, fill=0)
+        image.save(path)
+
+def generate(out_dir, templates, rubrics, kinds=KINDS, docs_per_template: int = 2,
+             pages: int = 5, seed: int = 1234):
+    """
+    Write the corpus to out_dir/<kind>/ and return {kind: [(name, template_id, pages)]}.
+    """
+    out_dir = Path(out_dir)
+    indicators = sorted({i for r in rubrics for c in r.get("criteria", []) for i in c.get("indicators") or []})
+    corpus = {}
+    for kind in kinds:
+        rng = random.Random(seed)
+        kind_dir = out_dir / kind
+        kind_dir.mkdir(parents=True, exist_ok=True)
+        corpus[kind] = []
+        for template in templates:
+            for i in range(docs_per_template):
+                texts = page_texts(template, indicators, rng, pages)
+                name = f"{template['template_id']}_{i}{EXTENSIONS[kind]}"
+                _write(kind, kind_dir / name, texts)
+                corpus[kind].append((name, template["template_id"], 1 if kind == "image" else pages))
+    return corpus
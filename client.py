@@ -3,34 +3,167 @@
 
 import asyncio
 import os
+import json
 import base64
+import hashlib
+import itertools
 from google import genai
 from google.genai import types
 from fastmcp import Client
 
 REMOTE_SERVER_URL = "http://localhost:8000/mcp"
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_RETRIES = 3
+
+# Tool calls Gemini makes in one turn run concurrently, at most this many at a time.
+TOOL_CONCURRENCY = int(os.environ.get("CLIENT_TOOL_CONCURRENCY", "4"))
+# Characters of a tool result sent back in the turn it was produced...
+RESULT_MAX_CHARS = int(os.environ.get("CLIENT_RESULT_MAX_CHARS", "20000"))
+# ...and kept in the history once Gemini has answered it, so the prompt does
+# not grow with every document extracted.
+RESULT_SNIPPET_CHARS = int(os.environ.get("CLIENT_RESULT_SNIPPET_CHARS", "500"))
+# Tools that change what later calls return. A turn calling one runs its calls
+# in order, and the session's result cache is emptied.
+MUTATING_TOOLS = {"upload_document", "begin_upload", "upload_chunk", "commit_upload",
+                  "rebuild_search_index"}
+# Tools reporting progress that changes on its own; always called afresh.
+UNCACHED_TOOLS = {"document_status"}
+
+def result_text(result):
+    return result.content[0].text if result.content else ""
+
+def shortened(text: str, limit: int, ref: int, tool_name: str, tool_args: dict) -> str:
+    """`text` cut to `limit` characters, saying how to get the rest back."""
+    if len(text) <= limit:
+        return text
+    if tool_name == "extract_document":
+        # A repeated call would be cut at RESULT_MAX_CHARS again; read on from here instead
+        hint = (f"call read_document with document_id={json.dumps(tool_args.get('document_id'))} "
+                f"and offset={limit} for the rest.")
+    elif len(text) <= RESULT_MAX_CHARS:
+        hint = f"call {tool_name} again with the same arguments for the full result."
+    else:
+        hint = (f"the full result is longer than {RESULT_MAX_CHARS} characters and cannot be returned; "
+                f"call {tool_name} with narrower arguments (e.g. a smaller limit or a pattern).")
+    return f"{text[:limit]}\n[... {len(text) - limit} more characters omitted from result #{ref}; {hint}]"
+
+class ToolSession:
+    """
+    Runs the tool calls of a chat session. Calls from one turn run
+    concurrently (up to TOOL_CONCURRENCY), and identical calls are answered
+    once per session from a local cache, so asking for the full text of a
+    compacted result again costs no round trip to the server.
+    """
+
+    def __init__(self, mcp_client, concurrency: int = TOOL_CONCURRENCY):
+        self.mcp_client = mcp_client
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # (tool name, arguments as JSON) -> task producing the result text
+        self._results = {}
+        self.calls = 0
+        self.cache_hits = 0
+
+    async def _call(self, tool_name: str, tool_args: dict) -> str:
+        async with self._semaphore:
+            self.calls += 1
+            return result_text(await self.mcp_client.call_tool(tool_name, tool_args)) or "No content returned."
+
+    async def call(self, tool_name: str, tool_args: dict) -> str:
+        if tool_name in MUTATING_TOOLS:
+            self._results.clear()
+            return await self._call(tool_name, tool_args)
+        if tool_name in UNCACHED_TOOLS:
+            return await self._call(tool_name, tool_args)
+        key = (tool_name, json.dumps(tool_args, sort_keys=True))
+        task = self._results.get(key)
+        if task is None:
+            task = self._results[key] = asyncio.ensure_future(self._call(tool_name, tool_args))
+        else:
+            self.cache_hits += 1
+        try:
+            text = await asyncio.shield(task)
+        except Exception:
+            self._results.pop(key, None)
+            raise
+        if text.startswith("Error"):
+            # Worth retrying later, e.g. once the document exists
+            self._results.pop(key, None)
+        return text
+
+    async def run_turn(self, calls):
+        """Results (or exceptions) of a turn's [(tool name, args)], in order."""
+        if any(tool_name in MUTATING_TOOLS for tool_name, _ in calls):
+            results = []
+            for tool_name, tool_args in calls:
+                try:
+                    results.append(await self.call(tool_name, tool_args))
+                except Exception as e:
+                    results.append(e)
+            return results
+        return await asyncio.gather(*(self.call(name, args) for name, args in calls),
+                                    return_exceptions=True)
+
 async def upload_doc(mcp_client, filepath: str):
-    """Helper to upload a file to the MCP server."""
+    """Helper to upload a file to the MCP server in resumable chunks."""
     if not os.path.exists(filepath):
         print(f"Error: File '{filepath}' not found.")
         return None
     
     try:
-        with open(filepath, "rb") as f:
-            content = base64.b64encode(f.read()).decode('utf-8')
-            
         filename = os.path.basename(filepath)
         print(f"Uploading {filename}...")
-        
-        result = await mcp_client.call_tool("upload_document", {
-            "filename": filename,
-            "file_content_base64": content
+
+        response = result_text(await mcp_client.call_tool("begin_upload", {"filename": filename}))
+        if response.startswith("Error"):
+            print(f"Server response: {response}")
+            return None
+        upload_id = json.loads(response)["upload_id"]
+
+        # Only one chunk is held in memory at a time.
+        with open(filepath, "rb") as f:
+            offset = 0
+            failures = 0
+            while True:
+                chunk = f.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                try:
+                    response = result_text(await mcp_client.call_tool("upload_chunk", {
+                        "upload_id": upload_id,
+                        "offset": offset,
+                        "chunk_base64": base64.b64encode(chunk).decode('utf-8')
+                    }))
+                    if response.startswith("Error"):
+                        raise RuntimeError(response)
+                except Exception as e:
+                    failures += 1
+                    if failures > UPLOAD_RETRIES:
+                        raise
+                    print(f"Chunk at offset {offset} failed ({e}), resuming...")
+                    # Ask the server how much it has and continue from there.
+                    response = result_text(await mcp_client.call_tool(
+                        "begin_upload", {"filename": filename, "upload_id": upload_id}
+                    ))
+                    offset = json.loads(response)["offset"]
+                    f.seek(offset)
+                    continue
+                offset += len(chunk)
+                failures = 0
+
+        with open(filepath, "rb") as f:
+            checksum = hashlib.file_digest(f, "sha256").hexdigest()
+
+        result = await mcp_client.call_tool("commit_upload", {
+            "upload_id": upload_id,
+            "sha256": checksum
         })
         
         # Check result
         if result.content:
             print(f"Server response: {result.content[0].text}")
+            if result.content[0].text.startswith("Error"):
+                return None
             print("NOTE: This document is now saved on the server and can be accessed via Option 2 next time.")
         
         return filename
@@ -38,6 +171,31 @@ async def upload_doc(mcp_client, filepath: str):
         print(f"Upload failed: {e}")
         return None
 
+async def config_context(mcp_client, doc_id: str) -> str:
+    """
+    The templates, rubrics, checklists and question banks ranked for the
+    document by the server. Only the full config lists are pasted when
+    classification fails, as they grow with every config added.
+    """
+    print("Classifying document...")
+    try:
+        response = result_text(await mcp_client.call_tool("classify_document", {"document_id": doc_id}))
+        if not response.startswith("Error"):
+            return f"Configs ranked for this document (best first, score 0-1):\n{response}\n"
+        print(f"Warning: {response}")
+    except Exception as e:
+        print(f"Warning: Could not classify document: {e}")
+    try:
+        contexts = []
+        for label, uri in (("Templates", "config://templates"), ("Rubrics", "config://rubrics"),
+                           ("Checklists", "config://checklists"), ("Question Banks", "config://questions")):
+            res = await mcp_client.read_resource(uri)
+            contexts.append(f"Available {label}: {res[0].text}\n")
+        return "".join(contexts)
+    except Exception as e:
+        print(f"Warning: Could not fetch system config: {e}")
+        return "System config unavailable."
+
 async def main():
    
     mcp_client = Client(REMOTE_SERVER_URL)
@@ -48,25 +206,6 @@ async def main():
 
         print("\n--- Intelligent Document Processing Client (Gemini) ---")
         
-        # 0. Pre-fetch Context (Templates, Checklists)
-        # This helps the LLM know what "v1" IDs are available without asking.
-        print("Fetching system configuration...")
-        try:
-            templates_res = await mcp_client.read_resource("config://templates")
-            rubrics_res = await mcp_client.read_resource("config://rubrics")
-            checklists_res = await mcp_client.read_resource("config://checklists")
-            questions_res = await mcp_client.read_resource("config://questions")
-            
-            system_context_str = (
-                f"Available Templates: {templates_res[0].text}\n"
-                f"Available Rubrics: {rubrics_res[0].text}\n"
-                f"Available Checklists: {checklists_res[0].text}\n"
-                f"Available Question Banks: {questions_res[0].text}\n"
-            )
-        except Exception as e:
-            print(f"Warning: Could not fetch system config: {e}")
-            system_context_str = "System config unavailable."
-
         print("1. Upload a document")
         print("2. Use existing server document")
         
@@ -97,6 +236,9 @@ async def main():
             print("No document selected.")
             return
 
+        # Which configs fit the document, so the LLM need not guess IDs
+        system_context_str = await config_context(mcp_client, doc_id)
+
         # Initialize Gemini client
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
@@ -118,8 +260,8 @@ async def main():
                             f"identify risks, and generate action checklists for document '{doc_id}'. \n"
                             "Always use the provided tools to answer questions. \n"
                             "When invoking tools like 'summarize_sections' or 'generate_action_checklist', "
-                            "automatically select the most appropriate 'template_id' or 'checklist_id' from the Available Configs below "
-                            "based on the document type (e.g., use 'loan_application' for loans, 'medical' for medical records). "
+                            "automatically select the most appropriate 'template_id', 'rubric_id' or 'checklist_id' from the configs below "
+                            "(classify_document ranks them for any other document) based on the document type (e.g., use 'loan_application' for loans, 'medical' for medical records). "
                             "Do not ask the user for IDs if a reasonable default exists in the config. \n\n"
                             f"Reliable document ID to use in tool calls: {doc_id}\n\n"
                             f"--- AVAILABLE CONFIGS ---\n{system_context_str}"
@@ -134,6 +276,10 @@ async def main():
         ]
 
         gemini_tools = [mcp_client.session]
+        tools = ToolSession(mcp_client)
+        refs = itertools.count(1)
+        # (history entry, tool name, arguments, full result, ref) of the last turn's tool results
+        answered = []
 
         print("\n🔵 Starting Gemini + MCP tool execution... (Type 'exit' to quit)")
 
@@ -146,6 +292,15 @@ async def main():
                     config=types.GenerateContentConfig(tools=gemini_tools)
                 )
 
+                # Gemini has now seen the last turn's tool results; later
+                # prompts carry only snippets of them
+                for content, tool_name, tool_args, text, ref in answered:
+                    content.parts = [types.Part.from_function_response(
+                        name=tool_name,
+                        response={"result": shortened(text, RESULT_SNIPPET_CHARS, ref, tool_name, tool_args)}
+                    )]
+                answered = []
+
                 # Final Answer
                 if response.text:
                     print("\n🟢 Gemini:", response.text)
@@ -163,32 +318,31 @@ async def main():
                         )
                     )
 
-                    for fc in response.function_calls:
-                        tool_name = fc.name
-                        tool_args = dict(fc.args)
-
+                    calls = [(fc.name, dict(fc.args)) for fc in response.function_calls]
+                    for tool_name, tool_args in calls:
                         print(f"\n🤖 Gemini calls tool: {tool_name}")
                         print(f"Args: {tool_args}")
 
-                        # Execute MCP tool
-                        result = await mcp_client.call_tool(tool_name, tool_args)
-                        
-                        result_text = result.content[0].text if result.content else "No content returned."
-                        print(f"   ➜ Tool Result: {result_text[:100]}...") 
+                    # Execute the MCP tools of this turn together
+                    outcomes = await tools.run_turn(calls)
 
-                        # Append tool response to history
-                        history.append(
-                            types.Content(
-                                role="function",
-                                parts=[
-                                    types.Part.from_function_response(
-                                        name=tool_name,
-                                        response={"result": result_text}
-                                    )
-                                ]
-                            )
+                    for (tool_name, tool_args), outcome in zip(calls, outcomes):
+                        text = f"Error: {outcome}" if isinstance(outcome, Exception) else outcome
+                        print(f"   ➜ {tool_name} result: {text[:100]}...")
+                        ref = next(refs)
+                        content = types.Content(
+                            role="function",
+                            parts=[
+                                types.Part.from_function_response(
+                                    name=tool_name,
+                                    response={"result": shortened(text, RESULT_MAX_CHARS, ref, tool_name, tool_args)}
+                                )
+                            ]
                         )
-                    
+                        # Append tool response to history
+                        history.append(content)
+                        answered.append((content, tool_name, tool_args, text, ref))
+
                     # Continue generation automatically to get the final answer after tool usage
                     continue 
 
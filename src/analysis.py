@@ -0,0 +1,216 @@
+import json
+from config_loader import (get_template, get_templates, get_rubric, get_rubrics, get_checklist,
+                           config_version)
+from rule_engine import compile_template
+from segmentation import SectionMap
+from indicator_matcher import compile_rubric, risk_score
+from schema_validation import annotate, get_validator, SchemaError
+from result_cache import ResultCache, compact
+
+# Bump whenever analysis output changes, so memoized results are recomputed.
+ANALYSIS_VERSION = "3"
+# Characters of the document quoted in a summary for context.
+SNIPPET_CHARS = 500
+
+# Section maps by document content and template version, so a document is
+# segmented once per template.
+section_maps = ResultCache()
+
+class ConfigNotFound(LookupError):
+    pass
+
+class _Head:
+    """Pass (offset, text) chunks through, keeping the first `size` characters."""
+
+    def __init__(self, chunks, size: int):
+        self._chunks = iter(chunks)
+        self.size = size
+        self._parts = []
+        self._length = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        offset, chunk = next(self._chunks)
+        if self._length < self.size:
+            part = chunk[:self.size - self._length]
+            self._parts.append(part)
+            self._length += len(part)
+        return offset, chunk
+
+    def text(self) -> str:
+        # Read on if the consumer stopped before the head was complete
+        while self._length < self.size and next(self, None) is not None:
+            pass
+        return "".join(self._parts)
+
+class _PhraseWatch:
+    """Pass (offset, text) chunks through, noting whether a lower-case phrase occurs."""
+
+    def __init__(self, chunks, phrase: str):
+        self._chunks = chunks
+        self.phrase = phrase
+        self.found = False
+
+    def __iter__(self):
+        tail = ""
+        for offset, chunk in self._chunks:
+            if not self.found:
+                window = tail + chunk.lower()
+                self.found = self.phrase in window
+                tail = window[len(window) - len(self.phrase) + 1:]
+            yield offset, chunk
+
+def _compiled_template(template_id: str):
+    template = get_template(template_id)
+    if not template:
+        raise ConfigNotFound(f"Template '{template_id}' not found.")
+    # Rules are compiled once per template version and run only inside the
+    # paragraphs that mention the template's section keywords
+    return compile_template(template, config_version("templates", template_id))
+
+def warm_up():
+    """Compile every template, rubric and output schema ahead of the first request."""
+    for template in get_templates():
+        _compiled_template(template["template_id"])
+    for rubric in get_rubrics():
+        compile_rubric(rubric, config_version("rubrics", rubric["rubric_id"]))
+    for config in get_templates() + get_rubrics():
+        if config.get("output_schema"):
+            try:
+                get_validator(config["output_schema"])
+            except SchemaError:
+                pass  # reported in the output of every call using it
+
+def config_versions(kind: str, config_id: str):
+    """Versions of a template or rubric and of the output schema it names, for cache keys."""
+    config = get_template(config_id) if kind == "templates" else get_rubric(config_id)
+    schema_name = (config or {}).get("output_schema")
+    return (config_version(kind, config_id),
+            config_version("schemas", schema_name) if schema_name else None)
+
+def _section_key(template_id: str, content_hash, headings):
+    if content_hash is None:
+        return None
+    # Layout headings are only known once a document was fully extracted
+    return (content_hash, template_id, config_version("templates", template_id), len(headings or ()))
+
+def _cached_sections(key):
+    cached = section_maps.get(key) if key else None
+    return SectionMap(*json.loads(cached)) if cached else None
+
+def _remember_sections(key, known, sections):
+    if key and known is None and sections is not None and sections.complete:
+        section_maps.put(key, compact([sections.starts, sections.ids]))
+
+def summarize_text(document_id: str, text: str, template_id: str, headings=(), content_hash=None) -> dict:
+    """
+    Apply a template's extraction rules to already extracted text. `headings`
+    are the offsets of layout heading lines; with `content_hash` the
+    document's section map is cached.
+    """
+    key = _section_key(template_id, content_hash, headings)
+    known = _cached_sections(key)
+    extracted_data, field_offsets, sections = _compiled_template(template_id).extract(
+        text, headings=headings, sections=known, with_sections=True)
+    _remember_sections(key, known, sections)
+    return _summary(document_id, template_id, extracted_data, field_offsets, text[:SNIPPET_CHARS])
+
+def summarize_chunks(document_id: str, chunks, template_id: str, headings=(), content_hash=None) -> dict:
+    """
+    Apply a template's extraction rules to a stream of (offset, text) chunks,
+    reading no further than needed to match every rule and fill the snippet.
+    """
+    rules = _compiled_template(template_id)
+    head = _Head(chunks, SNIPPET_CHARS)
+    key = _section_key(template_id, content_hash, headings)
+    known = _cached_sections(key)
+    extracted_data, field_offsets, sections = rules.extract_stream(
+        head, headings=headings, sections=known, with_sections=True)
+    _remember_sections(key, known, sections)
+    return _summary(document_id, template_id, extracted_data, field_offsets, head.text())
+
+def _summary(document_id, template_id, extracted_data, field_offsets, snippet) -> dict:
+    output = {
+        "document_id": document_id,
+        "template_id": template_id,
+        "extracted_sections": extracted_data,
+        "field_offsets": field_offsets,
+        "raw_text_snippet": snippet + "..." # Context
+    }
+    template = get_template(template_id)
+    if template.get("output_schema"):
+        # A template fills in only its own fields of the record the schema describes
+        fields = [rule["field"] for rule in template.get("extraction_rules", [])]
+        annotate(output, template["output_schema"], extracted_data, fields)
+    return output
+
+def assess_risks(document_id: str, text: str, rubric_id: str) -> dict:
+    """Score already extracted text against every criterion of a rubric."""
+    return assess_risk_chunks(document_id, [(0, text)], rubric_id)
+
+def assess_risk_chunks(document_id: str, chunks, rubric_id: str) -> dict:
+    """Score a stream of (offset, text) chunks against every criterion of a rubric."""
+    rubric = get_rubric(rubric_id)
+    if not rubric:
+        raise ConfigNotFound(f"Rubric '{rubric_id}' not found.")
+
+    # One pass over the text for every indicator of every criterion
+    matcher = compile_rubric(rubric, config_version("rubrics", rubric_id))
+    signature = _PhraseWatch(chunks, "signature")
+    hits = matcher.scan_stream(signature)
+
+    identified_risks = []
+    for criteria in rubric.get('criteria', []):
+        risk_id = criteria.get('id')
+        reasons = []
+        criterion_hits = hits.get(risk_id, {"hits": 0, "matches": []})
+        if criterion_hits["hits"]:
+            indicators = sorted({m["indicator"] for m in criterion_hits["matches"]})
+            reasons.append(f"Indicators found: {', '.join(indicators)}.")
+
+        # For 'missing_info', we also check if 'signature' is absent
+        if risk_id == 'missing_info' and not signature.found:
+            reasons.append("Potential missing signature.")
+
+        if reasons:
+            identified_risks.append({
+                "id": risk_id,
+                "level": criteria.get('risk_level'),
+                "reason": " ".join(reasons),
+                "hits": criterion_hits["hits"],
+                "matches": criterion_hits["matches"]
+            })
+
+    # Sampling / Escalation Logic
+    # Trigger manual review if any "High" or "Critical" risk is found
+    high_risk_found = any(r['level'] in ["High", "Critical"] for r in identified_risks)
+
+    output = {
+        "document_id": document_id,
+        "rubric_id": rubric_id,
+        "risks": identified_risks,
+        "risks_identified": [r["id"] for r in identified_risks],
+        "risk_score": risk_score(r["level"] for r in identified_risks),
+        "criteria_hits": {risk_id: h["hits"] for risk_id, h in hits.items()},
+        "manual_review_required": high_risk_found,
+        "escalation_reason": "High/Critical risk factors detected" if high_risk_found else None
+    }
+    if rubric.get("output_schema"):
+        annotate(output, rubric["output_schema"], dict(output), list(output))
+    return output
+
+def action_checklist(document_id: str, checklist_id: str) -> dict:
+    # In a real scenario, we might check document contents to conditionally include items
+    # For now, we return the static items from config, but filtering could happen here.
+    checklist = get_checklist(checklist_id)
+    if not checklist:
+        raise ConfigNotFound(f"Checklist '{checklist_id}' not found.")
+
+    # Return the items from the config
+    return {
+        "document_id": document_id,
+        "checklist_id": checklist_id,
+        "checklist": checklist.get('items', [])
+    }
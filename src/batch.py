@@ -0,0 +1,104 @@
+import os
+import time
+import fnmatch
+from concurrent.futures import FIRST_COMPLETED, wait
+from analysis import summarize_text, assess_risks, action_checklist
+from config_loader import get_template, get_rubric, get_checklist
+from workers import CPU_SHARE, get_process_pool
+
+# Documents analysed concurrently by batch_process.
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "0")) or CPU_SHARE
+
+_processors = {}
+
+def select_documents(processor, documents=None, pattern: str = None):
+    """Documents to process: an explicit list and/or a glob over stored names."""
+    available = processor.list_documents()
+    if documents:
+        # Unknown names are kept so they are reported as failures
+        selected = list(dict.fromkeys(documents))
+    else:
+        selected = sorted(available)
+    if pattern:
+        selected = fnmatch.filter(selected, pattern)
+    return selected
+
+def check_configs(template_id=None, rubric_id=None, checklist_id=None):
+    """Return an error message for the first missing config, or None."""
+    if template_id and not get_template(template_id):
+        return f"Template '{template_id}' not found."
+    if rubric_id and not get_rubric(rubric_id):
+        return f"Rubric '{rubric_id}' not found."
+    if checklist_id and not get_checklist(checklist_id):
+        return f"Checklist '{checklist_id}' not found."
+    return None
+
+def analyse_document(processor, document_id, template_id=None, rubric_id=None, checklist_id=None):
+    """Extract a document once and run every requested analysis on the shared text."""
+    started = time.perf_counter()
+    result = {"document_id": document_id}
+    try:
+        entry = processor.extract(document_id)
+        text = entry["text"]
+        if text.startswith("Error") or text.startswith("[Unsupported"):
+            result["error"] = text
+        else:
+            if template_id:
+                result["summary"] = summarize_text(document_id, text, template_id, entry.get("headings", ()))
+            if rubric_id:
+                result["risks"] = assess_risks(document_id, text, rubric_id)
+            if checklist_id:
+                result["checklist"] = action_checklist(document_id, checklist_id)["checklist"]
+    except FileNotFoundError:
+        result["error"] = f"Document '{document_id}' not found."
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def _analyse_in_worker(storage_dir, document_id, template_id, rubric_id, checklist_id):
+    # Each worker already is one of BATCH_WORKERS processes, so its processor
+    # extracts PDFs and runs OCR in-process instead of nesting pools.
+    from document_processor import DocumentProcessor
+    processor = _processors.get(storage_dir)
+    if processor is None:
+        processor = _processors[storage_dir] = DocumentProcessor(
+            storage_dir, pdf_workers=1, ocr_workers=1
+        )
+    return analyse_document(processor, document_id, template_id, rubric_id, checklist_id)
+
+def run_batch(processor, document_ids, template_id=None, rubric_id=None, checklist_id=None,
+              workers: int = BATCH_WORKERS):
+    """
+    Analyse many documents, yielding each result as soon as it is ready.
+
+    Work is spread over a process pool with at most twice `workers` documents
+    in flight, so memory stays bounded however long the batch is. Results come
+    back in completion order; each one carries its document_id.
+    """
+    if workers <= 1:
+        for document_id in document_ids:
+            yield analyse_document(processor, document_id, template_id, rubric_id, checklist_id)
+        return
+
+    pool = get_process_pool("batch", workers)
+    storage_dir = str(processor.storage_dir)
+    queue = iter(document_ids)
+    in_flight = set()
+    try:
+        while True:
+            while len(in_flight) < workers * 2:
+                document_id = next(queue, None)
+                if document_id is None:
+                    break
+                in_flight.add(pool.submit(_analyse_in_worker, storage_dir, document_id,
+                                          template_id, rubric_id, checklist_id))
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # The consumer stopped early: drop work that has not started yet
+        for future in in_flight:
+            future.cancel()
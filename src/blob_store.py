@@ -0,0 +1,103 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+from pathlib import Path
+try:
+    import fcntl
+except ImportError:  # Windows: documents are plain copies of their blob
+    fcntl = None
+
+# ioctl cloning a file's extents into another on the same filesystem (Linux)
+FICLONE = 0x40049409
+
+# Unreferenced blobs younger than this many seconds are left alone by the
+# sweep: they may belong to an upload that is being linked into place.
+ORPHAN_GRACE_SECONDS = 60
+
+class BlobStore:
+    """
+    Content-addressed file storage: each distinct content is kept once, as
+    `root/<first two hex digits>/<sha256>`.
+
+    Blobs are read-only and never shared with a document name, so editing a
+    document in place on the volume cannot change the blob or another name
+    with the same content. Each name is a reflink clone of its blob where the
+    filesystem supports them (sharing the data on disk until one side is
+    written) and a file of its own elsewhere.
+    """
+
+    def __init__(self, root, tmp_dir):
+        self.root = Path(root)
+        self.tmp_dir = Path(tmp_dir)
+
+    def path(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / content_hash
+
+    def store(self, source, content_hash: str, dest) -> bool:
+        """
+        Atomically place `source`, a fully written file hashing to
+        `content_hash`, at `dest`, keeping its content as a blob. Returns
+        True when an intact blob of the content was already stored.
+        """
+        blob = self.path(content_hash)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.tmp_dir / f"{uuid.uuid4().hex}.link"
+        if _clone(blob, tmp):
+            # A blob altered behind our back is replaced, not handed out
+            if _digest(tmp) == content_hash:
+                os.unlink(source)
+                os.replace(tmp, dest)
+                return True
+            os.unlink(tmp)
+        existed = blob.is_file() and _digest(blob) == content_hash
+        if not existed:
+            if not _clone(source, tmp):
+                shutil.copyfile(source, tmp)
+            os.chmod(tmp, 0o444)
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, blob)
+        os.replace(source, dest)
+        return existed
+
+    def discard(self, content_hash: str):
+        """Remove the blob of content no document name has any more."""
+        try:
+            self.path(content_hash).unlink()
+        except FileNotFoundError:
+            pass
+
+    def collect(self, referenced) -> int:
+        """Remove every unreferenced blob past the grace period; returns how many."""
+        if not self.root.is_dir():
+            return 0
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        removed = 0
+        for blob in self.root.glob("*/*"):
+            try:
+                st = blob.stat()
+                if blob.name not in referenced and st.st_ctime < cutoff:
+                    blob.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+def _clone(source: Path, dest: Path) -> bool:
+    # Reflink `source` to a new file `dest`; False when either is impossible
+    if fcntl is None:
+        return False
+    try:
+        with open(source, "rb") as src, open(dest, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+
+def _digest(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
@@ -0,0 +1,165 @@
+import os
+import time
+import sqlite3
+import threading
+import mimetypes
+from pathlib import Path
+
+# Seconds between reconciliations of the catalog with the storage directory
+# (picks up files dropped onto a mounted volume). 0 rescans on every listing.
+CATALOG_RESCAN_INTERVAL = float(os.environ.get("CATALOG_RESCAN_INTERVAL", "30"))
+
+SORT_COLUMNS = ["name", "size", "mtime_ns", "mime_type", "page_count", "extraction_status", "updated_at"]
+COLUMNS = ["name", "size", "mtime_ns", "mime_type", "page_count", "content_hash", "extraction_status", "updated_at"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    mime_type TEXT,
+    page_count INTEGER,
+    content_hash TEXT,
+    extraction_status TEXT NOT NULL DEFAULT 'pending',
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_status ON documents (extraction_status);
+CREATE INDEX IF NOT EXISTS documents_mime ON documents (mime_type);
+CREATE INDEX IF NOT EXISTS documents_hash ON documents (content_hash);
+"""
+
+def connect(db_path: Path, schema: str):
+    """A connection in WAL mode with `schema` applied, for use by one thread."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(schema)
+    return conn
+
+class DocumentCatalog:
+    """
+    SQLite catalog of stored documents with their metadata.
+
+    Uploads update it directly; files that appear on the storage volume by
+    other means are reconciled by an incremental rescan that only stat()s the
+    directory. WAL mode lets several threads and processes read while one
+    writes.
+    """
+
+    def __init__(self, db_path, storage_dir):
+        self.db_path = Path(db_path)
+        self.storage_dir = Path(storage_dir)
+        self._local = threading.local()
+        self._scan_lock = threading.Lock()
+        self._last_scan = None
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path, _SCHEMA)
+        return conn
+
+    def upsert(self, name: str, size: int, mtime_ns: int, content_hash: str = None):
+        """Record a new or replaced file; its extraction state starts over."""
+        mime_type = mimetypes.guess_type(name)[0]
+        self._db().execute(
+            """INSERT INTO documents (name, size, mtime_ns, mime_type, page_count, content_hash,
+                                      extraction_status, updated_at)
+               VALUES (?, ?, ?, ?, NULL, ?, 'pending', ?)
+               ON CONFLICT(name) DO UPDATE SET
+                   size=excluded.size, mtime_ns=excluded.mtime_ns, mime_type=excluded.mime_type,
+                   page_count=NULL, content_hash=excluded.content_hash,
+                   extraction_status='pending', updated_at=excluded.updated_at""",
+            (name, size, mtime_ns, mime_type, content_hash, time.time()),
+        )
+
+    def record_extraction(self, name: str, content_hash: str, status: str, page_count: int = None, st=None):
+        """
+        Record how a document's extraction went. `st`, the stat of the file
+        extracted, is recorded with it, so a rescan does not take the file
+        for changed and reset the row to pending.
+        """
+        st = st or (self.storage_dir / name).stat()
+        query = """UPDATE documents SET content_hash=?, extraction_status=?, page_count=?, size=?,
+                       mtime_ns=?, updated_at=? WHERE name=?"""
+        params = (content_hash, status, page_count, st.st_size, st.st_mtime_ns, time.time(), name)
+        if self._db().execute(query, params).rowcount == 0:
+            # Not catalogued yet (dropped onto the volume since the last rescan)
+            self.upsert(name, st.st_size, st.st_mtime_ns, content_hash)
+            self._db().execute(query, params)
+
+    def remove(self, name: str):
+        self._db().execute("DELETE FROM documents WHERE name=?", (name,))
+
+    def get(self, name: str):
+        row = self._db().execute("SELECT * FROM documents WHERE name=?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def names_with_hash(self, content_hash: str):
+        """Every document name currently mapped to this content."""
+        rows = self._db().execute("SELECT name FROM documents WHERE content_hash=?", (content_hash,))
+        return [row[0] for row in rows]
+
+    def hashes(self):
+        """The content hashes some document name maps to."""
+        rows = self._db().execute("SELECT DISTINCT content_hash FROM documents WHERE content_hash IS NOT NULL")
+        return {row[0] for row in rows}
+
+    def rescan(self):
+        """Reconcile the catalog with the files actually in the storage directory."""
+        with self._scan_lock:
+            self._last_scan = time.monotonic()
+            db = self._db()
+            known = {
+                row["name"]: (row["size"], row["mtime_ns"])
+                for row in db.execute("SELECT name, size, mtime_ns FROM documents")
+            }
+            seen = set()
+            with os.scandir(self.storage_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    seen.add(entry.name)
+                    st = entry.stat()
+                    if known.get(entry.name) != (st.st_size, st.st_mtime_ns):
+                        self.upsert(entry.name, st.st_size, st.st_mtime_ns)
+            for name in known.keys() - seen:
+                self.remove(name)
+
+    def rescan_if_stale(self) -> bool:
+        """Rescan when the last rescan is older than the interval; True if it ran."""
+        if self._last_scan is None or time.monotonic() - self._last_scan >= CATALOG_RESCAN_INTERVAL:
+            self.rescan()
+            return True
+        return False
+
+    def names(self):
+        return [row[0] for row in self._db().execute("SELECT name FROM documents ORDER BY name")]
+
+    def list(self, offset: int = 0, limit: int = 100, sort: str = "name", descending: bool = False,
+             mime_type: str = None, status: str = None, pattern: str = None):
+        """One page of document records plus the total number matching the filters."""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort}'; choose one of {', '.join(SORT_COLUMNS)}.")
+        where = []
+        params = []
+        if mime_type:
+            where.append("mime_type = ?")
+            params.append(mime_type)
+        if status:
+            where.append("extraction_status = ?")
+            params.append(status)
+        if pattern:
+            where.append("name GLOB ?")
+            params.append(pattern)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        db = self._db()
+        total = db.execute(f"SELECT COUNT(*) FROM documents {clause}", params).fetchone()[0]
+        rows = db.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM documents {clause} "
+            f"ORDER BY {sort} {'DESC' if descending else 'ASC'}, name LIMIT ? OFFSET ?",
+            params + [max(0, limit), max(0, offset)],
+        ).fetchall()
+        return [dict(row) for row in rows], total
@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+from config_loader import config_entries
+
+# Characters read from the start of each document to classify it; the type
+# of a document shows on its first pages.
+CLASSIFY_MAX_CHARS = int(os.environ.get("CLASSIFY_MAX_CHARS", "20000"))
+
+# Config kinds ranked for a document, and the key naming the best match of each.
+KINDS = {"templates": "template_id", "rubrics": "rubric_id", "checklists": "checklist_id",
+         "questions": "bank_id"}
+# Config values that say nothing about the documents a config is for.
+SKIP_KEYS = {"template_id", "rubric_id", "checklist_id", "bank_id", "question_bank_id",
+             "output_schema", "pattern", "risk_level", "section"}
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or the this to was were with
+any all not no if can do does did been being their there these those what which who
+""".split())
+_WORD = re.compile(r"[a-z]{2,}")
+
+def terms(text: str):
+    """Lower-case words and adjacent word pairs of a text, without stopwords."""
+    words = [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def _strings(value, key=None):
+    # Every text value of a config, except IDs, regexes and the like
+    if key in SKIP_KEYS:
+        return
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield from _strings(v, k)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _strings(v)
+
+class ConfigMatrix:
+    """
+    TF-IDF matrix of the configs of one kind, one L2-normalized row per
+    config over the words and word pairs of its names, descriptions,
+    keywords and items. A batch of documents is scored against every config
+    with one matrix product of cosine similarities.
+    """
+
+    def __init__(self, entries):
+        import numpy as np
+        self.ids = [config_id for config_id, _ in entries]
+        self.names = [config.get("name", config_id) if isinstance(config, dict) else config_id
+                      for config_id, config in entries]
+        config_terms = [[t for s in _strings(config) for t in terms(s)] for _, config in entries]
+        self.vocabulary = {}
+        for document in config_terms:
+            for term in document:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+        counts = self._counts(config_terms)
+        # Smoothed IDF: terms every config shares count least
+        df = np.count_nonzero(counts, axis=0)
+        self.idf = np.log((1 + len(entries)) / (1 + df)) + 1
+        self.matrix = self._weigh(counts)
+
+    def _counts(self, documents):
+        import numpy as np
+        counts = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            columns = [self.vocabulary[t] for t in document if t in self.vocabulary]
+            if columns:
+                counts[row] = np.bincount(columns, minlength=len(self.vocabulary))
+        return counts
+
+    def _weigh(self, counts):
+        import numpy as np
+        weights = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        return weights / np.where(norms == 0, 1, norms)
+
+    def scores(self, texts):
+        """Cosine similarity of each text (rows) to each config (columns)."""
+        return self._weigh(self._counts([terms(text) for text in texts])) @ self.matrix.T
+
+    def rank(self, texts, top: int = 3):
+        """The `top` best matching configs of each text, as {"id", "name", "score"} lists."""
+        if not self.ids:
+            return [[] for _ in texts]
+        import numpy as np
+        scores = self.scores(texts)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :max(0, top)]
+        return [[{"id": self.ids[i], "name": self.names[i], "score": round(float(row[i]), 4)}
+                 for i in columns if row[i] > 0]
+                for row, columns in zip(scores, order)]
+
+_matrices = {}
+_lock = threading.Lock()
+
+def config_matrix(kind: str) -> ConfigMatrix:
+    """The matrix of a config kind, rebuilt whenever one of its files changes."""
+    generation, entries = config_entries(kind)
+    with _lock:
+        cached = _matrices.get(kind)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+    matrix = ConfigMatrix(entries)
+    with _lock:
+        _matrices[kind] = (generation, matrix)
+    return matrix
+
+def classify(texts, top: int = 3):
+    """
+    Rank every template, rubric, checklist and question bank for each text.
+    Returns one dict per text with the best ID of each kind and the rankings.
+    """
+    rankings = {kind: config_matrix(kind).rank(texts, top) for kind in KINDS}
+    results = []
+    for i in range(len(texts)):
+        result = {key: (rankings[kind][i][0]["id"] if rankings[kind][i] else None)
+                  for kind, key in KINDS.items()}
+        result.update((kind, rankings[kind][i]) for kind in KINDS)
+        results.append(result)
+    return results
+
+def warm_up():
+    for kind in KINDS:
+        config_matrix(kind)
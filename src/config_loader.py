@@ -1,83 +1,204 @@
 import os
-import yaml
 import json
+import threading
+import time
 from pathlib import Path
 
 CONFIG_DIR = os.environ.get("CONFIG_PATH", "configs")
+# Minimum number of seconds between two stat scans of a config directory.
+# 0 re-checks the files on every access.
+CONFIG_RELOAD_INTERVAL = float(os.environ.get("CONFIG_RELOAD_INTERVAL", "1.0"))
 
 def load_yaml(path: str):
+    # Imported with the first config rather than with the server
+    import yaml
     with open(path, 'r') as f:
-        return yaml.safe_load(f)
+        try:
+            return yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise ValueError(f"{path}: {e}") from e
 
 def load_json(path: str):
     with open(path, 'r') as f:
         return json.load(f)
 
+class ConfigRegistry:
+    """
+    ID-keyed index over one config directory (templates, rubrics, ...).
+
+    Files are parsed once and re-parsed only when their mtime or size changes,
+    so lookups cost a dict access plus, at most once per CONFIG_RELOAD_INTERVAL,
+    one stat() per file. The JSON served by the config:// resources is cached
+    until the directory changes.
+    """
+
+    def __init__(self, subdir: str, suffix: str, loader, id_keys=()):
+        self.subdir = subdir
+        self.suffix = suffix
+        self.loader = loader
+        # Keys tried in order to find a config's ID; the file stem is used when
+        # none is present (schemas are addressed by file name).
+        self.id_keys = id_keys
+        self._lock = threading.RLock()
+        self._directory = None
+        self._files = {}  # path -> (stat signature, config id, config)
+        self._index = {}
+        self._ordered = []
+        self._serialized = None
+        self._serialized_entries = {}
+        self._last_scan = None
+        self.generation = 0
+
+    def _config_id(self, path: Path, data):
+        if isinstance(data, dict):
+            for key in self.id_keys:
+                if data.get(key):
+                    return data[key]
+        return path.stem
+
+    def refresh(self, force: bool = False):
+        """Pick up added, changed and removed files since the last scan."""
+        with self._lock:
+            directory = Path(CONFIG_DIR) / self.subdir
+            now = time.monotonic()
+            if directory != self._directory:
+                self._directory = directory
+                self._files = {}
+                force = True
+            elif (not force and self._last_scan is not None
+                    and now - self._last_scan < CONFIG_RELOAD_INTERVAL):
+                return
+            self._last_scan = now
+
+            seen = set()
+            changed = False
+            if directory.exists():
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(self.suffix) or not entry.is_file():
+                            continue
+                        st = entry.stat()
+                        signature = (st.st_mtime_ns, st.st_size)
+                        seen.add(entry.path)
+                        known = self._files.get(entry.path)
+                        if known and known[0] == signature:
+                            continue
+                        try:
+                            data = self.loader(entry.path)
+                        except (OSError, ValueError):
+                            # Most likely caught mid-write; keep the last good
+                            # version and retry on the next scan.
+                            continue
+                        path = Path(entry.path)
+                        self._files[entry.path] = (signature, self._config_id(path, data), data)
+                        changed = True
+
+            for path in list(self._files):
+                if path not in seen:
+                    del self._files[path]
+                    changed = True
+
+            if changed:
+                self._ordered = []
+                self._index = {}
+                for path in sorted(self._files):
+                    _, config_id, data = self._files[path]
+                    self._ordered.append(data)
+                    # First file wins on duplicate IDs, as the old linear search did.
+                    self._index.setdefault(config_id, (path, data))
+                self._serialized = None
+                self._serialized_entries = {}
+                self.generation += 1
+
+    def all(self):
+        self.refresh()
+        return list(self._ordered)
+
+    def get(self, config_id: str):
+        self.refresh()
+        entry = self._index.get(config_id)
+        return entry[1] if entry else None
+
+    def version(self, config_id: str):
+        """Version string of a config, changing whenever its file changes."""
+        self.refresh()
+        entry = self._index.get(config_id)
+        if not entry:
+            return None
+        mtime_ns, size = self._files[entry[0]][0]
+        return f"{mtime_ns:x}-{size:x}"
+
+    def entries(self):
+        """The generation and the (config id, config) pairs of the current configs."""
+        self.refresh()
+        with self._lock:
+            return self.generation, [(config_id, data) for config_id, (_, data) in self._index.items()]
+
+    def serialized(self) -> str:
+        """All configs as the indented JSON list served by config:// resources."""
+        self.refresh()
+        with self._lock:
+            if self._serialized is None:
+                self._serialized = json.dumps(self._ordered, indent=2)
+            return self._serialized
+
+    def serialized_entry(self, config_id: str):
+        self.refresh()
+        with self._lock:
+            if config_id not in self._serialized_entries:
+                entry = self._index.get(config_id)
+                if not entry:
+                    return None
+                self._serialized_entries[config_id] = json.dumps(entry[1], indent=2)
+            return self._serialized_entries[config_id]
+
+registries = {
+    "templates": ConfigRegistry("templates", ".yaml", load_yaml, ("template_id",)),
+    "rubrics": ConfigRegistry("rubrics", ".yaml", load_yaml, ("rubric_id",)),
+    "checklists": ConfigRegistry("checklists", ".yaml", load_yaml, ("checklist_id",)),
+    # Question banks in configs/questions use 'bank_id'.
+    "questions": ConfigRegistry("questions", ".yaml", load_yaml, ("question_bank_id", "bank_id")),
+    "schemas": ConfigRegistry("schemas", ".json", load_json),
+}
+
+def serialized(kind: str) -> str:
+    return registries[kind].serialized()
+
+def config_version(kind: str, config_id: str):
+    return registries[kind].version(config_id)
+
+def config_entries(kind: str):
+    return registries[kind].entries()
+
+# Returned configs are shared with the registry and must not be mutated.
+
 def get_templates():
-    templates_dir = Path(CONFIG_DIR) / "templates"
-    templates = []
-    if templates_dir.exists():
-        for f in templates_dir.glob("*.yaml"):
-            templates.append(load_yaml(str(f)))
-    return templates
+    return registries["templates"].all()
 
 def get_template(template_id: str):
-    templates = get_templates()
-    for t in templates:
-        if t.get('template_id') == template_id:
-            return t
-    return None
+    return registries["templates"].get(template_id)
 
 def get_rubrics():
-    rubrics_dir = Path(CONFIG_DIR) / "rubrics"
-    rubrics = []
-    if rubrics_dir.exists():
-        for f in rubrics_dir.glob("*.yaml"):
-            rubrics.append(load_yaml(str(f)))
-    return rubrics
+    return registries["rubrics"].all()
 
 def get_rubric(rubric_id: str):
-    rubrics = get_rubrics()
-    for r in rubrics:
-        if r.get('rubric_id') == rubric_id:
-            return r
-    return None
-
-    return None
+    return registries["rubrics"].get(rubric_id)
 
 def get_checklists():
-    checklists_dir = Path(CONFIG_DIR) / "checklists"
-    checklists = []
-    if checklists_dir.exists():
-        for f in checklists_dir.glob("*.yaml"):
-            checklists.append(load_yaml(str(f)))
-    return checklists
+    return registries["checklists"].all()
 
 def get_checklist(checklist_id: str):
-    checklists = get_checklists()
-    for c in checklists:
-        if c.get('checklist_id') == checklist_id:
-            return c
-    return None
+    return registries["checklists"].get(checklist_id)
 
 def get_question_banks():
-    questions_dir = Path(CONFIG_DIR) / "questions"
-    banks = []
-    if questions_dir.exists():
-        for f in questions_dir.glob("*.yaml"):
-            banks.append(load_yaml(str(f)))
-    return banks
+    return registries["questions"].all()
 
 def get_question_bank(bank_id: str):
-    banks = get_question_banks()
-    for b in banks:
-        if b.get('question_bank_id') == bank_id:
-            return b
-    return None
+    return registries["questions"].get(bank_id)
 
 def get_schema(schema_name: str):
     # schema_name can be "loan_output" (without ext)
-    schema_path = Path(CONFIG_DIR) / "schemas" / f"{schema_name}.json"
-    if schema_path.exists():
-        return load_json(str(schema_path))
-    return None
+    return registries["schemas"].get(schema_name)
+
+def get_schema_json(schema_name: str):
+    return registries["schemas"].serialized_entry(schema_name)
@@ -1,69 +1,374 @@
 import os
+import uuid
+import hashlib
+import threading
+import mimetypes
+from bisect import bisect_right
 from pathlib import Path
-import pdfplumber
-import docx
-import pytesseract
-from PIL import Image
+from extraction_cache import ExtractionCache
+from catalog import DocumentCatalog
+from blob_store import BlobStore
+from search_index import SearchIndex, page_texts
+from extractors import IMAGE_EXTENSIONS, get_extractor, is_supported
+from ocr import OCROptions, OCR_WORKERS
+from workers import PDF_WORKERS
 
 DATA_DIR = os.environ.get("DATA_PATH", "data")
+# Server-side state (caches, indexes) lives in this hidden directory under the
+# storage directory, so it is never listed as a document.
+STATE_DIR_NAME = ".idp"
+
+# PDFs at least this large are streamed page by page by iter_text unless their
+# extraction is already cached; smaller ones are extracted whole and cached.
+STREAM_MIN_BYTES = int(os.environ.get("STREAM_MIN_MB", "16")) * 1024 * 1024
+# Characters per chunk when streaming plain text files.
+STREAM_CHUNK_CHARS = 64 * 1024
+# Most characters one ranged read returns.
+READ_MAX_CHARS = int(os.environ.get("READ_MAX_CHARS", "100000"))
+# Most entries listed in a document's outline.
+OUTLINE_MAX_ENTRIES = 200
 
 class DocumentProcessor:
-    def __init__(self, storage_dir=DATA_DIR):
+    def __init__(self, storage_dir=DATA_DIR, pdf_workers: int = PDF_WORKERS,
+                 ocr_workers: int = OCR_WORKERS, ocr_options: OCROptions = None):
         self.storage_dir = Path(storage_dir)
+        self.pdf_workers = pdf_workers
+        self.ocr_workers = ocr_workers
+        self.ocr_options = ocr_options or OCROptions()
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.state_dir = self.storage_dir / STATE_DIR_NAME
+        self.cache = ExtractionCache(self.state_dir / "extraction_cache")
+        self.catalog = DocumentCatalog(self.state_dir / "catalog.sqlite3", self.storage_dir)
+        self.blobs = BlobStore(self.state_dir / "blobs", self.state_dir / "uploads")
+        # path -> (stat signature, sha256), so unchanged files are hashed once
+        self._hashes = {}
+        self._hash_lock = threading.Lock()
+        # filename -> (content hash, status) last written to the catalog
+        self._catalogued = {}
+        self.search = SearchIndex(self.state_dir / "search.sqlite3")
+        # filename -> content hash known to be in the search index
+        self._indexed = {}
 
     def list_documents(self):
-        return [f.name for f in self.storage_dir.glob("*") if f.is_file()]
+        self._rescan_if_stale()
+        return self.catalog.names()
+
+    def list_document_records(self, **filters):
+        """Paginated, filtered document metadata; see DocumentCatalog.list."""
+        self._rescan_if_stale()
+        return self.catalog.list(**filters)
+
+    def _rescan_if_stale(self):
+        # Documents deleted from the volume since the last rescan may have
+        # left blobs behind
+        if self.catalog.rescan_if_stale():
+            self.blobs.collect(self.catalog.hashes())
+
+    def collect_garbage(self) -> int:
+        """Reconcile the catalog and remove blobs no document uses; returns how many."""
+        self.catalog.rescan()
+        return self.blobs.collect(self.catalog.hashes())
+
+    def validate_name(self, filename: str):
+        if not filename or filename.startswith(".") or Path(filename).name != filename:
+            raise ValueError(f"Invalid document name '{filename}'.")
 
     def save_upload(self, filename: str, content: bytes):
-        path = self.storage_dir / filename
-        with open(path, "wb") as f:
+        self.validate_name(filename)
+        tmp_dir = self.state_dir / "uploads"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp = tmp_dir / f"{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
             f.write(content)
+        return self.store_file(filename, tmp, hashlib.sha256(content).hexdigest())
+
+    def store_file(self, filename: str, source, content_hash: str = None):
+        """
+        Atomically move a fully written file into storage as `filename`.
+        Content is stored once however many names it is uploaded under, so
+        identical uploads also share their cached extraction and analysis.
+        """
+        self.validate_name(filename)
+        if content_hash is None:
+            with open(source, "rb") as f:
+                content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+        path = self.storage_dir / filename
+        previous = self.content_hash(filename) if path.is_file() else None
+        if previous != content_hash:
+            self.invalidate(filename)
+        self.blobs.store(source, content_hash, path)
+        self._catalogued.pop(filename, None)
+        st = path.stat()
+        with self._hash_lock:
+            self._hashes[str(path)] = ((st.st_mtime_ns, st.st_size, st.st_ino), content_hash)
+        self.catalog.upsert(filename, st.st_size, st.st_mtime_ns, content_hash)
+        if previous and previous != content_hash and not self.catalog.names_with_hash(previous):
+            self.blobs.discard(previous)
         return str(path)
 
+    def invalidate(self, filename: str):
+        """Forget cached results for a document about to change."""
+        path = self.storage_dir / filename
+        if not path.is_file():
+            return
+        content_hash = self.content_hash(filename)
+        # Other names with the same content still use its extraction
+        if not set(self.catalog.names_with_hash(content_hash)) - {filename}:
+            key = ExtractionCache.make_key(content_hash)
+            self.cache.discard(key)
+            self.cache.discard_pages(key)
+        with self._hash_lock:
+            self._hashes.pop(str(path), None)
+        self.search.remove(filename)
+        self._indexed.pop(filename, None)
+
+    def content_hash(self, filename: str) -> str:
+        path = self.storage_dir / filename
+        st = path.stat()
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._hash_lock:
+            known = self._hashes.get(str(path))
+        if known and known[0] == signature:
+            return known[1]
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        with self._hash_lock:
+            self._hashes[str(path)] = (signature, digest)
+        return digest
+
     def extract_text(self, filename: str):
+        return self.extract(filename)["text"]
+
+    def extract(self, filename: str):
+        """
+        Extract a document, returning a dict with its "text", the
+        "page_offsets" at which each page (or image frame) starts in that
+        text, the indexes of the "ocr_pages" that had to be OCR'd and, for
+        PDFs and DOCX files, the offsets of the lines layout marks as
+        "headings".
+        """
         path = self.storage_dir / filename
         if not path.exists():
             raise FileNotFoundError(f"Document {filename} not found.")
 
         ext = path.suffix.lower()
+        if not is_supported(ext):
+            return {"text": f"[Unsupported file type: {ext}]", "page_offsets": [0]}
+        if ext == ".txt":
+            # Reading the file is as cheap as reading a cache entry.
+            entry = self._extract(path, ext)
+            self._record_extraction(filename, self.content_hash(filename), "extracted", entry)
+            self._index(filename, self.content_hash(filename), entry)
+            return entry
+
+        content_hash = self.content_hash(filename)
+        key = ExtractionCache.make_key(content_hash)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self._record_extraction(filename, content_hash, "extracted", entry)
+            self._index(filename, content_hash, entry)
+            return entry
+
+        if ext in IMAGE_EXTENSIONS:
+            try:
+                entry = self._extract(path, ext)
+            except Exception as e:
+                self._record_extraction(filename, content_hash, "failed")
+                return {"text": f"Error performing OCR on image: {str(e)}", "page_offsets": [0]}
+        else:
+            try:
+                entry = self._extract(path, ext)
+            except Exception:
+                self._record_extraction(filename, content_hash, "failed")
+                raise
+
+        self._completed(filename, content_hash, key, entry)
+        return entry
+
+    def _completed(self, filename: str, content_hash: str, key: str, entry: dict):
+        # Failed or timed-out OCR pages are retried on the next call.
+        if entry.get("ocr_errors"):
+            self._record_extraction(filename, content_hash, "partial", entry)
+        else:
+            self.cache.put(key, entry)
+            self._record_extraction(filename, content_hash, "extracted", entry)
+            self._index(filename, content_hash, entry)
+
+    def iter_text(self, filename: str):
+        """
+        Yield a document's text as (offset, text) chunks, one per page where
+        the document has pages. Uncached large PDFs are extracted (and
+        OCR'd) a few pages at a time, so the consumer can stop early. Pages
+        read are cached one by one and, once a stream reaches the end, the
+        whole extraction is cached like extract's.
+        """
+        path = self.storage_dir / filename
+        if not path.exists():
+            raise FileNotFoundError(f"Document {filename} not found.")
+        ext = path.suffix.lower()
         if ext == ".txt":
             with open(path, "r", encoding="utf-8") as f:
-                return f.read()
-        elif ext == ".pdf":
-            text = ""
-            with pdfplumber.open(path) as pdf:
-                for page in pdf.pages:
-                    # Try digital text extraction first
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                    else:
-                        # Fallback to OCR if page contains no digital text
-                        # Note: user needs tesseract installed on the system
-                        try:
-                            # Convert PDF page to image (requires extra deps like pdf2image ideally, 
-                            # but simple pytesseract.image_to_string works on image objects)
-                            # For simplicity in this demo without heavy pdf2image/poppler:
-                            # We advise user to upload images for OCR or rely on digital PDFs.
-                            # Real production code would use 'pdf2image' here.
-                            text += "[OCR not fully implemented for PDF without system deps, please upload PNG/JPG for OCR test.]\n"
-                        except Exception:
-                            pass
-                            
-            return text
-        elif ext == ".docx":
-            doc = docx.Document(path)
-            return "\n".join([para.text for para in doc.paragraphs])
-        elif ext in [".png", ".jpg", ".jpeg", ".tiff", ".bmp"]:
-             try:
-                 image = Image.open(path)
-                 text = pytesseract.image_to_string(image)
-                 return text
-             except Exception as e:
-                 return f"Error performing OCR on image: {str(e)}"
+                offset = 0
+                while chunk := f.read(STREAM_CHUNK_CHARS):
+                    yield offset, chunk
+                    offset += len(chunk)
+            return
+        if ext == ".pdf" and path.stat().st_size >= STREAM_MIN_BYTES:
+            content_hash = self.content_hash(filename)
+            key = ExtractionCache.make_key(content_hash)
+            entry = self.cache.get(key)
+            if entry is None:
+                from pdf_extraction import iter_pdf
+                entry = yield from iter_pdf(self, path, key)
+                self._completed(filename, content_hash, key, entry)
+                if not entry.get("ocr_errors"):
+                    self.cache.discard_pages(key)
+                return
         else:
-            return f"[Unsupported file type: {ext}]"
+            entry = self.extract(filename)
+        text, offsets = entry["text"], entry["page_offsets"]
+        for start, end in zip(offsets, offsets[1:] + [len(text)]):
+            yield start, text[start:end]
+
+    def headings(self, filename: str):
+        """
+        Offsets of a document's layout heading lines. Large PDFs that are
+        streamed rather than extracted have none until they are cached.
+        """
+        path = self.storage_dir / filename
+        ext = path.suffix.lower()
+        if ext not in (".pdf", ".docx"):
+            return []
+        if ext == ".pdf" and path.stat().st_size >= STREAM_MIN_BYTES:
+            entry = self.cache.get(ExtractionCache.make_key(self.content_hash(filename)))
+            return entry.get("headings", []) if entry else []
+        return self.extract(filename).get("headings", [])
+
+    def read(self, filename: str, offset: int = 0, limit: int = READ_MAX_CHARS,
+             first_page: int = None, last_page: int = None) -> dict:
+        """
+        A slice of a document's text: at most `limit` characters from
+        `offset`, within pages first_page..last_page (1-based, inclusive)
+        when given. "next_offset" continues the read, or is None once the
+        range is exhausted. Text is pulled page by page and reading stops at
+        the end of the slice, so large streamed PDFs are only extracted as
+        far as the slice reaches, and pages an earlier read reached come
+        from the cache.
+        """
+        ext = Path(filename).suffix.lower()
+        # Text files and DOCX are one page; iter_text chunks them arbitrarily
+        paged = ext == ".pdf" or ext in IMAGE_EXTENSIONS
+        if limit <= 0:
+            # An empty slice would hand back a cursor that never advances
+            raise ValueError(f"limit must be positive, got {limit}.")
+        limit = min(limit, READ_MAX_CHARS)
+        first_page = max(1, first_page or 1)
+        start = None
+        pieces = []
+        taken = 0
+        next_offset = None
+        pages = []
+        chunks = self.iter_text(filename)
+        for number, (chunk_offset, chunk) in enumerate(chunks, start=1):
+            page = number if paged else 1
+            if page < first_page:
+                continue
+            if last_page is not None and page > last_page:
+                break
+            if start is None:
+                start = max(offset, chunk_offset)
+            chunk_end = chunk_offset + len(chunk)
+            if chunk_end <= start:
+                continue
+            if taken == limit:
+                next_offset = start + taken
+                break
+            piece = chunk[max(0, start + taken - chunk_offset):start + limit - chunk_offset]
+            pieces.append(piece)
+            taken += len(piece)
+            if not pages or pages[-1] != page:
+                pages.append(page)
+            if start + taken < chunk_end:
+                next_offset = start + taken
+                break
+        chunks.close()
+        start = offset if start is None else start
+        result = {"offset": start, "end": start + taken, "text": "".join(pieces), "next_offset": next_offset}
+        if paged:
+            result["pages"] = [pages[0], pages[-1]] if pages else []
+        return result
+
+    def info(self, filename: str) -> dict:
+        """
+        Size, type, page count, extraction status and outline of a document,
+        without extracting one that has not been extracted yet. "chars" and
+        an outline of heading lines are known once the document has been
+        extracted; until then a PDF's outline is its bookmarks.
+        """
+        path = self.storage_dir / filename
+        st = path.stat()
+        ext = path.suffix.lower()
+        # Text files are never cached: reading one is as cheap as a cache entry
+        if is_supported(ext) and ext != ".txt":
+            entry = self.cache.get(ExtractionCache.make_key(self.content_hash(filename)))
+        else:
+            entry = None
+        record = self.catalog.get(filename) or {}
+        if (record.get("size"), record.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+            record = {}  # Catalogued before the file last changed
+        info = {
+            "document_id": filename,
+            "size": st.st_size,
+            "mime_type": mimetypes.guess_type(filename)[0],
+            "extraction_status": record.get("extraction_status", "pending"),
+            "page_count": None,
+            "chars": None,
+            "outline": [],
+        }
+        if entry is not None:
+            text, offsets = entry["text"], entry["page_offsets"]
+            info["page_count"] = len(offsets)
+            info["chars"] = len(text)
+            for heading in entry.get("headings", [])[:OUTLINE_MAX_ENTRIES]:
+                end = text.find("\n", heading)
+                info["outline"].append({"title": text[heading:end if end != -1 else len(text)].strip(),
+                                        "offset": heading, "page": bisect_right(offsets, heading)})
+        elif ext == ".txt":
+            info["page_count"] = 1
+        elif record.get("page_count") is not None:
+            info["page_count"] = record["page_count"]
+        elif ext == ".pdf":
+            from pdf_extraction import page_count, outline
+            info["page_count"] = page_count(path)
+            info["outline"] = outline(path, OUTLINE_MAX_ENTRIES)
+        elif ext in IMAGE_EXTENSIONS:
+            from ocr import image_frame_count
+            info["page_count"] = image_frame_count(path)
+        return info
+
+    def _record_extraction(self, filename: str, content_hash: str, status: str, entry=None):
+        # Skip the write when the catalog already has this outcome for the
+        # file as it is now; a file touched since was reset to pending by
+        # the rescan that noticed it
+        st = (self.storage_dir / filename).stat()
+        state = (content_hash, status, st.st_size, st.st_mtime_ns)
+        if self._catalogued.get(filename) == state:
+            return
+        page_count = len(entry["page_offsets"]) if entry else None
+        self.catalog.record_extraction(filename, content_hash, status, page_count, st)
+        self._catalogued[filename] = state
+
+    def _index(self, filename: str, content_hash: str, entry: dict):
+        # Complete extractions feed the search index, once per content
+        if self._indexed.get(filename) == content_hash:
+            return
+        if self.search.content_hash(filename) != content_hash:
+            self.search.add(filename, content_hash, page_texts(entry))
+        self._indexed[filename] = content_hash
+
+    def _extract(self, path: Path, ext: str):
+        # The backend for the file type, imported on its first document
+        return get_extractor(ext)(self, path)
 
 # Singleton instance
 processor = DocumentProcessor()
@@ -0,0 +1,150 @@
+import time
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from metrics import record_extraction
+from segmentation import LABEL_MAX_WORDS
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+_BLOCK_CONTAINERS = {W + "body", W + "hdr", W + "ftr"}
+CELL_SEPARATOR = " | "
+
+def extract_docx(processor, path):
+    """
+    A DOCX's text in reading order: header parts, then the body's paragraphs
+    and table rows, then footer parts, with the offsets of its Title and
+    Heading paragraphs. The XML is parsed incrementally straight from the
+    zip, so memory stays flat however long the document is.
+    """
+    started = time.perf_counter()
+    texts = []
+    headings = []
+    offset = 0
+    with zipfile.ZipFile(path) as archive:
+        heading_styles = _heading_styles(archive)
+        headers, footers = _header_footer_parts(archive)
+        seen = set()
+        for part in headers + ["word/document.xml"] + footers:
+            try:
+                stream = archive.open(part)
+            except KeyError:
+                continue
+            with stream:
+                lines = _lines(stream, heading_styles)
+                if part != "word/document.xml":
+                    # The first-page, even-page and default variants often repeat
+                    lines = tuple(lines)
+                    if not lines or lines in seen:
+                        continue
+                    seen.add(lines)
+                for text, heading in lines:
+                    if heading:
+                        headings.append(offset)
+                    texts.append(text)
+                    offset += len(text) + 1
+    record_extraction("docx", 1, time.perf_counter() - started, path.stat().st_size)
+    return {"text": "\n".join(texts), "page_offsets": [0], "headings": headings}
+
+def _heading_styles(archive) -> set:
+    """Ids of the paragraph styles named Title or Heading N."""
+    try:
+        root = ET.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return set()
+    ids = set()
+    for style in root.iter(W + "style"):
+        name = style.find(W + "name")
+        name = name.get(W + "val", "").lower() if name is not None else ""
+        if name == "title" or name.startswith("heading"):
+            ids.add(style.get(W + "styleId"))
+    return ids
+
+def _header_footer_parts(archive):
+    """Zip names of the header and footer parts the document refers to."""
+    try:
+        root = ET.fromstring(archive.read("word/_rels/document.xml.rels"))
+    except KeyError:
+        return [], []
+    parts = {"header": [], "footer": []}
+    for rel in root.iter(_RELATIONSHIP):
+        kind = rel.get("Type", "").rsplit("/", 1)[-1]
+        if kind in parts and rel.get("TargetMode") != "External":
+            target = rel.get("Target", "")
+            name = target.lstrip("/") if target.startswith("/") else posixpath.join("word", target)
+            parts[kind].append(posixpath.normpath(name))
+    return parts["header"], parts["footer"]
+
+def _row_text(cells) -> str:
+    cells = [cell for cell in cells if cell]
+    # A label cell and its value read like the "Label: value" lines rules expect
+    if len(cells) == 2 and len(cells[0].split()) <= LABEL_MAX_WORDS and not cells[0].endswith("."):
+        return f"{cells[0].rstrip(':').rstrip()}: {cells[1]}"
+    return CELL_SEPARATOR.join(cells)
+
+class _Table:
+    def __init__(self):
+        self.cell = []  # paragraphs of the open cell
+        self.row = []   # texts of the open row's cells
+        self.rows = []  # texts of the finished rows, for nested tables
+
+def _lines(stream, heading_styles):
+    """
+    Yield (text, is heading) for each paragraph and table row of a part, in
+    document order. Finished blocks are dropped from the tree as they are read.
+    """
+    paragraphs = []  # run texts of the open paragraphs (text boxes nest them)
+    styles = []
+    tables = []
+    container = None
+    for event, elem in ET.iterparse(stream, ("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == W + "p":
+                paragraphs.append([])
+                styles.append(None)
+            elif tag == W + "tbl":
+                tables.append(_Table())
+            elif tag in _BLOCK_CONTAINERS:
+                container = elem
+            continue
+
+        if not paragraphs and tag not in (W + "tbl", W + "tc", W + "tr"):
+            continue
+        if tag == W + "t":
+            paragraphs[-1].append(elem.text or "")
+        elif tag == W + "tab":
+            # Tab stops in paragraph properties have a position; tabs in runs do not
+            if W + "pos" not in elem.attrib:
+                paragraphs[-1].append("\t")
+        elif tag in (W + "br", W + "cr"):
+            if elem.get(W + "type") in (None, "textWrapping"):
+                paragraphs[-1].append("\n")
+        elif tag == W + "pStyle":
+            styles[-1] = elem.get(W + "val")
+        elif tag == W + "p":
+            text = "".join(paragraphs.pop())
+            style = styles.pop()
+            if tables:
+                tables[-1].cell.append(text)
+            else:
+                yield text, style in heading_styles
+        elif tag == W + "tc":
+            table = tables[-1]
+            table.row.append(" ".join(p.strip() for p in table.cell if p.strip()))
+            table.cell = []
+        elif tag == W + "tr":
+            table = tables[-1]
+            line = _row_text(table.row)
+            table.row = []
+            if len(tables) == 1:
+                yield line, False
+            else:
+                table.rows.append(line)
+        elif tag == W + "tbl":
+            table = tables.pop()
+            if tables:
+                tables[-1].cell.extend(table.rows)
+        if container is not None and not paragraphs and not tables:
+            # A whole block has been read; keep the tree from growing
+            container.clear()
@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Bump whenever extraction output changes so stale cache entries are ignored.
+EXTRACTOR_VERSION = "5"
+EXTRACTION_CACHE_MEMORY_BYTES = int(os.environ.get("EXTRACTION_CACHE_MEMORY_MB", "64")) * 1024 * 1024
+
+class ExtractionCache:
+    """
+    Two-tier cache of extraction results keyed by content hash.
+
+    The memory tier is an LRU bounded by the approximate size of the cached
+    text. The disk tier keeps the text and its metadata as separate files,
+    written atomically, so results survive restarts and are shared by every
+    process using the same storage directory.
+    """
+
+    def __init__(self, cache_dir, max_memory_bytes: int = EXTRACTION_CACHE_MEMORY_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_bytes = max_memory_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(content_hash: str) -> str:
+        return f"v{EXTRACTOR_VERSION}-{content_hash}"
+
+    @staticmethod
+    def page_key(key: str, page: int) -> str:
+        """Key of one page of a document that is being streamed, under its document's key."""
+        return f"{key}.p{page}"
+
+    def _paths(self, key: str):
+        # Page entries share their document's shard
+        shard = self.cache_dir / key.split(".")[0][-2:]
+        return shard / f"{key}.txt", shard / f"{key}.json"
+
+    @staticmethod
+    def _entry_size(entry: dict) -> int:
+        return sys.getsizeof(entry["text"])
+
+    def _remember(self, key: str, entry: dict):
+        size = self._entry_size(entry)
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= self._entry_size(old)
+            self._memory[key] = entry
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= self._entry_size(evicted)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        text_path, meta_path = self._paths(key)
+        try:
+            # The metadata file is written last, so its presence marks a
+            # complete entry.
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(text_path, "r", encoding="utf-8", newline="") as f:
+                entry["text"] = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: dict):
+        self._remember(key, entry)
+        text_path, meta_path = self._paths(key)
+        text_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {k: v for k, v in entry.items() if k != "text"}
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        _write_atomic(text_path, entry["text"], suffix)
+        _write_atomic(meta_path, json.dumps(meta), suffix)
+
+    def discard(self, key: str):
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= self._entry_size(entry)
+        text_path, meta_path = self._paths(key)
+        for path in (meta_path, text_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def discard_pages(self, key: str):
+        """Drop the page entries kept for a document while it was streamed."""
+        prefix = f"{key}.p"
+        with self._lock:
+            for page_key in [k for k in self._memory if k.startswith(prefix)]:
+                self._memory_bytes -= self._entry_size(self._memory.pop(page_key))
+        for path in self._paths(key)[0].parent.glob(f"{prefix}*"):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+def _write_atomic(path: Path, data: str, suffix: str):
+    tmp = path.with_name(path.name + suffix)
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -0,0 +1,85 @@
+import time
+import threading
+import importlib
+from metrics import record_extraction
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".tiff", ".bmp"]
+
+# extension -> "module:function" of the extractor for that file type. Modules
+# are imported on first use, so backends a server never needs are never loaded.
+_targets = {}
+_loaded = {}
+_lock = threading.Lock()
+# module -> seconds its first import took
+import_seconds = {}
+
+def register(extensions, target: str):
+    """
+    Route files with these extensions to `target`, a "module:function"
+    taking (processor, path) and returning the extraction entry.
+    """
+    with _lock:
+        for ext in extensions:
+            _targets[ext.lower()] = target
+            _loaded.pop(ext.lower(), None)
+
+def is_supported(ext: str) -> bool:
+    return ext in _targets
+
+def _import(module_name: str):
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    with _lock:
+        import_seconds.setdefault(module_name, round(time.perf_counter() - started, 4))
+    return module
+
+def get_extractor(ext: str):
+    """The extractor for a file extension, importing its module if needed, or None."""
+    extractor = _loaded.get(ext)
+    if extractor is None:
+        target = _targets.get(ext)
+        if target is None:
+            return None
+        module_name, name = target.split(":")
+        extractor = getattr(_import(module_name), name)
+        with _lock:
+            _loaded[ext] = extractor
+    return extractor
+
+def preload():
+    """
+    Import every registered backend now rather than on its first document,
+    along with anything a backend defers to its own preload().
+    """
+    modules = set()
+    for ext in list(_targets):
+        modules.add(get_extractor(ext).__module__)
+    for module_name in sorted(modules):
+        started = time.perf_counter()
+        hook = getattr(importlib.import_module(module_name), "preload", None)
+        if hook is not None and hook is not preload:
+            hook()
+            with _lock:
+                import_seconds[module_name] += round(time.perf_counter() - started, 4)
+
+def join_pages(page_texts):
+    """Join page texts with one newline after each page, returning (text, page_offsets)."""
+    offsets = []
+    position = 0
+    for page_text in page_texts:
+        offsets.append(position)
+        position += len(page_text) + 1
+    text = "\n".join(page_texts) + "\n" if page_texts else ""
+    return text, offsets
+
+def extract_plain_text(processor, path):
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    record_extraction("text", 1, time.perf_counter() - started, path.stat().st_size)
+    return {"text": text, "page_offsets": [0]}
+
+register([".txt"], "extractors:extract_plain_text")
+register([".pdf"], "pdf_extraction:extract_pdf")
+register([".docx"], "docx_extraction:extract_docx")
+register(IMAGE_EXTENSIONS, "ocr:extract_image")
@@ -0,0 +1,171 @@
+import re
+import threading
+from collections import deque
+
+# Weight each triggered criterion contributes to the overall risk score.
+RISK_LEVEL_WEIGHTS = {"Low": 0.2, "Medium": 0.5, "High": 0.8, "Critical": 1.0}
+# Offsets reported per criterion; hit counts are always complete.
+MAX_OFFSETS_PER_CRITERION = 20
+
+def lower_aligned(text: str) -> str:
+    """Lower-case text without changing its length, so offsets stay valid."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a set of lower-case strings.
+
+    The trie and failure links are compiled into a DFA (one dict of
+    transitions per state), so scanning is a single dict lookup per character:
+    linear in the text no matter how many patterns there are.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [{}]
+        outputs = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        # Breadth-first: a state's failure target is always finished before it
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])]
+        delta.extend({} for _ in range(len(goto) - 1))
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            transitions = dict(delta[fail[state]])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+                transitions[ch] = nxt
+                queue.append(nxt)
+            delta[state] = transitions
+        self._delta = delta
+        self._outputs = [tuple(out) for out in outputs]
+        # Characters that leave the root state; everything else can be skipped
+        self._first = re.compile("[%s]" % "".join(re.escape(ch) for ch in goto[0])) if goto[0] else None
+
+    def iter_matches(self, lowered: str, start: int = 0):
+        """Yield (start, end, pattern_index) for every occurrence, overlaps included."""
+        if self._first is None:
+            return
+        delta = self._delta
+        outputs = self._outputs
+        patterns = self.patterns
+        first = self._first.search
+        root = delta[0]
+        state = 0
+        i = start
+        n = len(lowered)
+        while i < n:
+            if state == 0:
+                jump = first(lowered, i)
+                if jump is None:
+                    return
+                i = jump.start()
+                state = root[lowered[i]]
+            else:
+                state = delta[state].get(lowered[i], 0)
+            if outputs[state]:
+                for index in outputs[state]:
+                    yield i + 1 - len(patterns[index]), i + 1, index
+            i += 1
+
+class RubricMatcher:
+    """All indicators of all criteria of a rubric, matched in one pass."""
+
+    def __init__(self, rubric: dict):
+        self.rubric_id = rubric.get("rubric_id")
+        self.criteria = rubric.get("criteria", [])
+        keys = []
+        strings = []
+        for criterion in self.criteria:
+            for indicator in criterion.get("indicators", []) or []:
+                if indicator:
+                    keys.append((criterion.get("id"), indicator))
+                    strings.append(indicator.lower())
+        self._keys = keys
+        self.automaton = AhoCorasick(strings)
+
+    def scan(self, text: str):
+        """
+        Return {criterion_id: {"hits": count, "matches": [...]}} for every
+        criterion. Indicators only count as whole words or phrases.
+        """
+        return self.scan_stream([(0, text)])
+
+    def scan_stream(self, chunks):
+        """
+        Like scan, over an iterable of (offset, text) chunks. Each chunk is
+        scanned behind the tail of the previous one, long enough to hold any
+        indicator and the character before it, so matches that straddle chunk
+        boundaries are found exactly once.
+        """
+        results = {c.get("id"): {"hits": 0, "matches": []} for c in self.criteria}
+        keep = max((len(p) for p in self.automaton.patterns), default=0) + 1
+        tail = ""
+        base = 0  # Document offset of tail[0]
+        counted = 0  # Matches ending at or before this offset are done
+        for _, chunk in chunks:
+            window = tail + lower_aligned(chunk)
+            self._count(window, base, counted, False, results)
+            counted = base + len(window) - 1
+            tail = window[-keep:]
+            base += len(window) - len(tail)
+        self._count(tail, base, counted, True, results)
+        return results
+
+    def _count(self, lowered: str, base: int, counted: int, final: bool, results):
+        n = len(lowered)
+        for start, end, index in self.automaton.iter_matches(lowered):
+            if base + end <= counted:
+                continue
+            if end == n and not final:
+                # The next chunk decides whether this ends on a word boundary
+                continue
+            if start > 0 and lowered[start - 1].isalnum():
+                continue
+            if end < n and lowered[end].isalnum():
+                continue
+            criterion_id, indicator = self._keys[index]
+            result = results[criterion_id]
+            result["hits"] += 1
+            if len(result["matches"]) < MAX_OFFSETS_PER_CRITERION:
+                result["matches"].append({"indicator": indicator, "start": base + start, "end": base + end})
+
+def risk_score(levels) -> float:
+    """Combine triggered risk levels into a 0-1 score (noisy-OR of level weights)."""
+    remaining = 1.0
+    for level in levels:
+        remaining *= 1.0 - RISK_LEVEL_WEIGHTS.get(level, 0.5)
+    return round(1.0 - remaining, 3)
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+def compile_rubric(rubric: dict, version=None) -> RubricMatcher:
+    """Matcher for a rubric, rebuilt only when the rubric's version changes."""
+    key = (rubric.get("rubric_id"), version)
+    with _compiled_lock:
+        matcher = _compiled.get(key)
+    if matcher is None or version is None:
+        matcher = RubricMatcher(rubric)
+        if version is not None:
+            with _compiled_lock:
+                for old in [k for k in _compiled if k[0] == key[0]]:
+                    del _compiled[old]
+                _compiled[key] = matcher
+    return matcher
@@ -0,0 +1,359 @@
+import os
+import json
+import time
+import socket
+import threading
+from pathlib import Path
+from catalog import connect
+
+# Threads per server process working through the ingestion queue (0 turns
+# background ingestion off; uploads are then indexed inside the call).
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "1"))
+# Attempts a job gets before it is marked failed; retries back off from
+# INGEST_RETRY_SECONDS, doubling each time.
+INGEST_MAX_ATTEMPTS = int(os.environ.get("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_SECONDS = float(os.environ.get("INGEST_RETRY_SECONDS", "30"))
+# A running job whose worker has not reported for this long (e.g. its
+# process was killed) is picked up again by another worker.
+INGEST_LEASE_SECONDS = float(os.environ.get("INGEST_LEASE_SECONDS", "900"))
+# Seconds a tool call waits for a running job to produce what it needs
+# before doing the work itself.
+INGEST_WAIT_SECONDS = float(os.environ.get("INGEST_WAIT_SECONDS", "600"))
+# Template and rubric pre-run on every upload ("" skips that stage).
+INGEST_TEMPLATE = os.environ.get("INGEST_TEMPLATE", "loan_application_v1")
+INGEST_RUBRIC = os.environ.get("INGEST_RUBRIC", "loan_risk_v1")
+
+# Seconds an idle worker waits before looking for work queued by another process.
+POLL_SECONDS = 1.0
+# Seconds between sweeps of results for content no document has any more.
+PRUNE_INTERVAL_SECONDS = 3600
+# Seconds between looks for stored documents that were never queued, such
+# as files copied onto the data volume.
+DISCOVER_INTERVAL_SECONDS = 30
+# Documents queued per look at most; the rest are found by the next looks.
+DISCOVER_BATCH = 1000
+# Priority of discovered documents; uploads (0 by default) go first.
+DISCOVERED_PRIORITY = -1
+
+STATUSES = ["queued", "running", "done", "failed"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    stage TEXT,
+    stages_done INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker TEXT,
+    enqueued_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, enqueued_at);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    output TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_hash ON results (content_hash);
+"""
+
+class IngestError(Exception):
+    """A stage failed in a way that retrying cannot fix, unless `retry` is set."""
+
+    def __init__(self, message: str, retry: bool = False):
+        super().__init__(message)
+        self.retry = retry
+
+class IngestQueue:
+    """
+    Persistent queue of documents to pre-process, and the tool outputs
+    computed for them, in SQLite.
+
+    There is one job per document name; uploading the name again resets it.
+    Jobs are claimed atomically, so worker threads of every server process
+    can share the queue, and a job left running by a process that died is
+    claimed again once its lease runs out. The database is only created by
+    the first enqueue.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+
+    def _db(self, create: bool = True):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not create and not self.db_path.exists():
+                return None
+            conn = self._local.conn = connect(self.db_path, _SCHEMA)
+        return conn
+
+    def enqueue(self, name: str, content_hash: str, priority: int = 0):
+        """Queue a document for processing; higher priorities are processed first."""
+        now = time.time()
+        self._db().execute(
+            """INSERT INTO jobs (name, content_hash, priority, status, enqueued_at, run_after)
+               VALUES (?, ?, ?, 'queued', ?, ?)
+               ON CONFLICT(name) DO UPDATE SET
+                   content_hash=excluded.content_hash, priority=excluded.priority, status='queued',
+                   stage=NULL, stages_done=0, attempts=0, error=NULL, worker=NULL,
+                   enqueued_at=excluded.enqueued_at, run_after=excluded.run_after,
+                   lease_until=NULL, finished_at=NULL""",
+            (name, content_hash, priority, now, now),
+        )
+
+    def enqueue_new(self, documents, priority: int = DISCOVERED_PRIORITY) -> int:
+        """Queue the (name, content hash) pairs that have no job for that content; returns how many."""
+        now = time.time()
+        db = self._db()
+        queued = 0
+        for name, content_hash in documents:
+            queued += db.execute(
+                """INSERT INTO jobs (name, content_hash, priority, status, enqueued_at, run_after)
+                   VALUES (?, ?, ?, 'queued', ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET
+                       content_hash=excluded.content_hash, priority=excluded.priority, status='queued',
+                       stage=NULL, stages_done=0, attempts=0, error=NULL, worker=NULL,
+                       enqueued_at=excluded.enqueued_at, run_after=excluded.run_after,
+                       lease_until=NULL, finished_at=NULL
+                   WHERE jobs.content_hash != excluded.content_hash""",
+                (name, content_hash, priority, now, now),
+            ).rowcount
+        return queued
+
+    def wait(self, name: str, content_hash: str, stages_done: int, timeout: float = INGEST_WAIT_SECONDS,
+             poll: float = 0.2):
+        """
+        Block while this content's job is running and has not yet finished
+        `stages_done` stages, for at most `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.status(name)
+            if (job is None or job["content_hash"] != content_hash or job["status"] != "running"
+                    or job["stages_done"] >= stages_done or job["lease_until"] < time.time()
+                    or time.monotonic() >= deadline):
+                return
+            time.sleep(poll)
+
+    def claim(self, worker: str):
+        """Take the most urgent job that is ready to run, or return None."""
+        db = self._db(create=False)
+        if db is None:
+            return None
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                """UPDATE jobs SET status='failed', error='Worker stopped before finishing.',
+                       finished_at=? WHERE status='running' AND lease_until < ? AND attempts >= ?""",
+                (now, now, INGEST_MAX_ATTEMPTS),
+            )
+            row = db.execute(
+                """SELECT name, content_hash FROM jobs
+                   WHERE (status='queued' AND run_after <= ?) OR (status='running' AND lease_until < ?)
+                   ORDER BY priority DESC, enqueued_at LIMIT 1""",
+                (now, now),
+            ).fetchone()
+            if row:
+                db.execute(
+                    """UPDATE jobs SET status='running', attempts=attempts+1, stage=NULL,
+                           stages_done=0, worker=?, lease_until=? WHERE name=?""",
+                    (worker, now + INGEST_LEASE_SECONDS, row["name"]),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return dict(row) if row else None
+
+    def progress(self, name: str, content_hash: str, stage: str, stages_done: int) -> bool:
+        """
+        Record the stage a job is starting and renew its lease. False when the
+        job was superseded by a new upload of the document.
+        """
+        return self._update(name, content_hash, "stage=?, stages_done=?, lease_until=?",
+                            (stage, stages_done, time.time() + INGEST_LEASE_SECONDS))
+
+    def finish(self, name: str, content_hash: str, stages_done: int):
+        self._update(name, content_hash, "status='done', stage=NULL, stages_done=?, finished_at=?",
+                     (stages_done, time.time()))
+
+    def fail(self, name: str, content_hash: str, error: str, retry: bool = True):
+        """Retry a failed job after a back-off, or give up once it has had every attempt."""
+        row = self._db().execute("SELECT attempts FROM jobs WHERE name=? AND content_hash=?",
+                                 (name, content_hash)).fetchone()
+        if row is None:
+            return
+        if retry and row["attempts"] < INGEST_MAX_ATTEMPTS:
+            delay = INGEST_RETRY_SECONDS * 2 ** (row["attempts"] - 1)
+            self._update(name, content_hash, "status='queued', error=?, run_after=?",
+                         (error, time.time() + delay))
+        else:
+            self._update(name, content_hash, "status='failed', error=?, finished_at=?",
+                         (error, time.time()))
+
+    def _update(self, name: str, content_hash: str, assignments: str, params) -> bool:
+        cursor = self._db().execute(
+            f"UPDATE jobs SET {assignments} WHERE name=? AND content_hash=? AND status='running'",
+            (*params, name, content_hash),
+        )
+        return cursor.rowcount > 0
+
+    def status(self, name: str):
+        """A document's job, with its place in the queue while it waits, or None."""
+        db = self._db(create=False)
+        if db is None:
+            return None
+        row = db.execute("SELECT * FROM jobs WHERE name=?", (name,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] == "queued":
+            job["queue_position"] = db.execute(
+                """SELECT COUNT(*) FROM jobs WHERE status='queued'
+                   AND (priority > ? OR (priority = ? AND enqueued_at < ?))""",
+                (job["priority"], job["priority"], job["enqueued_at"]),
+            ).fetchone()[0] + 1
+        return job
+
+    def counts(self) -> dict:
+        """Number of jobs in each status."""
+        counts = dict.fromkeys(STATUSES, 0)
+        db = self._db(create=False)
+        if db is not None:
+            for status, count in db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = count
+        return counts
+
+    @staticmethod
+    def _key(key) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def put_result(self, content_hash: str, key, output: str):
+        """Keep a tool output computed ahead of time; `key` is its result cache key."""
+        self._db().execute(
+            "INSERT OR REPLACE INTO results (key, content_hash, output, created_at) VALUES (?, ?, ?, ?)",
+            (self._key(key), content_hash, output, time.time()),
+        )
+
+    def result(self, key):
+        """A precomputed tool output, or None."""
+        db = self._db(create=False)
+        if db is None:
+            return None
+        row = db.execute("SELECT output FROM results WHERE key=?", (self._key(key),)).fetchone()
+        return row[0] if row else None
+
+    def prune(self, referenced):
+        """Drop results and finished jobs of content no document has any more."""
+        db = self._db(create=False)
+        if db is None:
+            return
+        referenced = set(referenced)
+        for table, finished in (("results", ""), ("jobs", " AND status IN ('done', 'failed')")):
+            stale = [row[0] for row in db.execute(f"SELECT DISTINCT content_hash FROM {table}")
+                     if row[0] not in referenced]
+            for content_hash in stale:
+                db.execute(f"DELETE FROM {table} WHERE content_hash=?{finished}", (content_hash,))
+
+class IngestWorkers:
+    """
+    Threads that take jobs off an IngestQueue and run each document through
+    `stages`, a list of (name, function(document_id, content_hash)). A stage
+    that raises fails the job: IngestError without `retry` and a missing
+    document fail it for good, anything else is retried. `referenced`, when
+    given, returns the content hashes still stored, for pruning results;
+    `discover` returns (name, content hash) pairs of stored documents, which
+    are queued when they have no job yet.
+    """
+
+    def __init__(self, queue: IngestQueue, stages, referenced=None, discover=None):
+        self.queue = queue
+        self.stages = stages
+        self.referenced = referenced
+        self.discover = discover
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._last_prune = time.monotonic()
+        self._last_discover = time.monotonic()
+        self._idle_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, count: int = INGEST_WORKERS):
+        self._stop.clear()
+        for i in range(count):
+            thread = threading.Thread(target=self._run, args=(f"{socket.gethostname()}:{os.getpid()}:{i}",),
+                                      name=f"ingest-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5):
+        """Stop taking jobs; one still running is resumed by a worker after its lease."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake an idle worker after a job was queued in this process."""
+        self._wake.set()
+
+    def _run(self, worker: str):
+        while not self._stop.is_set():
+            if not self.run_once(worker):
+                self._idle()
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+
+    def _idle(self):
+        # One worker at a time does the housekeeping
+        if not self._idle_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if self.discover is not None and now - self._last_discover >= DISCOVER_INTERVAL_SECONDS:
+                self._last_discover = now
+                if self.queue.enqueue_new(self.discover()):
+                    self._wake.set()
+            if self.referenced is not None and now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                self._last_prune = now
+                if self.queue.db_path.exists():
+                    self.queue.prune(self.referenced())
+        except Exception:
+            pass  # Retried at the next interval; the workers keep going
+        finally:
+            self._idle_lock.release()
+
+    def run_once(self, worker: str = "main") -> bool:
+        """Process the next ready job; False when there was none."""
+        job = self.queue.claim(worker)
+        if job is None:
+            return False
+        name, content_hash = job["name"], job["content_hash"]
+        stage = None
+        try:
+            for done, (stage, fn) in enumerate(self.stages):
+                if not self.queue.progress(name, content_hash, stage, done):
+                    return True  # Uploaded again meanwhile; the new job starts over
+                fn(name, content_hash)
+        except FileNotFoundError:
+            self.queue.fail(name, content_hash, "Document not found.", retry=False)
+        except IngestError as e:
+            self.queue.fail(name, content_hash, f"{stage}: {e}", retry=e.retry)
+        except Exception as e:
+            self.queue.fail(name, content_hash, f"{stage}: {type(e).__name__}: {e}")
+        else:
+            self.queue.finish(name, content_hash, len(self.stages))
+        return True
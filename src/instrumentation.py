@@ -0,0 +1,49 @@
+import time
+from fastmcp.server.middleware import Middleware
+from metrics import IN_FLIGHT, REQUESTS, REQUEST_BYTES, REQUEST_SECONDS, RESPONSE_BYTES
+
+def _utf8_size(text: str) -> int:
+    # isascii() is O(1) in CPython, so only non-ASCII text is encoded to count its bytes
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+
+def _argument_bytes(arguments) -> int:
+    return sum(_utf8_size(value) for value in (arguments or {}).values() if isinstance(value, str))
+
+def _tool_text(result) -> str:
+    return "".join(getattr(block, "text", "") for block in getattr(result, "content", None) or [])
+
+def _resource_text(result) -> str:
+    parts = [getattr(item, "content", "") for item in result or []]
+    return "".join(part for part in parts if isinstance(part, str))
+
+class MetricsMiddleware(Middleware):
+    """
+    Times every tool call and resource read and counts its outcome: "error"
+    for the "Error..." strings handlers return, "exception" when one raises.
+    """
+
+    async def on_call_tool(self, context, call_next):
+        arguments = context.message.arguments
+        return await self._measure("tool", context.message.name, _argument_bytes(arguments),
+                                   call_next, context, _tool_text)
+
+    async def on_read_resource(self, context, call_next):
+        # Query parameters would make every paged listing its own series
+        uri = str(context.message.uri).split("?", 1)[0]
+        return await self._measure("resource", uri, 0, call_next, context, _resource_text)
+
+    async def _measure(self, kind, name, request_bytes, call_next, context, text_of):
+        IN_FLIGHT.inc(kind=kind, name=name)
+        REQUEST_BYTES.inc(request_bytes, kind=kind, name=name)
+        started = time.perf_counter()
+        outcome = "exception"
+        try:
+            result = await call_next(context)
+            text = text_of(result)
+            RESPONSE_BYTES.inc(_utf8_size(text), kind=kind, name=name)
+            outcome = "error" if text.startswith("Error") else "ok"
+            return result
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, kind=kind, name=name)
+            REQUESTS.inc(kind=kind, name=name, outcome=outcome)
+            IN_FLIGHT.dec(kind=kind, name=name)
@@ -0,0 +1,178 @@
+import math
+import threading
+
+# Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labels, key), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labels, key, [("le", _format_value(bound))]), cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labels, key), total
+            yield f"{self.name}_count", _format_labels(self.labels, key), count
+
+class Callback(_Metric):
+    """A metric whose values are read from `collect()` -> {label values: value} at scrape time."""
+
+    def __init__(self, name: str, help: str, type: str, collect, labels=()):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        for key, value in sorted(self.collect().items()):
+            yield self.name, _format_labels(self.labels, key), value
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a module imported under two names) reuses the metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels=()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, type: str, collect, labels=()) -> Callback:
+        with self._lock:
+            # The latest callback wins, so it always reads the live objects
+            metric = self._metrics[name] = Callback(name, help, type, collect, labels)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "idp_request_duration_seconds", "Latency of MCP tool calls and resource reads.", ("kind", "name"))
+REQUESTS = REGISTRY.counter(
+    "idp_requests_total", "MCP tool calls and resource reads by outcome (ok, error, exception).",
+    ("kind", "name", "outcome"))
+IN_FLIGHT = REGISTRY.gauge(
+    "idp_requests_in_flight", "MCP tool calls and resource reads currently running.", ("kind", "name"))
+REQUEST_BYTES = REGISTRY.counter(
+    "idp_request_bytes_total", "UTF-8 bytes of string arguments received.", ("kind", "name"))
+RESPONSE_BYTES = REGISTRY.counter(
+    "idp_response_bytes_total", "UTF-8 bytes of text returned.", ("kind", "name"))
+
+EXTRACTOR_PAGES = REGISTRY.counter(
+    "idp_extractor_pages_total",
+    "Pages extracted (frames for images, documents for docx and txt).", ("extractor",))
+EXTRACTOR_SECONDS = REGISTRY.counter(
+    "idp_extractor_seconds_total", "Wall time spent in each extractor.", ("extractor",))
+EXTRACTOR_BYTES = REGISTRY.counter(
+    "idp_extractor_input_bytes_total", "Bytes of documents read by each extractor.", ("extractor",))
+EXTRACTOR_ERRORS = REGISTRY.counter(
+    "idp_extractor_errors_total", "Pages or documents an extractor failed on.", ("extractor",))
+
+def record_extraction(extractor: str, pages: int, seconds: float, input_bytes: int = 0, errors: int = 0):
+    EXTRACTOR_PAGES.inc(pages, extractor=extractor)
+    EXTRACTOR_SECONDS.inc(seconds, extractor=extractor)
+    if input_bytes:
+        EXTRACTOR_BYTES.inc(input_bytes, extractor=extractor)
+    if errors:
+        EXTRACTOR_ERRORS.inc(errors, extractor=extractor)
@@ -0,0 +1,130 @@
+import os
+import time
+from typing import NamedTuple
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from workers import CPU_SHARE, get_process_pool, discard_process_pool
+from extractors import join_pages
+from metrics import record_extraction
+
+# pytesseract, PIL and pdfplumber are imported where they are used, so a
+# server that never OCRs never loads them.
+
+# Bounded pool for Tesseract jobs. 0 sizes it to the host; 1 runs OCR in-process.
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "0")) or CPU_SHARE
+# Extra seconds a worker gets on top of the Tesseract timeout to rasterize a page.
+RASTERIZE_GRACE = 30
+
+class OCROptions(NamedTuple):
+    dpi: int = int(os.environ.get("OCR_DPI", "300"))
+    lang: str = os.environ.get("OCR_LANG", "eng")
+    psm: int = int(os.environ.get("OCR_PSM", "3"))
+    # Seconds before Tesseract is killed on a single page or frame.
+    timeout: float = float(os.environ.get("OCR_PAGE_TIMEOUT", "120"))
+
+class OCRError(Exception):
+    pass
+
+def preload():
+    """Import the OCR libraries ahead of the first page that needs them."""
+    import pdfplumber, pytesseract
+    from PIL import Image
+
+def _init_worker():
+    # Tesseract is itself multi-threaded; one thread per worker avoids
+    # oversubscribing the host when the pool is already parallel.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+def _tesseract(image, options: OCROptions):
+    import pytesseract
+    try:
+        return pytesseract.image_to_string(
+            image, lang=options.lang, config=f"--psm {options.psm}", timeout=options.timeout
+        )
+    except (pytesseract.TesseractNotFoundError, pytesseract.TesseractError) as e:
+        # pytesseract's exceptions cannot be unpickled, which would break the
+        # pool when they travel back from a worker.
+        raise OCRError(str(e)) from None
+    except RuntimeError as e:
+        # pytesseract reports a killed process as a plain RuntimeError
+        if "timeout" in str(e).lower():
+            raise OCRError(f"timed out after {options.timeout:g}s") from None
+        raise
+
+def ocr_pdf_page(path, page_index: int, options: OCROptions):
+    """Rasterize one PDF page with pdfplumber (pdfium, no poppler needed) and OCR it."""
+    import pdfplumber
+    with pdfplumber.open(path, pages=[page_index + 1]) as pdf:
+        page = pdf.pages[0]
+        image = page.to_image(resolution=options.dpi).original
+        page.close()
+    return _tesseract(image, options)
+
+def ocr_image_frame(path, frame: int, options: OCROptions):
+    from PIL import Image
+    with Image.open(path) as image:
+        image.seek(frame)
+        return _tesseract(image.copy(), options)
+
+def image_frame_count(path) -> int:
+    from PIL import Image
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+def run_ocr_jobs(jobs, options: OCROptions, workers: int = OCR_WORKERS):
+    """
+    Run (function, path, index) OCR jobs and return their results in order.
+    A failed or timed-out job yields its exception instead of text, so one bad
+    page cannot sink the rest of the document.
+    """
+    if workers <= 1 or len(jobs) == 0:
+        return [_run_inline(fn, path, index, options) for fn, path, index in jobs]
+
+    pool = get_process_pool("ocr", workers, initializer=_init_worker)
+    try:
+        futures = [pool.submit(fn, str(path), index, options) for fn, path, index in jobs]
+    except BrokenProcessPool:
+        discard_process_pool("ocr")
+        return [_run_inline(fn, path, index, options) for fn, path, index in jobs]
+
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result(timeout=options.timeout + RASTERIZE_GRACE))
+        except FutureTimeoutError:
+            future.cancel()
+            results.append(OCRError(f"timed out after {options.timeout:g}s"))
+        except BrokenProcessPool as e:
+            discard_process_pool("ocr")
+            results.append(OCRError(f"worker crashed: {e}"))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def _run_inline(fn, path, index, options):
+    try:
+        return fn(str(path), index, options)
+    except Exception as e:
+        return e
+
+def extract_image(processor, path):
+    """
+    OCR an image; multi-frame images (TIFF) frame by frame across the pool.
+    A failed frame becomes a placeholder counted in "ocr_errors", as a failed
+    PDF page does; only an image with no frame read at all raises.
+    """
+    started = time.perf_counter()
+    frames = image_frame_count(path)
+    jobs = [(ocr_image_frame, path, frame) for frame in range(frames)]
+    results = run_ocr_jobs(jobs, processor.ocr_options, processor.ocr_workers)
+    failed = [result for result in results if isinstance(result, Exception)]
+    record_extraction("tesseract", frames, time.perf_counter() - started, path.stat().st_size, len(failed))
+    if len(failed) == frames:
+        raise failed[0]
+    texts = [f"[OCR failed on frame {i + 1}: {result}]" if isinstance(result, Exception) else result
+             for i, result in enumerate(results)]
+    if frames == 1:
+        return {"text": texts[0], "page_offsets": [0], "ocr_pages": [0]}
+    text, offsets = join_pages(texts)
+    return {"text": text, "page_offsets": offsets, "ocr_pages": list(range(frames)),
+            "ocr_errors": len(failed)}
@@ -0,0 +1,210 @@
+import os
+import math
+import time
+import itertools
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
+import pdfplumber
+from workers import get_process_pool, discard_process_pool
+from extractors import join_pages
+from ocr import ocr_pdf_page, run_ocr_jobs
+from metrics import record_extraction
+
+# Documents shorter than this are extracted in-process; below it the cost of
+# shipping work to the pool outweighs the parallel speed-up.
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "16"))
+# Ranges per worker; more, smaller ranges balance documents whose pages differ
+# a lot in extraction cost.
+RANGES_PER_WORKER = 4
+# Pages read at a time when a PDF is streamed; their scanned pages are OCR'd
+# together, so the pool has work for several workers.
+STREAM_WINDOW_PAGES = 4
+# A line set at least this much larger than the page's body text is a heading.
+HEADING_SIZE_RATIO = 1.15
+
+def page_count(path) -> int:
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+def outline(path, limit: int):
+    """A PDF's bookmarks as {"title", "level"}, without extracting any page."""
+    from pdfminer.pdfdocument import PDFNoOutlines
+    with pdfplumber.open(path) as pdf:
+        try:
+            return [{"title": title, "level": level}
+                    for level, title, *_ in itertools.islice(pdf.doc.get_outlines(), limit)]
+        except PDFNoOutlines:
+            return []
+
+def _is_bold(fontname: str) -> bool:
+    return "bold" in fontname.lower() or "black" in fontname.lower()
+
+def heading_lines(page, text: str):
+    """
+    Numbers of the lines of a page's text set larger than its body text, or in
+    bold where the body is not.
+    """
+    # The text lines come from the same (cached) text map as extract_text
+    lines = page.extract_text_lines(return_chars=True)
+    chars = [c for line in lines for c in line["chars"] if not c["text"].isspace()]
+    if not chars:
+        return []
+    body_size = Counter(round(c["size"], 1) for c in chars).most_common(1)[0][0]
+    body_bold = _is_bold(Counter(c["fontname"] for c in chars).most_common(1)[0][0])
+    headings = []
+    text_lines = text.split("\n")
+    i = 0
+    for line in lines:
+        visible = [c for c in line["chars"] if not c["text"].isspace()]
+        if not visible:
+            continue
+        if not (max(c["size"] for c in visible) >= body_size * HEADING_SIZE_RATIO
+                or (not body_bold and all(_is_bold(c["fontname"]) for c in visible))):
+            continue
+        # Find the same line in the text, in order
+        wanted = line["text"].strip()
+        while i < len(text_lines) and text_lines[i].strip() != wanted:
+            i += 1
+        if i < len(text_lines):
+            headings.append(i)
+            i += 1
+    return headings
+
+def extract_page_range(path, start: int, stop: int):
+    """
+    Extract the digital text of pages [start, stop), as (text, heading line
+    numbers) per page. Pages without a text layer come back as (None, []).
+    """
+    pages = []
+    with pdfplumber.open(path, pages=list(range(start + 1, stop + 1))) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text() or None
+            pages.append((text, heading_lines(page, text) if text else []))
+            # Drop the parsed layout of the page, only the text is kept.
+            page.close()
+    return pages
+
+def extract_pdf_pages(path, workers: int):
+    """Extract every page of a PDF, fanning page ranges out over a process pool."""
+    path = str(path)
+    total = page_count(path)
+    if workers <= 1 or total < PDF_PARALLEL_MIN_PAGES:
+        return extract_page_range(path, 0, total)
+
+    size = max(1, math.ceil(total / (workers * RANGES_PER_WORKER)))
+    ranges = [(start, min(start + size, total)) for start in range(0, total, size)]
+    pool = get_process_pool("pdf", workers)
+    try:
+        futures = [pool.submit(extract_page_range, path, start, stop) for start, stop in ranges]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); recreate the pool next time and
+        # finish this document in-process.
+        discard_process_pool("pdf")
+        return extract_page_range(path, 0, total)
+
+def heading_offsets(page_texts, page_headings, page_offsets):
+    """Document offsets of the heading lines of each page, given by line number."""
+    offsets = []
+    for text, lines, base in zip(page_texts, page_headings, page_offsets):
+        if not lines:
+            continue
+        wanted = set(lines)
+        position = 0
+        for number, line in enumerate(text.split("\n")):
+            if number in wanted:
+                offsets.append(base + position)
+            position += len(line) + 1
+    return offsets
+
+def extract_pdf(processor, path):
+    """A PDF's text layer, page-parallel, with pages lacking one rasterized and OCR'd."""
+    started = time.perf_counter()
+    size = path.stat().st_size
+    extracted = extract_pdf_pages(path, processor.pdf_workers)
+    pages = [text for text, _ in extracted]
+    record_extraction("pdfplumber", len(pages), time.perf_counter() - started, size)
+    # Only pages without a text layer are rasterized and OCR'd
+    scanned = [i for i, page in enumerate(pages) if page is None]
+    errors = 0
+    if scanned:
+        texts, failed = _ocr_pages(processor, path, scanned)
+        errors = len(failed)
+        for i, text in zip(scanned, texts):
+            pages[i] = text
+    text, offsets = join_pages(pages)
+    return {"text": text, "page_offsets": offsets, "ocr_pages": scanned, "ocr_errors": errors,
+            "headings": heading_offsets(pages, [lines for _, lines in extracted], offsets)}
+
+def _ocr_pages(processor, path, indexes):
+    """OCR these pages across the pool; returns (texts, indexes of the pages that failed)."""
+    started = time.perf_counter()
+    jobs = [(ocr_pdf_page, path, i) for i in indexes]
+    texts = []
+    failed = []
+    for i, result in zip(indexes, run_ocr_jobs(jobs, processor.ocr_options, processor.ocr_workers)):
+        if isinstance(result, Exception):
+            failed.append(i)
+            result = f"[OCR failed on page {i + 1}: {result}]"
+        texts.append(result)
+    record_extraction("tesseract", len(indexes), time.perf_counter() - started, errors=len(failed))
+    return texts, failed
+
+def iter_pdf(processor, path, key: str = None):
+    """
+    Like extract_pdf, as (offset, text) chunks, one page at a time, returning
+    the same entry once the last page has been yielded.
+
+    Pages are read in windows whose scanned pages are OCR'd together across
+    the pool. With `key`, the extraction cache key of the document, every
+    page read is also cached, so a later stream stopping at a later page
+    parses and OCRs only the pages no stream has reached before.
+    """
+    cache = processor.cache
+    window = max(STREAM_WINDOW_PAGES, 2 * processor.ocr_workers)
+    pages = []
+    lines = []
+    scanned = []
+    errors = 0
+    offset = 0
+    with pdfplumber.open(path) as pdf:
+        total = len(pdf.pages)
+        for start in range(0, total, window):
+            batch = []  # [text, heading lines, OCR'd, to cache] per page
+            started = time.perf_counter()
+            for i in range(start, min(start + window, total)):
+                cached = cache.get(cache.page_key(key, i)) if key else None
+                if cached is not None:
+                    batch.append([cached["text"], cached["headings"], cached["ocr"], False])
+                    continue
+                page = pdf.pages[i]
+                text = page.extract_text() or None
+                batch.append([text, heading_lines(page, text) if text else [], False, True])
+                page.close()
+            fresh = sum(1 for *_, new in batch if new)
+            if fresh:
+                record_extraction("pdfplumber", fresh, time.perf_counter() - started)
+            missing = [j for j, (text, *_) in enumerate(batch) if text is None]
+            if missing:
+                texts, failed = _ocr_pages(processor, path, [start + j for j in missing])
+                errors += len(failed)
+                for j, text in zip(missing, texts):
+                    # Failed pages are not cached, so the next stream retries them
+                    batch[j][:4] = [text, [], True, start + j not in failed]
+            # Cached before any is yielded: the consumer may stop at the first
+            for j, (text, headings, ocr, new) in enumerate(batch):
+                if key and new:
+                    cache.put(cache.page_key(key, start + j), {"text": text, "headings": headings, "ocr": ocr})
+            for j, (text, headings, ocr, _) in enumerate(batch):
+                if ocr:
+                    scanned.append(start + j)
+                pages.append(text)
+                lines.append(headings)
+                yield offset, text + "\n"
+                offset += len(text) + 1
+    text, offsets = join_pages(pages)
+    return {"text": text, "page_offsets": offsets, "ocr_pages": scanned, "ocr_errors": errors,
+            "headings": heading_offsets(pages, lines, offsets)}
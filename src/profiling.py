@@ -0,0 +1,82 @@
+import os
+import time
+import cProfile
+import threading
+import tracemalloc
+from pathlib import Path
+
+# Requests slower than this many seconds have their profile dumped (0 = off).
+PROFILE_SLOW_SECONDS = float(os.environ.get("PROFILE_SLOW_SECONDS", "0"))
+# "cprofile" (CPU, .prof files for pstats/snakeviz) or "tracemalloc" (allocations).
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "cprofile")
+# Dumps written before profiling switches itself off.
+PROFILE_MAX_DUMPS = int(os.environ.get("PROFILE_MAX_DUMPS", "1"))
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(os.environ.get("DATA_PATH", "data"), ".idp", "profiles")
+)
+
+class SlowRequestProfiler:
+    """
+    Profiles tool handlers one at a time and keeps the profile of a request
+    that turns out slower than `threshold` seconds.
+
+    cProfile only sees the thread it runs in, so handlers are profiled in the
+    worker thread that executes them. Concurrent requests run unprofiled
+    while one is being profiled, and once `max_dumps` profiles have been
+    written the profiler is a no-op.
+    """
+
+    def __init__(self, threshold: float = PROFILE_SLOW_SECONDS, mode: str = PROFILE_MODE,
+                 out_dir=PROFILE_DIR, max_dumps: int = PROFILE_MAX_DUMPS):
+        if mode not in ("cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown profile mode '{mode}'.")
+        self.threshold = threshold
+        self.mode = mode
+        self.out_dir = Path(out_dir)
+        self.max_dumps = max_dumps
+        self.dumps = []
+        self._lock = threading.Lock()
+
+    @property
+    def armed(self) -> bool:
+        return self.threshold > 0 and len(self.dumps) < self.max_dumps
+
+    def run(self, name: str, fn, *args):
+        """Call fn(*args), profiling it if no other request is being profiled."""
+        if not self.armed or not self._lock.acquire(blocking=False):
+            return fn(*args)
+        try:
+            return self._profiled(name, fn, args)
+        finally:
+            self._lock.release()
+
+    def _profiled(self, name, fn, args):
+        started_tracing = False
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            started_tracing = True
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.mode == "cprofile":
+                profile.disable()
+            if elapsed >= self.threshold and self.armed:
+                self.out_dir.mkdir(parents=True, exist_ok=True)
+                # The pid keeps dumps of concurrent server processes apart
+                stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{elapsed:.1f}s-{os.getpid()}"
+                if self.mode == "cprofile":
+                    path = self.out_dir / f"{stem}.prof"
+                    profile.dump_stats(path)
+                else:
+                    path = self.out_dir / f"{stem}.tracemalloc"
+                    tracemalloc.take_snapshot().dump(str(path))
+                self.dumps.append(str(path))
+            if started_tracing:
+                tracemalloc.stop()
+
+profiler = SlowRequestProfiler()
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "3600"))
+
+def compact(data) -> str:
+    return json.dumps(data, separators=(",", ":"))
+
+def indented(serialized: str) -> str:
+    return json.dumps(json.loads(serialized), indent=2)
+
+class ResultCache:
+    """
+    In-memory LRU of tool outputs, stored as compact JSON.
+
+    Callers build keys from everything an output depends on (document
+    content hash, config ID and version, tool version), so a re-uploaded
+    document or an edited config simply stops matching its old entries,
+    which then age out through the TTL or LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
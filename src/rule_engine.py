@@ -0,0 +1,363 @@
+import os
+import re
+import heapq
+import threading
+from bisect import bisect_left
+from segmentation import Segmenter, SectionMap
+
+# Characters of text a streaming extraction holds at once. Windows end on a
+# paragraph break, so this only caps paragraphs longer than it.
+STREAM_WINDOW_CHARS = int(os.environ.get("STREAM_WINDOW_CHARS", str(256 * 1024)))
+
+# A pattern that starts with a literal, or a non-capturing alternation of
+# literals, such as "(?:Name|Applicant):". Every match of such a pattern
+# begins with one of those labels, so the labels can be located with plain
+# substring search and the pattern only tried at those positions.
+_META = r"()\[\]{}\\|.^$*+?"
+_LABEL_GROUP = re.compile(r"\(\?:((?:[^%s]+\|)*[^%s]+)\)" % (_META, _META))
+_LABEL_RUN = re.compile(r"[^%s]+" % _META)
+
+def _top_level_alternation(pattern: str) -> bool:
+    """Whether a pattern has a "|" outside every group, e.g. "Name|Applicant: (\\w+)"."""
+    depth = 0
+    in_class = False
+    escaped = False
+    for ch in pattern:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return True
+    return False
+
+def _literal_labels(pattern: str):
+    """Lower-cased literal prefixes of a pattern, or None if it has none."""
+    # Another branch can match without starting with the leading labels
+    if _top_level_alternation(pattern):
+        return None
+    group = _LABEL_GROUP.match(pattern)
+    if group:
+        if pattern[group.end():group.end() + 1] in ("*", "?", "{", "+"):
+            return None
+        labels = group.group(1).split("|")
+    else:
+        run = _LABEL_RUN.match(pattern)
+        if not run:
+            return None
+        label = run.group(0)
+        if pattern[run.end():run.end() + 1] in ("*", "?", "{", "+"):
+            # The quantifier applies to the last character only
+            label = label[:-1]
+        labels = [label]
+    if not all(label and label.isascii() for label in labels):
+        return None
+    return [label.lower() for label in labels]
+
+class CompiledRule:
+    def __init__(self, field: str, pattern: str, section: str = None):
+        self.field = field
+        self.regex = re.compile(pattern, re.IGNORECASE)
+        self.labels = _literal_labels(pattern)
+        self.section = section
+
+    def value(self, match):
+        """(stripped value, [start, end] of the stripped value) of a match."""
+        # Capture the first group if available, else the whole match
+        group = 1 if self.regex.groups else 0
+        raw = match.group(group)
+        if raw is None:
+            return None
+        start = match.start(group) + len(raw) - len(raw.lstrip())
+        value = raw.strip()
+        return value, [start, start + len(value)]
+
+class CompiledTemplate:
+    """
+    A template's extraction rules compiled once.
+
+    Rules with literal labels are evaluated together: the labels are located
+    with substring search on the lower-cased text, candidates are visited in
+    document order across all rules, and each rule is tried only at its own
+    label positions. The walk stops as soon as every field has been found.
+    With `restrict_to_sections`, the text is first split into the template's
+    sections (see segmentation.Segmenter). A rule belongs to the section
+    named by its `section` key, or else to the section whose keyword its
+    label mentions ("Annual Income:" belongs to the section listing "Annual
+    Income"); it matches only inside that section or in text outside every
+    section. There, and for rules without a section, matches must start
+    inside a paragraph (separated by an empty line) that contains one of the
+    template's section keywords. No match runs past the end of its paragraph
+    or section.
+    """
+
+    def __init__(self, template: dict):
+        self.template_id = template.get("template_id")
+        self.segmenter = Segmenter(template)
+        self.rules = [
+            CompiledRule(rule["field"], rule["pattern"], rule.get("section"))
+            for rule in template.get("extraction_rules", [])
+            if rule.get("field") and rule.get("pattern")
+        ]
+        for rule in self.rules:
+            if rule.section is None and rule.labels:
+                rule.section = next(filter(None, map(self.segmenter.section_of, rule.labels)), None)
+        self.keywords = sorted(self.segmenter.sections)
+
+    def sections(self, text: str, headings=None) -> SectionMap:
+        """The template's sections in text; `headings` are offsets of layout heading lines."""
+        return self.segmenter.segment(text.lower(), headings or None)
+
+    def extract(self, text: str, restrict_to_sections: bool = True, headings=None,
+                sections: SectionMap = None, with_sections: bool = False):
+        """
+        Return ({field: value}, {field: [start, end]}) for the first match of each rule.
+        `sections` is a complete section map of text computed earlier; with
+        `with_sections` the map used is returned as a third item. Text is only
+        segmented as far as the rules read, so that map may be incomplete.
+        """
+        matches, _, sections = self._scan(text, self.rules, restrict_to_sections,
+                                          headings=headings or None, sections=sections)
+        values, offsets = self._report({rule: rule.value(match) for rule, match in matches.items()})
+        return (values, offsets, sections) if with_sections else (values, offsets)
+
+    def extract_stream(self, chunks, restrict_to_sections: bool = True,
+                       window_chars: int = STREAM_WINDOW_CHARS, headings=None,
+                       sections: SectionMap = None, with_sections: bool = False):
+        """
+        Like extract, over an iterable of (offset, text) chunks.
+
+        Text is scanned in windows of whole paragraphs, and reading stops as
+        soon as every rule has matched, so only one window is held at a time.
+        A match that runs into the end of a window is retried together with
+        the next one. Each window is split into sections as it is read; the
+        section map returned with `with_sections` is None unless the whole
+        document was read.
+        """
+        pending = list(self.rules)
+        found = {}
+        buffer = ""
+        base = 0  # Document offset of buffer[0]
+        # Later windows keep the character before them, so anchors and
+        # lookbehinds see the same context as in the whole text
+        lead = 0
+        headings = sorted(headings) if headings else None
+        known = sections
+        sections = SectionMap()  # Sections of the text read so far
+        opening = None
+        window_sections = None
+        chunks = iter(chunks)
+        final = False
+        while pending and not final:
+            chunk = next(chunks, None)
+            if chunk is None:
+                final = True
+                cut = len(buffer)
+            else:
+                buffer += chunk[1]
+                cut = buffer.rfind("\n\n", lead) + 2
+                if cut == 1:
+                    if len(buffer) < window_chars:
+                        continue
+                    # An overlong paragraph is cut after a line, so no label is split
+                    cut = buffer.rfind("\n", lead) + 1 or len(buffer)
+            window = buffer[:cut]
+            window_headings = headings and [h - base for h in headings[
+                bisect_left(headings, base + lead):bisect_left(headings, base + cut)]]
+            # A match still running after two windows' worth of text is taken as is
+            matches, held, window_sections = self._scan(
+                window, pending, restrict_to_sections, final or len(window) >= 2 * window_chars, lead,
+                window_headings, opening, known.shifted(base, base + cut) if known else None)
+            for rule, match in matches.items():
+                found[rule] = _shifted(rule.value(match), base)
+            pending = [rule for rule in pending if rule not in matches]
+            keep = cut if held is None else held
+            if keep > lead:
+                if pending and window_sections is not None:
+                    # The next window opens in the section this one ends in
+                    opening = window_sections.at(keep - 1)[0]
+                    sections.extend(window_sections, base, lead, keep)
+                base += keep - 1
+                buffer = buffer[keep - 1:]
+                lead = 1
+        values, offsets = self._report(found)
+        if not with_sections:
+            return values, offsets
+        if known is not None:
+            return values, offsets, known
+        # Only a map of the whole document is worth keeping
+        return values, offsets, sections if final and pending and window_sections is not None else None
+
+    def _report(self, found):
+        # Report fields in rule order, like the per-rule loop did
+        values = {}
+        offsets = {}
+        for rule in self.rules:
+            if found.get(rule):
+                values[rule.field], offsets[rule.field] = found[rule]
+        return values, offsets
+
+    def _scan(self, text: str, rules, restrict_to_sections: bool, final: bool = True, start: int = 0,
+              headings=None, opening=None, sections: SectionMap = None):
+        """
+        First match of each rule in text[start:], as {rule: match}. Unless `final`,
+        a match reaching the end of `text` may continue past it: its rule is
+        left out and the earliest such start is returned alongside, followed
+        by the section map of text (None when sections are not used).
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Offsets only line up when lower-casing keeps every character
+            lowered = None
+        if restrict_to_sections and self.keywords and lowered is not None:
+            paragraphs = _KeywordParagraphs(lowered, self.keywords)
+            if sections is None:
+                sections = self.segmenter.lazy(lowered, headings, start, opening)
+        else:
+            paragraphs = None
+            sections = None
+
+        def region_end(rule, position):
+            # End of the text a match of rule starting at position may cover, or None
+            if paragraphs is None:
+                return len(text)
+            section, section_end = sections.at(position)
+            if section is not None:
+                if rule.section not in (None, section):
+                    return None
+                end = paragraphs.end(position)
+            else:
+                end = paragraphs.region_end(position)
+                if end is None:
+                    return None
+            return end if section_end is None else min(end, section_end)
+
+        found = {}
+        held = None
+
+        def record(rule, match):
+            nonlocal held
+            if not final and match.end() == len(text):
+                held = match.start() if held is None else min(held, match.start())
+            else:
+                found[rule] = match
+
+        labelled = [r for r in rules if r.labels and lowered is not None]
+        pending = set(labelled)
+        candidates = heapq.merge(*[
+            _occurrences(lowered, label, rule, start) for rule in labelled for label in rule.labels
+        ], key=lambda c: c[0])
+        for position, rule in candidates:
+            if rule not in pending:
+                continue
+            end = region_end(rule, position)
+            if end is None:
+                continue
+            match = rule.regex.match(text, position, end)
+            if match:
+                pending.discard(rule)
+                record(rule, match)
+                if not pending:
+                    break
+
+        unlabelled = [r for r in rules if not (r.labels and lowered is not None)]
+        if unlabelled:
+            if paragraphs is None:
+                regions = [(0, len(text), None)]
+            else:
+                regions = [(s, e, section) for s, e, section in sections.spans(len(text)) if section]
+                for s, e in paragraphs.regions():
+                    section, section_end = sections.at(s)
+                    if section is None:
+                        regions.append((s, e if section_end is None else min(e, section_end), None))
+                regions.sort()
+            for rule in unlabelled:
+                for region_start, end, section in regions:
+                    if end <= start or (section and rule.section not in (None, section)):
+                        continue
+                    match = rule.regex.search(text, max(region_start, start), end)
+                    if match:
+                        record(rule, match)
+                        break
+        return found, held, sections
+
+class _KeywordParagraphs:
+    """
+    Paragraphs (separated by an empty line) of a lower-cased text that contain
+    at least one section keyword, looked up lazily and memoized.
+    """
+
+    def __init__(self, lowered: str, keywords):
+        self.lowered = lowered
+        self.keywords = keywords
+        self._known = {}
+
+    def _paragraph(self, position: int):
+        start = self.lowered.rfind("\n\n", 0, position)
+        start = 0 if start == -1 else start + 2
+        known = self._known.get(start)
+        if known is None:
+            end = self.lowered.find("\n\n", position)
+            end = len(self.lowered) if end == -1 else end + 1
+            paragraph = self.lowered[start:end]
+            known = (end, any(keyword in paragraph for keyword in self.keywords))
+            self._known[start] = known
+        return start, known
+
+    def end(self, position: int) -> int:
+        """End of the paragraph holding `position`."""
+        return self._paragraph(position)[1][0]
+
+    def region_end(self, position: int):
+        """End of the keyword paragraph holding `position`, or None if it has no keyword."""
+        _, (end, has_keyword) = self._paragraph(position)
+        return end if has_keyword else None
+
+    def regions(self):
+        """(start, end) of every paragraph that contains a section keyword."""
+        starts = set()
+        for keyword in self.keywords:
+            position = self.lowered.find(keyword)
+            while position != -1:
+                start, (end, _) = self._paragraph(position)
+                starts.add(start)
+                position = self.lowered.find(keyword, end)
+        return [(start, self._known[start][0]) for start in sorted(starts)]
+
+def _shifted(found, base: int):
+    if found is None:
+        return None
+    value, (start, end) = found
+    return value, [start + base, end + base]
+
+def _occurrences(lowered: str, label: str, rule, start: int = 0):
+    position = lowered.find(label, start)
+    while position != -1:
+        yield position, rule
+        position = lowered.find(label, position + 1)
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+def compile_template(template: dict, version=None) -> CompiledTemplate:
+    """Compiled rules for a template, reused until the template's version changes."""
+    key = (template.get("template_id"), version)
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+    if compiled is None or version is None:
+        compiled = CompiledTemplate(template)
+        if version is not None:
+            with _compiled_lock:
+                # Drop compilations of older versions of the same template
+                for old in [k for k in _compiled if k[0] == key[0]]:
+                    del _compiled[old]
+                _compiled[key] = compiled
+    return compiled
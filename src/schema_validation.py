@@ -0,0 +1,92 @@
+import re
+import threading
+from jsonschema.exceptions import SchemaError
+from jsonschema.validators import validator_for
+from config_loader import get_schema, config_version
+
+# Extracted fields are text; these count as numbers for "number" properties.
+_NUMBER = re.compile(r"[-+]?\$?\s*\d[\d,]*(?:\.\d+)?")
+
+_validators = {}  # (schema name, version, fields) -> validator or SchemaError
+_lock = threading.Lock()
+
+def get_validator(schema_name: str, fields=None):
+    """
+    The validator for a schema in configs/schemas, built (and the schema
+    checked against its metaschema) once per schema version. With `fields`,
+    only the required properties among those fields are required, for tools
+    that produce part of a record. Returns None when there is no such schema
+    and raises SchemaError when the schema itself is invalid.
+    """
+    version = config_version("schemas", schema_name)
+    if version is None:
+        return None
+    key = (schema_name, version, None if fields is None else frozenset(fields))
+    with _lock:
+        validator = _validators.get(key)
+    if validator is None:
+        validator = _build(get_schema(schema_name), key[2])
+        with _lock:
+            for stale in [k for k in _validators if k[0] == schema_name and k[1] != version]:
+                del _validators[stale]
+            _validators[key] = validator
+    if isinstance(validator, SchemaError):
+        raise validator
+    return validator
+
+def _build(schema: dict, fields):
+    if fields is not None and "required" in schema:
+        schema = dict(schema, required=[f for f in schema["required"] if f in fields])
+    cls = validator_for(schema)
+    try:
+        cls.check_schema(schema)
+    except SchemaError as e:
+        return e
+    return cls(schema, format_checker=cls.FORMAT_CHECKER)
+
+def _typed(instance, schema: dict):
+    """`instance` with numeric text in number-typed properties read as numbers."""
+    properties = schema.get("properties")
+    if not isinstance(instance, dict) or not properties:
+        return instance
+    typed = None
+    for name, value in instance.items():
+        if (isinstance(value, str) and properties.get(name, {}).get("type") in ("number", "integer")
+                and _NUMBER.fullmatch(value.strip())):
+            number = float(re.sub(r"[$,\s]", "", value))
+            if typed is None:
+                typed = dict(instance)
+            typed[name] = int(number) if number.is_integer() else number
+    return instance if typed is None else typed
+
+def validation_errors(instance, schema_name: str, fields=None):
+    """Every error as {"path", "message"}, or None when there is no such schema."""
+    validator = get_validator(schema_name, fields)
+    if validator is None:
+        return None
+    errors = validator.iter_errors(_typed(instance, validator.schema))
+    return [{"path": e.json_path, "message": e.message}
+            for e in sorted(errors, key=lambda e: list(map(str, e.absolute_path)))]
+
+def annotate(data: dict, schema_name: str, instance=None, fields=None) -> dict:
+    """
+    Record the outcome of validating `instance` (default: `data`) in
+    data["_validation"] and, on failure, data["_validation_errors"].
+    """
+    try:
+        errors = validation_errors(data if instance is None else instance, schema_name, fields)
+    except SchemaError as e:
+        data["_validation"] = f"invalid_schema: {e.message}"
+        return data
+    if errors is None:
+        data["_validation"] = "no_schema_found"
+    elif errors:
+        data["_validation"] = "failed: " + "; ".join(f"{e['path']}: {e['message']}" for e in errors)
+        data["_validation_errors"] = errors
+    else:
+        data["_validation"] = "passed"
+    return data
+
+def validate_many(items, schema_name: str) -> list:
+    """Annotate each output of `items` against one schema, sharing its validator."""
+    return [annotate(item, schema_name) for item in items]
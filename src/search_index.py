@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from concurrent.futures import as_completed
+from catalog import connect
+from workers import CPU_SHARE, get_process_pool
+
+# Documents extracted concurrently when the index is rebuilt.
+INDEX_WORKERS = int(os.environ.get("INDEX_WORKERS", "0")) or CPU_SHARE
+
+# Page rows of a document live at rowids doc_id << PAGE_BITS | page, so a
+# document's rows are one rowid range, replaced without scanning the index.
+PAGE_BITS = 20
+MAX_PAGES = 1 << PAGE_BITS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed (
+    doc_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+    body, tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+
+_SEARCH = f"""
+WITH hits AS MATERIALIZED (
+    SELECT rowid >> {PAGE_BITS} AS doc_id, rowid & {MAX_PAGES - 1} AS page,
+           bm25(pages) AS score, snippet(pages, 0, '**', '**', '...', ?) AS snippet
+    FROM pages WHERE pages MATCH ?
+)
+SELECT indexed.name, hits.page, min(hits.score) AS score, hits.snippet,
+       count(*) AS matching_pages, count(*) OVER () AS total
+FROM hits JOIN indexed USING (doc_id)
+GROUP BY hits.doc_id
+ORDER BY score, indexed.name
+LIMIT ? OFFSET ?
+"""
+
+class SearchIndex:
+    """
+    SQLite FTS5 full-text index over the page texts of stored documents.
+
+    Each page is a row, so results can point at the best matching page.
+    Documents are ranked by the BM25 score of that page.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path, _SCHEMA)
+        return conn
+
+    def content_hash(self, name: str):
+        """Hash of the content the index holds for a document, or None."""
+        row = self._db().execute("SELECT content_hash FROM indexed WHERE name=?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, name: str, content_hash: str, page_texts):
+        """Index a document's pages, replacing whatever was indexed under its name."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT doc_id FROM indexed WHERE name=?", (name,)).fetchone()
+            if row:
+                doc_id = row[0]
+                self._delete_pages(doc_id)
+                db.execute("UPDATE indexed SET content_hash=? WHERE doc_id=?", (content_hash, doc_id))
+            else:
+                doc_id = db.execute(
+                    "INSERT INTO indexed (name, content_hash) VALUES (?, ?)", (name, content_hash)
+                ).lastrowid
+            # Pages past MAX_PAGES are folded into the last row
+            page_texts = list(page_texts)
+            if len(page_texts) > MAX_PAGES:
+                page_texts[MAX_PAGES - 1:] = ["\n".join(page_texts[MAX_PAGES - 1:])]
+            db.executemany(
+                "INSERT INTO pages (rowid, body) VALUES (?, ?)",
+                ((doc_id << PAGE_BITS | page, text) for page, text in enumerate(page_texts) if text),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def remove(self, name: str):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT doc_id FROM indexed WHERE name=?", (name,)).fetchone()
+            if row:
+                self._delete_pages(row[0])
+                db.execute("DELETE FROM indexed WHERE doc_id=?", (row[0],))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _delete_pages(self, doc_id: int):
+        self._db().execute(
+            "DELETE FROM pages WHERE rowid BETWEEN ? AND ?",
+            (doc_id << PAGE_BITS, (doc_id << PAGE_BITS) + MAX_PAGES - 1),
+        )
+
+    def names(self):
+        return [row[0] for row in self._db().execute("SELECT name FROM indexed ORDER BY name")]
+
+    def search(self, query: str, limit: int = 10, offset: int = 0, snippet_tokens: int = 16):
+        """
+        Documents matching an FTS5 query, best first, as (results, total).
+
+        Raises ValueError for a malformed query.
+        """
+        try:
+            rows = self._db().execute(
+                _SEARCH, (snippet_tokens, query, max(0, limit), max(0, offset))
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {str(e)}") from None
+        results = [{
+            "document_id": row["name"],
+            "page": row["page"] + 1,
+            # bm25() is lower-is-better; report higher-is-better
+            "score": round(-row["score"], 4),
+            "matching_pages": row["matching_pages"],
+            "snippet": row["snippet"],
+        } for row in rows]
+        return results, rows[0]["total"] if rows else 0
+
+def page_texts(entry: dict):
+    """Split an extraction entry back into the text of each page."""
+    text, offsets = entry["text"], entry["page_offsets"]
+    return [text[start:end] for start, end in zip(offsets, offsets[1:] + [len(text)])]
+
+def index_document(processor, name: str) -> bool:
+    """Extract a document (which indexes it) and report whether its index entry is current."""
+    processor.extract(name)
+    return processor.search.content_hash(name) == processor.content_hash(name)
+
+_processors = {}
+
+def _index_in_worker(storage_dir, name):
+    # Each worker is already one of INDEX_WORKERS processes; see batch.py.
+    # Workers write the index themselves, SQLite serializes the writes.
+    from document_processor import DocumentProcessor
+    processor = _processors.get(storage_dir)
+    if processor is None:
+        processor = _processors[storage_dir] = DocumentProcessor(
+            storage_dir, pdf_workers=1, ocr_workers=1
+        )
+    return index_document(processor, name)
+
+def rebuild(processor, workers: int = INDEX_WORKERS):
+    """
+    Bring the index in line with every stored document.
+
+    Documents whose indexed content is current are skipped; the rest are
+    extracted and indexed across a process pool. Returns counts of indexed,
+    unchanged, failed and removed documents.
+    """
+    index = processor.search
+    processor.catalog.rescan()
+    names = processor.catalog.names()
+    stats = {"indexed": 0, "unchanged": 0, "failed": 0, "removed": 0}
+    for name in set(index.names()) - set(names):
+        index.remove(name)
+        stats["removed"] += 1
+
+    stale = []
+    for name in names:
+        try:
+            current = index.content_hash(name) == processor.content_hash(name)
+        except FileNotFoundError:
+            continue
+        if current:
+            stats["unchanged"] += 1
+        else:
+            stale.append(name)
+
+    if workers <= 1 or len(stale) <= 1:
+        outcomes = []
+        for name in stale:
+            try:
+                outcomes.append(index_document(processor, name))
+            except Exception:
+                outcomes.append(False)
+    else:
+        pool = get_process_pool("index", workers)
+        futures = [pool.submit(_index_in_worker, str(processor.storage_dir), name) for name in stale]
+        outcomes = []
+        for future in as_completed(futures):
+            try:
+                outcomes.append(future.result())
+            except Exception:
+                outcomes.append(False)
+    stats["indexed"] = sum(outcomes)
+    stats["failed"] = len(outcomes) - stats["indexed"]
+    return stats
@@ -0,0 +1,162 @@
+import re
+from bisect import bisect_right
+
+# A line opening with a keyword is a section heading when its label (the
+# text before a colon, or the whole line without one) is at most this long.
+LABEL_MAX_WORDS = 5
+# Characters segmented at a time; a lookup segments only as far as it reaches.
+SEGMENT_BLOCK_CHARS = 16 * 1024
+
+class SectionMap:
+    """
+    A document split into sections: `starts[i]` is where section `ids[i]`
+    begins, running up to the next start. An id of None is text outside
+    every section of the template.
+    """
+
+    def __init__(self, starts=(0,), ids=(None,)):
+        self.starts = list(starts)
+        self.ids = list(ids)
+        # False while later sections of the text are still unknown
+        self.complete = True
+
+    def at(self, position: int):
+        """(section id, end of its span) at `position`."""
+        i = bisect_right(self.starts, position) - 1
+        end = self.starts[i + 1] if i + 1 < len(self.starts) else None
+        return self.ids[i], end
+
+    def spans(self, end: int):
+        """Every (start, stop, section id) up to `end`."""
+        bounds = self.starts[1:] + [end]
+        return [(start, min(stop, end), section) for start, stop, section
+                in zip(self.starts, bounds, self.ids) if start < end]
+
+    def extend(self, other: "SectionMap", base: int, start: int, stop: int):
+        """Append the sections of `other`, a map of text at `base`, over [start, stop)."""
+        for position, section in zip(other.starts, other.ids):
+            if position >= stop:
+                break
+            position = max(position, start) + base
+            if position < self.starts[-1]:
+                continue
+            if position == self.starts[-1]:
+                self.ids[-1] = section
+                if len(self.ids) > 1 and self.ids[-2] == section:
+                    del self.starts[-1], self.ids[-1]
+            elif section != self.ids[-1]:
+                self.starts.append(position)
+                self.ids.append(section)
+
+    def shifted(self, base: int, end: int) -> "SectionMap":
+        """The part of this map over text[base:end], with offsets relative to base."""
+        section, _ = self.at(base)
+        result = SectionMap((0,), (section,))
+        for position, section in zip(self.starts, self.ids):
+            if base < position < end:
+                result.starts.append(position - base)
+                result.ids.append(section)
+        return result
+
+class _LazySectionMap(SectionMap):
+    """A SectionMap of a text that is segmented block by block as lookups reach further."""
+
+    def __init__(self, segmenter, lowered: str, headings, start: int, opening):
+        super().__init__((0,), (opening,))
+        self._segmenter = segmenter
+        self._lowered = lowered
+        self._headings = headings
+        self._done = start
+        self.complete = start >= len(lowered)
+
+    def _grow(self, position: int):
+        # Until the section at position and where it ends are known
+        lowered = self._lowered
+        while not self.complete and (self._done <= position or self.starts[-1] <= position):
+            stop = lowered.find("\n", self._done + SEGMENT_BLOCK_CHARS) + 1 or len(lowered)
+            block = self._segmenter.segment(lowered, self._headings, self._done, self.ids[-1], stop)
+            self.extend(block, 0, self._done, stop)
+            self._done = stop
+            self.complete = stop >= len(lowered)
+
+    def at(self, position: int):
+        self._grow(position)
+        return super().at(position)
+
+    def spans(self, end: int):
+        self._grow(end - 1)
+        return super().spans(end)
+
+class Segmenter:
+    """
+    Splits text into a template's sections in one pass over its keywords.
+
+    Every keyword of every section is found with one regex alternation
+    (longest keyword first, whole words only). When layout marked heading
+    lines (larger or bold type in a PDF, a heading style in a DOCX), each
+    heading starts the section of the first keyword in it, and headings
+    without a keyword close the current section. Without layout, a line
+    starts a section when it opens with a keyword and reads like a label
+    ("Annual Income:", "Signature").
+    """
+
+    def __init__(self, template: dict):
+        self.sections = {}
+        for section in template.get("sections", []):
+            for keyword in section.get("keywords", []):
+                # The first section to list a keyword owns it
+                self.sections.setdefault(keyword.lower(), section.get("id"))
+        alternation = "|".join(map(re.escape, sorted(self.sections, key=len, reverse=True)))
+        if alternation:
+            self.pattern = re.compile(r"(?<!\w)(?:%s)(?!\w)" % alternation)
+            # A keyword opening a line, after any numbering or bullet
+            self.line_pattern = re.compile(r"^[ \t\d.)(#*•-]*(%s)(?!\w)" % alternation, re.MULTILINE)
+        else:
+            self.pattern = self.line_pattern = None
+
+    def section_of(self, label: str):
+        """The section whose keyword a rule's label mentions, or None."""
+        match = self.pattern.search(label.lower()) if self.pattern else None
+        return self.sections[match.group()] if match else None
+
+    def segment(self, lowered: str, headings=None, start: int = 0, opening=None,
+                stop: int = None) -> SectionMap:
+        """
+        Sections of a lower-cased text over [start, stop). `headings` are the
+        offsets of the lines layout marked as headings, or None for text
+        without layout; `opening` is the section in effect at `start`.
+        """
+        stop = len(lowered) if stop is None else stop
+        bounds = {}
+        if headings is not None:
+            for line in headings:
+                if start <= line < stop:
+                    end = lowered.find("\n", line)
+                    match = self.pattern and self.pattern.search(lowered, line, end if end != -1 else stop)
+                    bounds[line] = self.sections[match.group()] if match else None
+        elif self.line_pattern is not None:
+            for match in self.line_pattern.finditer(lowered, start, stop):
+                if self._is_label(lowered, match.start(), match.end()):
+                    bounds[match.start()] = self.sections[match.group(1)]
+        result = SectionMap((0,), (opening,))
+        for position in sorted(bounds):
+            if bounds[position] != result.ids[-1]:
+                if position == result.starts[-1]:
+                    result.ids[-1] = bounds[position]
+                else:
+                    result.starts.append(position)
+                    result.ids.append(bounds[position])
+        return result
+
+    def lazy(self, lowered: str, headings=None, start: int = 0, opening=None) -> SectionMap:
+        """Like segment, but only segmenting as far as lookups in the map reach."""
+        return _LazySectionMap(self, lowered, headings, start, opening)
+
+    @staticmethod
+    def _is_label(lowered: str, line: int, keyword_end: int) -> bool:
+        end = lowered.find("\n", keyword_end)
+        text = lowered[line:end if end != -1 else len(lowered)]
+        colon = text.find(":")
+        if colon != -1:
+            return len(text[:colon].split()) <= LABEL_MAX_WORDS
+        return len(text.split()) <= LABEL_MAX_WORDS and not text.rstrip().endswith(".")
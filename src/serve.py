@@ -0,0 +1,35 @@
+"""
+Production launcher: SERVER_WORKERS server processes behind one HTTP port.
+
+    SERVER_WORKERS=4 python src/serve.py
+
+Each process accepts requests as soon as it listens and warms up (configs
+compiled, extraction libraries imported) in the background, so its first
+requests may pay for an import or compile still under way. On SIGTERM it
+stops accepting connections and finishes in-flight calls for up to
+SHUTDOWN_TIMEOUT seconds. Processes share
+documents, the extraction cache, the catalog and the search index on disk;
+result caches and metrics are per process.
+"""
+import os
+import uvicorn
+from workers import SERVER_WORKERS
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8000"))
+SHUTDOWN_TIMEOUT = int(os.environ.get("SHUTDOWN_TIMEOUT", "30"))
+
+def create_app():
+    """The ASGI app of one server process."""
+    from server import mcp
+    # Consecutive requests of a client may reach different processes, so
+    # with several workers no session state is kept between them
+    return mcp.http_app(stateless_http=SERVER_WORKERS > 1)
+
+def main():
+    print(f"Starting IDP MCP Server on port {PORT} with {SERVER_WORKERS} worker(s)...")
+    uvicorn.run("serve:create_app", factory=True, host=HOST, port=PORT, workers=SERVER_WORKERS,
+                timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
+
+if __name__ == "__main__":
+    main()
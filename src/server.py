@@ -1,93 +1,427 @@
-from fastmcp import FastMCP
-import re
+import time
+# Taken before anything else is imported, for the startup report
+IMPORT_STARTED = time.perf_counter()
+from fastmcp import FastMCP, Context
+FASTMCP_IMPORTED = time.perf_counter()
+import os
 import json
 import base64
 import binascii
-from config_loader import (
-    get_templates, get_rubrics, get_schema, get_template, get_rubric,
-    get_checklists, get_checklist, get_question_banks, get_question_bank
-)
+import itertools
+import threading
+from pathlib import Path
+from contextlib import asynccontextmanager
+from config_loader import get_schema_json, serialized, config_version
 from document_processor import processor
+from uploads import UploadManager, UploadError
+from analysis import (ANALYSIS_VERSION, ConfigNotFound, config_versions, summarize_chunks,
+                      assess_risk_chunks, action_checklist, warm_up as compile_configs)
+from schema_validation import annotate, validate_many
+from batch import check_configs, select_documents, run_batch
+from search_index import index_document, rebuild
+from result_cache import ResultCache, compact, indented
+from metrics import REGISTRY
+from instrumentation import MetricsMiddleware
+from workers import offloaded, run_in_thread, tool_limiter, ServerBusy, shutdown as shutdown_workers
+from extractors import preload as preload_extractors, import_seconds as extractor_import_seconds
+from classifier import CLASSIFY_MAX_CHARS, classify, warm_up as build_classifier
+from ingestion import (INGEST_WORKERS, INGEST_TEMPLATE, INGEST_RUBRIC, DISCOVER_BATCH, IngestQueue,
+                       IngestWorkers, IngestError)
 
-from jsonschema import validate, ValidationError
+# Load extractor backends and compile configs in the background once the
+# server has started, instead of on the first request that needs them.
+PREWARM = os.environ.get("PREWARM", "1") != "0"
 
-mcp = FastMCP("idp-server")
+startup = {
+    "import_seconds": {
+        "fastmcp": round(FASTMCP_IMPORTED - IMPORT_STARTED, 4),
+        "server": round(time.perf_counter() - FASTMCP_IMPORTED, 4),
+    },
+    "prewarm": "pending" if PREWARM else "off",
+    "prewarm_seconds": None,
+}
+
+def warm_up():
+    """Import every extractor backend and compile every config."""
+    started = time.perf_counter()
+    startup["prewarm"] = "running"
+    try:
+        preload_extractors()
+        compile_configs()
+        build_classifier()
+    except Exception as e:
+        # Whatever is missing is loaded by the first request needing it
+        startup["prewarm"] = f"failed: {e}"
+    else:
+        startup["prewarm"] = "done"
+    startup["prewarm_seconds"] = round(time.perf_counter() - started, 4)
+
+@asynccontextmanager
+async def lifespan(server):
+    """
+    Pre-warm each server process without delaying its start and start its
+    ingestion workers; stop both kinds of workers on shutdown.
+    """
+    if PREWARM:
+        threading.Thread(target=warm_up, name="prewarm", daemon=True).start()
+    if INGEST_WORKERS > 0:
+        pipeline.start(INGEST_WORKERS)
+    try:
+        yield {}
+    finally:
+        # The process is exiting, so blocking the loop is fine
+        pipeline.stop()
+        shutdown_workers()
+
+mcp = FastMCP("idp-server", lifespan=lifespan)
+mcp.add_middleware(MetricsMiddleware())
+uploads = UploadManager(processor)
+results = ResultCache()
+ingest = IngestQueue(processor.state_dir / "ingest.sqlite3")
+
+REGISTRY.callback(
+    "idp_cache_hits_total", "Cache lookups answered from the cache.", "counter",
+    lambda: {("extraction",): processor.cache.hits, ("results",): results.hits}, ("cache",))
+REGISTRY.callback(
+    "idp_cache_misses_total", "Cache lookups that had to compute the value.", "counter",
+    lambda: {("extraction",): processor.cache.misses, ("results",): results.misses}, ("cache",))
 
 def validate_output(data: dict, schema_name: str) -> dict:
-    """Validate data against a JSON schema if it exists."""
-    schema = get_schema(schema_name)
-    if schema:
+    """Validate data against a JSON schema if it exists, recording every error."""
+    return annotate(data, schema_name)
+
+def stored_upload(path: str, filename: str, priority: int = 0) -> str:
+    """
+    Queue a freshly stored document for background processing, or index it
+    right away when this process runs no ingestion workers.
+    """
+    if INGEST_WORKERS > 0:
+        ingest.enqueue(filename, processor.content_hash(filename), priority)
+        pipeline.notify()
+        if pipeline.running:
+            return f"Successfully uploaded document to {path} (queued for processing, see document_status)"
+    return indexed_upload(path, filename)
+
+def indexed_upload(path: str, filename: str) -> str:
+    """Index a freshly stored document so it is searchable right away."""
+    try:
+        if index_document(processor, filename):
+            return f"Successfully uploaded document to {path}"
+        return f"Successfully uploaded document to {path} (not indexed: extraction incomplete)"
+    except Exception as e:
+        return f"Successfully uploaded document to {path} (not indexed: {str(e)})"
+
+_DOCUMENT_ID = '{"document_id":'
+
+def memoized(key, compute, pretty: bool = False, document_id: str = None, stage: str = None) -> str:
+    """
+    A tool's output from the result cache, computed on a miss. `compute`
+    returns the output dict, or an error message, which is not cached. Keys
+    without the document name share an output between identical documents;
+    `document_id` then replaces the name the output was computed for. With a
+    `stage`, a running ingestion job of the document is waited for up to that
+    stage before computing, so its work is not done twice.
+    """
+    serialized = results.get(key)
+    if serialized is None:
+        # Computed ahead of time by the ingestion pipeline, maybe in another process
+        serialized = ingest.result(key)
+        if serialized is None and stage is not None and document_id is not None:
+            wait_for_ingestion(document_id, key[2], stage)
+            serialized = ingest.result(key)
+        if serialized is None:
+            output = compute()
+            if isinstance(output, str):
+                return output
+            serialized = compact(output)
+        results.put(key, serialized)
+    if document_id is not None and serialized.startswith(_DOCUMENT_ID):
+        _, end = json.JSONDecoder().raw_decode(serialized, len(_DOCUMENT_ID))
+        serialized = _DOCUMENT_ID + json.dumps(document_id) + serialized[end:]
+    return indented(serialized) if pretty else serialized
+
+def wait_for_ingestion(document_id: str, content_hash: str, stage: str):
+    """
+    Wait while a running ingestion job of this content works up to `stage`,
+    or only through extraction when the pipeline has no such stage.
+    """
+    names = [name for name, _ in stages]
+    ingest.wait(document_id, content_hash, names.index(stage if stage in names else "extract") + 1)
+
+def document_chunks(document_id: str):
+    """A document's (offset, text) chunks, or the error message extraction produced instead."""
+    chunks = processor.iter_text(document_id)
+    first = next(chunks, None)
+    if first is None:
+        return iter(())
+    if first[1].startswith("Error"):
+        return first[1]
+    return itertools.chain([first], chunks)
+
+def document_head(document_id: str, size: int):
+    """The first `size` characters of a document, or the error message extraction produced."""
+    chunks = document_chunks(document_id)
+    if isinstance(chunks, str):
+        return chunks
+    parts = []
+    length = 0
+    for _, chunk in chunks:
+        parts.append(chunk[:size - length])
+        length += len(parts[-1])
+        if length >= size:
+            break
+    return "".join(parts)
+
+def summary_call(document_id: str, template_id: str):
+    """The result cache key of summarize_sections and the function computing its output."""
+    def compute():
+        chunks = document_chunks(document_id)
+        if isinstance(chunks, str):
+            return chunks
         try:
-            validate(instance=data, schema=schema)
-            data["_validation"] = "passed"
-        except ValidationError as e:
-            data["_validation"] = f"failed: {e.message}"
-    else:
-        data["_validation"] = "no_schema_found"
-    return data
+            # Reads only as far as needed to fill every field of the template
+            return summarize_chunks(document_id, chunks, template_id,
+                                    processor.headings(document_id), content_hash)
+        except ConfigNotFound as e:
+            return f"Error: {str(e)}"
+
+    content_hash = processor.content_hash(document_id)
+    key = ("summarize_sections", ANALYSIS_VERSION, content_hash,
+           template_id, config_versions("templates", template_id))
+    return key, compute
+
+def risks_call(document_id: str, rubric_id: str):
+    """The result cache key of identify_risks and the function computing its output."""
+    def compute():
+        chunks = document_chunks(document_id)
+        if isinstance(chunks, str):
+            return chunks
+        try:
+            return assess_risk_chunks(document_id, chunks, rubric_id)
+        except ConfigNotFound as e:
+            return f"Error: {str(e)}"
+
+    content_hash = processor.content_hash(document_id)
+    key = ("identify_risks", ANALYSIS_VERSION, content_hash,
+           rubric_id, config_versions("rubrics", rubric_id))
+    return key, compute
+
+# --- Ingestion stages ---
+
+def extract_stage(document_id: str, content_hash: str):
+    """Extract (and OCR) a document into the extraction cache and the search index."""
+    entry = processor.extract(document_id)
+    if entry.get("ocr_errors"):
+        raise IngestError(f"OCR failed on {entry['ocr_errors']} page(s)", retry=True)
+    if entry["text"].startswith("Error"):
+        raise IngestError(entry["text"])
+
+def precompute(key, compute):
+    """Store a tool output for its cache key, unless it is stored already."""
+    if ingest.result(key) is not None:
+        return
+    output = compute()
+    if isinstance(output, str):
+        raise IngestError(output)
+    serialized = compact(output)
+    # key[2] is the content hash the output was computed from
+    ingest.put_result(key[2], key, serialized)
+    results.put(key, serialized)
+
+def summarize_stage(document_id: str, content_hash: str):
+    precompute(*summary_call(document_id, INGEST_TEMPLATE))
+
+def risks_stage(document_id: str, content_hash: str):
+    precompute(*risks_call(document_id, INGEST_RUBRIC))
+
+stages = [("extract", extract_stage)]
+if INGEST_TEMPLATE:
+    stages.append(("summarize_sections", summarize_stage))
+if INGEST_RUBRIC:
+    stages.append(("identify_risks", risks_stage))
+
+def unqueued_documents():
+    """Stored documents awaiting extraction, with their content hashes, for the pipeline to queue."""
+    # The rescan catalogs files copied onto the volume
+    records, _ = processor.list_document_records(status="pending", limit=DISCOVER_BATCH)
+    documents = []
+    for record in records:
+        try:
+            documents.append((record["name"], record.get("content_hash") or processor.content_hash(record["name"])))
+        except FileNotFoundError:
+            pass
+    return documents
+
+pipeline = IngestWorkers(ingest, stages, referenced=lambda: processor.catalog.hashes(),
+                         discover=unqueued_documents)
 
 @mcp.resource("system://health")
 def health_check() -> str:
-    """Health check endpoint."""
-    return json.dumps({"status": "healthy"})
+    """Health check endpoint: reports "unhealthy" when document storage cannot be written."""
+    writable = os.access(processor.storage_dir, os.W_OK) and (
+        not processor.state_dir.exists() or os.access(processor.state_dir, os.W_OK)
+    )
+    return json.dumps({"status": "healthy" if writable else "unhealthy",
+                       "storage_writable": writable})
+
+@mcp.resource("system://startup")
+def startup_report() -> str:
+    """Seconds the server and each extractor backend took to import, and the pre-warm state."""
+    imports = dict(startup["import_seconds"], **extractor_import_seconds)
+    return json.dumps(dict(startup, import_seconds=imports), indent=2)
+
+@mcp.resource("system://metrics", mime_type="text/plain")
+def metrics() -> str:
+    """
+    Request latency histograms, outcomes, payload sizes and in-flight counts per
+    tool and resource, pages and seconds per extractor, and cache hit counts, in
+    the Prometheus text format.
+    """
+    return REGISTRY.render()
+
+@mcp.resource("system://cache")
+def cache_stats() -> str:
+    """Hit and miss counts of the extraction and tool result caches."""
+    return json.dumps({
+        "extraction": {"hits": processor.cache.hits, "misses": processor.cache.misses},
+        "results": results.stats()
+    }, indent=2)
 
 # --- Resources ---
 
-@mcp.resource("documents://list")
-def list_documents() -> str:
-    """List available documents in the system."""
-    docs = processor.list_documents()
-    return json.dumps(docs, indent=2)
+@mcp.resource("documents://list{?offset,limit,sort,order,mime_type,status,pattern}")
+def list_documents(
+    offset: int = 0,
+    limit: int = 100,
+    sort: str = "name",
+    order: str = "asc",
+    mime_type: str = None,
+    status: str = None,
+    pattern: str = None
+) -> str:
+    """
+    List stored documents with their size, mime type, page count, content hash
+    and extraction status. Supports paging (offset, limit), sorting (sort=name|size|
+    mtime_ns|mime_type|page_count|extraction_status|updated_at, order=asc|desc) and
+    filters (mime_type, status=pending|extracted|partial|failed, pattern=glob).
+    """
+    try:
+        documents, total = processor.list_document_records(
+            offset=offset, limit=limit, sort=sort, descending=order.lower() == "desc",
+            mime_type=mime_type, status=status, pattern=pattern
+        )
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    return json.dumps({
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "documents": documents
+    }, indent=2)
 
 @mcp.resource("config://templates")
 def list_templates() -> str:
     """List available extraction templates."""
-    return json.dumps(get_templates(), indent=2)
+    return serialized("templates")
 
 @mcp.resource("config://rubrics")
 def list_rubrics() -> str:
     """List available risk rubrics."""
-    return json.dumps(get_rubrics(), indent=2)
+    return serialized("rubrics")
 
 @mcp.resource("config://schemas/{schema_name}")
 def get_output_schema(schema_name: str) -> str:
     """Get a specific output schema by name (e.g., loan_output)."""
-    schema = get_schema(schema_name)
+    schema = get_schema_json(schema_name)
     if schema:
-        return json.dumps(schema, indent=2)
+        return schema
     return "Schema not found."
 
 @mcp.resource("config://checklists")
 def list_checklists() -> str:
     """List available action checklists."""
-    return json.dumps(get_checklists(), indent=2)
+    return serialized("checklists")
 
 @mcp.resource("config://questions")
 def list_question_banks() -> str:
     """List available question banks."""
-    return json.dumps(get_question_banks(), indent=2)
+    return serialized("questions")
 
 # --- Tools ---
 
 @mcp.tool()
-def upload_document(filename: str, file_content_base64: str) -> str:
+@offloaded
+def upload_document(filename: str, file_content_base64: str, priority: int = 0) -> str:
     """
-    Upload a document to the server.
+    Upload a document to the server. It is extracted, indexed and analysed in the
+    background; document_status reports the progress.
     Args:
         filename: The name of the file to save (e.g., 'resume.docx').
         file_content_base64: The base64 encoded content of the file.
+        priority: Background processing order; higher goes first (default: 0).
     """
     try:
         content = base64.b64decode(file_content_base64)
         path = processor.save_upload(filename, content)
-        return f"Successfully uploaded document to {path}"
+        return stored_upload(path, filename, priority)
     except Exception as e:
         return f"Error uploading document: {str(e)}"
 
 @mcp.tool()
+def begin_upload(filename: str, upload_id: str = None) -> str:
+    """
+    Start a chunked upload, or resume one.
+    Args:
+        filename: The name of the file to save (e.g., 'scan.pdf').
+        upload_id: An unfinished upload to resume; its current offset is returned.
+    """
+    try:
+        if upload_id:
+            return json.dumps({"upload_id": upload_id, "offset": uploads.offset(upload_id)})
+        return json.dumps({"upload_id": uploads.begin(filename), "offset": 0})
+    except (UploadError, ValueError) as e:
+        return f"Error: {str(e)}"
+
+@mcp.tool()
+@offloaded
+def upload_chunk(upload_id: str, offset: int, chunk_base64: str) -> str:
+    """
+    Append one chunk to a chunked upload.
+    Args:
+        upload_id: The ID returned by begin_upload.
+        offset: Byte offset of this chunk in the file.
+        chunk_base64: The base64 encoded chunk.
+    """
+    try:
+        chunk = base64.b64decode(chunk_base64, validate=True)
+        return json.dumps({"upload_id": upload_id, "offset": uploads.append(upload_id, offset, chunk)})
+    except binascii.Error as e:
+        return f"Error: Invalid base64 chunk: {str(e)}"
+    except UploadError as e:
+        return f"Error: {str(e)}"
+
+@mcp.tool()
+@offloaded
+def commit_upload(upload_id: str, sha256: str, priority: int = 0) -> str:
+    """
+    Finish a chunked upload after verifying the checksum of the whole file.
+    Args:
+        upload_id: The ID returned by begin_upload.
+        sha256: Hex SHA-256 of the complete file.
+        priority: Background processing order; higher goes first (default: 0).
+    """
+    try:
+        path = uploads.commit(upload_id, sha256)
+        return stored_upload(path, Path(path).name, priority)
+    except (UploadError, ValueError) as e:
+        return f"Error uploading document: {str(e)}"
+
+@mcp.tool()
+@offloaded
 def extract_document(document_id: str) -> str:
     """
-    Extract raw text from a document.
+    Extract raw text from a document. For long documents prefer read_document,
+    which returns one slice at a time.
     Args:
         document_id: The filename of the document (e.g., 'loan_app.pdf').
     """
@@ -100,127 +434,280 @@ def extract_document(document_id: str) -> str:
         return f"Error extracting document: {str(e)}"
 
 @mcp.tool()
-def summarize_sections(document_id: str, template_id: str) -> str:
+@offloaded
+def read_document(document_id: str, offset: int = 0, limit: int = 20000,
+                  first_page: int = None, last_page: int = None) -> str:
     """
-    Extract sections from a document based on a template for summarization.
+    Read part of a document's text instead of all of it. Returns JSON with the "text",
+    its "offset" and "end", and "next_offset" to continue from (null at the end).
     Args:
         document_id: The filename of the document.
-        template_id: The ID of the template to use (e.g., 'loan_application_v1').
+        offset: Character offset to start at (default: 0), e.g. a previous next_offset.
+        limit: Maximum number of characters to return (default: 20000).
+        first_page: First page to read (1-based); pages apply to PDFs and images.
+        last_page: Last page to read, inclusive.
     """
-    text = processor.extract_text(document_id)
-    if text.startswith("Error"):
-        return text
-    
-    template = get_template(template_id)
-    if not template:
-        return f"Error: Template '{template_id}' not found."
-    
-    # Simple regex based extraction based on template 'extraction_rules'
-    # In a real app, this might be more sophisticated layout analysis
-    extracted_data = {}
-    
-    # Iterate over rules to find content
-    if 'extraction_rules' in template:
-        for rule in template['extraction_rules']:
-            field = rule.get('field')
-            pattern = rule.get('pattern')
-            if field and pattern:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    # Capture the first group if available, else the whole match
-                    val = match.group(1) if match.groups() else match.group(0)
-                    extracted_data[field] = val.strip()
-    
-    # Construct Output
-    output = {
+    try:
+        return json.dumps({"document_id": document_id,
+                           **processor.read(document_id, offset, limit, first_page, last_page)})
+    except FileNotFoundError:
+        return f"Error: Document '{document_id}' not found."
+    except Exception as e:
+        return f"Error reading document: {str(e)}"
+
+@mcp.tool()
+@offloaded
+def document_info(document_id: str) -> str:
+    """
+    Size, type, page count, extraction status and outline (headings or PDF bookmarks)
+    of a document, to plan read_document calls. Never extracts or OCRs the document.
+    Args:
+        document_id: The filename of the document.
+    """
+    try:
+        return json.dumps(processor.info(document_id), indent=2)
+    except FileNotFoundError:
+        return f"Error: Document '{document_id}' not found."
+    except Exception as e:
+        return f"Error reading document info: {str(e)}"
+
+@mcp.tool()
+@offloaded
+def document_status(document_id: str = None) -> str:
+    """
+    Background processing progress of an uploaded document: its job status (queued,
+    running, done or failed), current stage, attempts, place in the queue and last
+    error. Without a document_id, the number of jobs in each status.
+    Args:
+        document_id: The filename of the document (optional).
+    """
+    if not document_id:
+        return json.dumps({"jobs": ingest.counts(), "workers": INGEST_WORKERS,
+                           "stages": [name for name, _ in stages]}, indent=2)
+    if not (processor.storage_dir / document_id).is_file():
+        return f"Error: Document '{document_id}' not found."
+    job = ingest.status(document_id) or {"status": "not_queued"}
+    record = processor.catalog.get(document_id) or {}
+    return json.dumps({
         "document_id": document_id,
-        "template_id": template_id,
-        "extracted_sections": extracted_data,
-        "raw_text_snippet": text[:500] + "..." # Context
-    }
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "stages_done": job.get("stages_done", 0),
+        "stages": [name for name, _ in stages],
+        "attempts": job.get("attempts", 0),
+        "priority": job.get("priority"),
+        "queue_position": job.get("queue_position"),
+        "error": job.get("error"),
+        "extraction_status": record.get("extraction_status", "pending"),
+        "enqueued_at": job.get("enqueued_at"),
+        "finished_at": job.get("finished_at"),
+    }, indent=2)
 
-    # Validate against schema if it exists (e.g. template_id + "_schema")
-    # For simplicity, we assume schema name matches template name logic or passed explicitly.
-    # Here checking for generic 'extraction_output' or specific one.
-    # Let's try to find a schema named "{template_id}_schema"
-    # output = validate_output(output, f"{template_id}_output") 
-    
-    return json.dumps(output, indent=2)
+@mcp.tool()
+@offloaded
+def summarize_sections(document_id: str, template_id: str, pretty: bool = False) -> str:
+    """
+    Extract sections from a document based on a template for summarization.
+    Args:
+        document_id: The filename of the document.
+        template_id: The ID of the template to use (e.g., 'loan_application_v1').
+        pretty: Indent the JSON output (default: compact).
+    """
+    try:
+        key, compute = summary_call(document_id, template_id)
+    except FileNotFoundError:
+        return f"Error: Document '{document_id}' not found."
+    stage = "summarize_sections" if template_id == INGEST_TEMPLATE else "extract"
+    return memoized(key, compute, pretty, document_id, stage)
 
 @mcp.tool()
-def identify_risks(document_id: str, rubric_id: str = "loan_risk_v1") -> str:
+@offloaded
+def identify_risks(document_id: str, rubric_id: str = "loan_risk_v1", pretty: bool = False) -> str:
     """
     Identify potential risks in a document based on a risk rubric.
     Args:
         document_id: The filename of the document.
         rubric_id: The ID of the rubric to use (default: loan_risk_v1).
+        pretty: Indent the JSON output (default: compact).
     """
-    text = processor.extract_text(document_id).lower()
+    try:
+        key, compute = risks_call(document_id, rubric_id)
+    except FileNotFoundError:
+        return f"Error: Document '{document_id}' not found."
+    stage = "identify_risks" if rubric_id == INGEST_RUBRIC else "extract"
+    return memoized(key, compute, pretty, document_id, stage)
 
-    if text.startswith("Error"):
-        return text
+@mcp.tool()
+@offloaded
+def classify_document(document_id: str = None, documents: list[str] = None, pattern: str = None,
+                      top: int = 3) -> str:
+    """
+    Find the templates, rubrics, checklists and question banks that fit a document, so
+    their IDs need not be guessed. Returns the best template_id, rubric_id, checklist_id
+    and bank_id, and the top matches of each kind with similarity scores (0 to 1).
+    Classify many documents at once by passing documents and/or pattern instead.
+    Args:
+        document_id: The filename of one document.
+        documents: Document IDs to classify in one call.
+        pattern: Glob to filter document IDs (e.g., '*.pdf'; '*' for all).
+        top: Matches listed per kind (default: 3).
+    """
+    if not (document_id or documents or pattern):
+        return "Error: Pass a document_id, or documents and/or a pattern to classify a batch."
+    document_ids = [document_id] if document_id else select_documents(processor, documents, pattern)
+    if not document_ids:
+        return "Error: No documents matched."
+    texts = {}
+    errors = {}
+    for name in document_ids:
+        try:
+            text = document_head(name, CLASSIFY_MAX_CHARS)
+        except FileNotFoundError:
+            text = f"Error: Document '{name}' not found."
+        except Exception as e:
+            text = f"Error extracting document: {str(e)}"
+        if text.startswith("Error") or text.startswith("[Unsupported"):
+            errors[name] = text
+        else:
+            texts[name] = text
+    # Every document is scored in one matrix product per config kind
+    ranked = dict(zip(texts, classify(list(texts.values()), top))) if texts else {}
+    results = [{"document_id": name, **ranked[name]} if name in ranked
+               else {"document_id": name, "error": errors[name]} for name in document_ids]
+    if document_id:
+        return results[0]["error"] if "error" in results[0] else json.dumps(results[0], indent=2)
+    return json.dumps({"total": len(results), "failed": len(errors), "results": results}, indent=2)
 
-    rubric = get_rubric(rubric_id)
-    if not rubric:
-        return f"Error: Rubric '{rubric_id}' not found."
-
-    identified_risks = []
-    
-    # Very basic keyword matching for demonstration
-    # Real logic would likely involve LLM calls or complex rules
-    for criteria in rubric.get('criteria', []):
-        risk_id = criteria.get('id')
-        description = criteria.get('description', '').lower()
-        
-        # Heuristic: check if keywords from description appear in text 
-        # (This is a simplified example)
-        # In reality, this might check specific extracted fields values
-        
-        # For 'missing_info', we might check if 'signature' is absent
-        if risk_id == 'missing_info' and 'signature' not in text:
-            identified_risks.append({
-                "id": risk_id,
-                "level": criteria.get('risk_level'),
-                "reason": "Potential missing signature."
-            })
-    
-    # Sampling / Escalation Logic
-    # Trigger manual review if any "High" or "Critical" risk is found
-    high_risk_found = any(r['level'] in ["High", "Critical"] for r in identified_risks)
-    
-    # In a real system, we might check a config threshold like "risk_score > 0.7"
-    # Here we simulate it based on risk levels.
-    
-    output = {
-        "document_id": document_id,
-        "rubric_id": rubric_id,
-        "risks": identified_risks,
-        "manual_review_required": high_risk_found,
-        "escalation_reason": "High/Critical risk factors detected" if high_risk_found else None
-    }
-    
-    return json.dumps(output, indent=2)
+@mcp.tool()
+@offloaded
+def search_documents(query: str, limit: int = 10, offset: int = 0) -> str:
+    """
+    Find stored documents that mention terms, ranked by BM25 relevance, with a snippet
+    from the best matching page.
+    Args:
+        query: Terms to find. Supports "exact phrases", AND / OR / NOT (e.g.
+               'loan NOT "paid in full"'), prefixes (e.g. 'bankrupt*') and NEAR(a b, 5).
+        limit: Maximum number of documents to return (default: 10).
+        offset: Number of results to skip, for paging.
+    """
+    try:
+        results, total = processor.search.search(query, limit, offset)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    return json.dumps({"query": query, "total": total, "results": results}, indent=2)
 
 @mcp.tool()
-def generate_action_checklist(document_id: str, checklist_id: str = "loan_checklist_v1") -> str:
+@offloaded
+def rebuild_search_index() -> str:
+    """
+    Bring the search index up to date with every stored document, e.g. after files were
+    copied onto the data volume. Unchanged documents are skipped; the rest are extracted
+    in parallel.
+    """
+    try:
+        return json.dumps(rebuild(processor), indent=2)
+    except Exception as e:
+        return f"Error rebuilding search index: {str(e)}"
+
+@mcp.tool()
+def generate_action_checklist(document_id: str, checklist_id: str = "loan_checklist_v1",
+                              pretty: bool = False) -> str:
     """
     Generate a checklist of actions based on document status.
     Args:
         document_id: The filename of the document.
         checklist_id: The ID of the checklist to use (default: loan_checklist_v1).
+        pretty: Indent the JSON output (default: compact).
+    """
+    def compute():
+        try:
+            return action_checklist(document_id, checklist_id)
+        except ConfigNotFound as e:
+            return f"Error: {str(e)}"
+
+    key = ("generate_action_checklist", ANALYSIS_VERSION, document_id,
+           checklist_id, config_version("checklists", checklist_id))
+    return memoized(key, compute, pretty)
+
+@mcp.tool()
+def validate_outputs(outputs: list[dict], schema_name: str) -> str:
+    """
+    Validate many outputs against one JSON schema in a single call, reporting every
+    error of each rather than only the first.
+    Args:
+        outputs: The JSON objects to validate.
+        schema_name: A schema in configs/schemas, without extension (e.g. 'loan_output').
+    """
+    results = validate_many([dict(output) for output in outputs], schema_name)
+    if results and results[0]["_validation"] == "no_schema_found":
+        return f"Error: Schema '{schema_name}' not found."
+    return json.dumps({
+        "schema": schema_name,
+        "passed": sum(r["_validation"] == "passed" for r in results),
+        "failed": sum(r["_validation"] != "passed" for r in results),
+        "results": [{"_validation": r["_validation"], "errors": r.get("_validation_errors", [])}
+                    for r in results],
+    }, indent=2)
+
+@mcp.tool()
+async def batch_process(
+    documents: list[str] = None,
+    pattern: str = None,
+    template_id: str = None,
+    rubric_id: str = None,
+    checklist_id: str = None,
+    ctx: Context = None
+) -> str:
     """
-    # In a real scenario, we might check document contents to conditionally include items
-    # For now, we return the static items from config, but filtering could happen here.
-    
-    checklist = get_checklist(checklist_id)
-    if not checklist:
-        return f"Error: Checklist '{checklist_id}' not found."
+    Analyse many stored documents in one call. Each document is extracted once and
+    the requested template, rubric and checklist are applied to the shared text.
+    Per-document results are streamed as log messages as they finish; the return
+    value only counts them and lists the failures, so it stays small for any batch.
+    Args:
+        documents: Document IDs to process (default: all stored documents).
+        pattern: Glob to filter document IDs (e.g., '*.pdf', 'loan_*').
+        template_id: Template for summarize_sections (optional).
+        rubric_id: Rubric for identify_risks (optional).
+        checklist_id: Checklist for generate_action_checklist (optional).
+    """
+    error = check_configs(template_id, rubric_id, checklist_id)
+    if error:
+        return f"Error: {error}"
+    document_ids = select_documents(processor, documents, pattern)
+    if not document_ids:
+        return "Error: No documents matched."
+
+    done = 0
+    failures = []
+    batch = run_batch(processor, document_ids, template_id, rubric_id, checklist_id)
+    try:
+        async with tool_limiter("batch_process"):
+            while True:
+                result = await run_in_thread(next, batch, None)
+                if result is None:
+                    break
+                done += 1
+                if "error" in result:
+                    failures.append({"document_id": result["document_id"], "error": result["error"]})
+                if ctx:
+                    await ctx.report_progress(done, len(document_ids))
+                    await ctx.info(json.dumps(result))
+    except ServerBusy as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        return f"Error during batch processing: {str(e)}"
+    finally:
+        try:
+            batch.close()
+        except ValueError:
+            # Still running in a worker thread after a cancellation
+            pass
 
-    # Return the items from the config
     return json.dumps({
-        "document_id": document_id,
-        "checklist_id": checklist_id,
-        "checklist": checklist.get('items', [])
+        "total": done,
+        "succeeded": done - len(failures),
+        "failed": len(failures),
+        "failures": failures
     }, indent=2)
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: uploads are only locked within a process
+    fcntl = None
+
+# Unfinished uploads older than this many seconds are removed.
+UPLOAD_EXPIRY = int(os.environ.get("UPLOAD_EXPIRY", str(24 * 3600)))
+
+class UploadError(Exception):
+    pass
+
+class UploadManager:
+    """
+    Resumable chunked uploads.
+
+    Chunks are appended to a temp file under the processor's state directory;
+    commit verifies the SHA-256 of the whole file and moves it into storage
+    atomically, so a document is never visible half-written. An interrupted
+    client asks for the current offset and continues from there.
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.upload_dir = processor.state_dir / "uploads"
+        self._lock = threading.Lock()
+        self._upload_locks = {}
+
+    def _paths(self, upload_id: str):
+        if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+            raise UploadError(f"Invalid upload id '{upload_id}'.")
+        return self.upload_dir / f"{upload_id}.part", self.upload_dir / f"{upload_id}.json"
+
+    @contextmanager
+    def _locked(self, upload_id: str):
+        # Serializes work on one upload across threads and, with a lock on its
+        # metadata file, across server processes
+        _, meta_path = self._paths(upload_id)
+        with self._lock:
+            lock = self._upload_locks.setdefault(upload_id, threading.Lock())
+        with lock:
+            try:
+                f = open(meta_path, "rb")
+            except FileNotFoundError:
+                raise UploadError(f"Upload '{upload_id}' not found or expired.") from None
+            with f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def _load(self, upload_id: str):
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f), part_path, meta_path
+        except FileNotFoundError:
+            raise UploadError(f"Upload '{upload_id}' not found or expired.") from None
+
+    def begin(self, filename: str) -> str:
+        self.processor.validate_name(filename)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.cleanup_expired()
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        part_path.touch()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"filename": filename, "started": time.time()}, f)
+        return upload_id
+
+    def offset(self, upload_id: str) -> int:
+        """Number of bytes received so far; where a resumed upload continues."""
+        _, part_path, _ = self._load(upload_id)
+        return part_path.stat().st_size
+
+    def append(self, upload_id: str, offset: int, data: bytes) -> int:
+        with self._locked(upload_id):
+            _, part_path, _ = self._load(upload_id)
+            size = part_path.stat().st_size
+            if offset < 0 or offset > size:
+                raise UploadError(f"Chunk offset {offset} does not match received size {size}.")
+            with open(part_path, "r+b") as f:
+                # Re-sent chunks overwrite what was already received.
+                f.seek(offset)
+                f.write(data)
+                return max(size, offset + len(data))
+
+    def commit(self, upload_id: str, sha256: str) -> str:
+        with self._locked(upload_id):
+            meta, part_path, meta_path = self._load(upload_id)
+            with open(part_path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+            if digest != sha256.lower():
+                raise UploadError(
+                    f"Checksum mismatch: received data hashes to {digest}. "
+                    "Resend the upload or resume from a known-good offset."
+                )
+            path = self.processor.store_file(meta["filename"], part_path, digest)
+            meta_path.unlink()
+        with self._lock:
+            self._upload_locks.pop(upload_id, None)
+        return path
+
+    def abort(self, upload_id: str):
+        for path in self._paths(upload_id):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def cleanup_expired(self):
+        """
+        Remove unfinished uploads past UPLOAD_EXPIRY, and the temp files
+        (`*.tmp` single-call uploads, `*.link` blob store writes) that a
+        crash left behind in the same directory.
+        """
+        cutoff = time.time() - UPLOAD_EXPIRY
+        for path in self.upload_dir.glob("*.part"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    self.abort(path.stem)
+            except (FileNotFoundError, UploadError):
+                pass
+        for pattern in ("*.tmp", "*.link"):
+            for path in self.upload_dir.glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,147 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from functools import partial, wraps
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import profiling
+
+# Server processes sharing the host (see serve.py). Pools sized "to the
+# host" get each process's share of the CPUs.
+SERVER_WORKERS = max(1, int(os.environ.get("SERVER_WORKERS", "1")))
+CPU_SHARE = max(1, (os.cpu_count() or 1) // SERVER_WORKERS)
+
+# Worker processes used for page-parallel PDF extraction. 0 sizes the pool
+# to the host.
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "0")) or CPU_SHARE
+
+_pools = {}
+_lock = threading.Lock()
+
+def _mp_context():
+    # forkserver children are forked from a clean single-threaded process,
+    # which is safe even though the server itself runs threads.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+def get_process_pool(name: str, max_workers: int, initializer=None) -> ProcessPoolExecutor:
+    """Return the shared process pool called `name`, creating it on first use."""
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=_mp_context(),
+                                       initializer=initializer)
+            _pools[name] = pool
+        return pool
+
+def discard_process_pool(name: str):
+    """Drop a pool (e.g. after BrokenProcessPool) so the next call recreates it."""
+    with _lock:
+        pool = _pools.pop(name, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown():
+    global _thread_pool
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        if _thread_pool is not None:
+            pools.append(_thread_pool)
+            _thread_pool = None
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+# Threads that run blocking tool handlers off the event loop. PDF and OCR work
+# started from these threads still goes to the process pools above.
+TOOL_THREADS = int(os.environ.get("TOOL_THREADS", "0")) or min(32, (os.cpu_count() or 1) + 4)
+# Default number of concurrent calls per tool, and how many more may wait
+# before new calls are turned away.
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", "4"))
+TOOL_QUEUE_LIMIT = int(os.environ.get("TOOL_QUEUE_LIMIT", "32"))
+# Per-tool overrides, e.g. "batch_process=1,extract_document=8"
+TOOL_LIMITS = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.environ.get("TOOL_LIMITS", "").split(",") if "=" in item
+    )
+}
+
+_thread_pool = None
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+        return _thread_pool
+
+class ServerBusy(Exception):
+    pass
+
+class ToolLimiter:
+    """Caps concurrent calls of one tool and rejects calls beyond a bounded queue."""
+
+    def __init__(self, name: str, concurrency: int, queue_limit: int = TOOL_QUEUE_LIMIT):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.waiting = 0
+        self.running = 0
+        self._semaphore = None
+        self._loop = None
+
+    def _get_semaphore(self):
+        # Semaphores belong to one event loop; tests start a new loop per call.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def __aenter__(self):
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.waiting >= self.queue_limit:
+            raise ServerBusy(
+                f"Server busy: {self.waiting} '{self.name}' requests already waiting, retry later."
+            )
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.running -= 1
+        self._semaphore.release()
+
+_limiters = {}
+
+def tool_limiter(name: str) -> ToolLimiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = ToolLimiter(name, TOOL_LIMITS.get(name, TOOL_CONCURRENCY))
+    return limiter
+
+async def run_in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_thread_pool(), partial(fn, *args))
+
+def offloaded(fn):
+    """
+    Turn a blocking tool handler into an async one that runs on the tool
+    thread pool under the tool's concurrency limit, so the event loop (and
+    with it system://health and the config:// resources) stays responsive.
+    A call that finds the tool's queue full gets an error string back.
+    Handlers are also where the slow-request profiler hooks in.
+    """
+    @wraps(fn)
+    async def handler(*args, **kwargs):
+        try:
+            async with tool_limiter(fn.__name__):
+                return await run_in_thread(profiling.profiler.run, fn.__name__, partial(fn, *args, **kwargs))
+        except ServerBusy as e:
+            return f"Error: {str(e)}"
+    return handler
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The server modules import each other by bare name, as they do when started
+# with `python src/server.py`.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,46 @@
+import json
+import asyncio
+from src.document_processor import DocumentProcessor
+from batch import run_batch, select_documents
+
+LOAN = "Name: Jane Roe\nLoan Amount: 5000\nNotes: filed for bankruptcy\nSignature: Jane Roe\n"
+
+def make_store(tmp_path):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    for i in range(4):
+        processor.save_upload(f"loan_{i}.txt", LOAN.encode())
+    processor.save_upload("notes.md", b"unsupported")
+    return processor
+
+def test_select_documents(tmp_path):
+    processor = make_store(tmp_path)
+    assert select_documents(processor, pattern="loan_*") == [f"loan_{i}.txt" for i in range(4)]
+    assert select_documents(processor, documents=["missing.txt", "loan_1.txt"]) == ["missing.txt", "loan_1.txt"]
+
+def test_run_batch_pool_matches_inline(tmp_path):
+    processor = make_store(tmp_path)
+    names = select_documents(processor) + ["missing.txt"]
+    kwargs = dict(template_id="loan_application_v1", rubric_id="loan_risk_v1", checklist_id="loan_checklist_v1")
+
+    def by_id(results):
+        return {r["document_id"]: {k: v for k, v in r.items() if k != "seconds"} for r in results}
+
+    inline = by_id(run_batch(processor, names, workers=1, **kwargs))
+    pooled = by_id(run_batch(processor, names, workers=2, **kwargs))
+    assert pooled == inline
+    assert inline["loan_0.txt"]["summary"]["extracted_sections"]["loan_amount"] == "5000"
+    assert inline["loan_0.txt"]["risks"]["risks_identified"] == ["credit_history"]
+    assert "error" in inline["missing.txt"] and "error" in inline["notes.md"]
+
+def test_batch_process_tool(tmp_path, monkeypatch):
+    import src.server as server
+    monkeypatch.setattr(server, "processor", make_store(tmp_path))
+    monkeypatch.setattr(server, "run_batch", lambda *a: run_batch(*a, workers=1))
+    response = asyncio.run(server.batch_process.fn(pattern="loan_*", rubric_id="loan_risk_v1"))
+    data = json.loads(response)
+    assert data["total"] == 4 and data["failed"] == 0
+    assert data["failures"] == [] and "results" not in data
+
+    data = json.loads(asyncio.run(server.batch_process.fn(documents=["loan_0.txt", "missing.txt"])))
+    assert (data["succeeded"], data["failed"]) == (1, 1)
+    assert data["failures"][0]["document_id"] == "missing.txt"
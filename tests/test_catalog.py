@@ -0,0 +1,60 @@
+import json
+from src.document_processor import DocumentProcessor
+
+def test_catalog_tracks_uploads_and_extraction(tmp_path):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    processor.save_upload("b.txt", b"bbbb")
+    processor.save_upload("a.txt", b"a")
+    record = processor.catalog.get("a.txt")
+    assert record["size"] == 1 and record["mime_type"] == "text/plain"
+    assert record["extraction_status"] == "pending"
+
+    processor.extract_text("a.txt")
+    record = processor.catalog.get("a.txt")
+    assert record["extraction_status"] == "extracted" and record["page_count"] == 1
+    assert record["content_hash"] is not None
+
+    documents, total = processor.list_document_records(sort="size", descending=True, limit=1)
+    assert total == 2 and [d["name"] for d in documents] == ["b.txt"]
+    documents, total = processor.list_document_records(status="extracted")
+    assert [d["name"] for d in documents] == ["a.txt"]
+
+def test_rescan_reconciles_volume_changes(tmp_path):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    processor.save_upload("kept.txt", b"x")
+    processor.save_upload("gone.txt", b"x")
+    (tmp_path / "gone.txt").unlink()
+    (tmp_path / "dropped.pdf").write_bytes(b"%PDF")
+
+    processor.catalog.rescan()
+    assert processor.catalog.names() == ["dropped.pdf", "kept.txt"]
+    assert processor.catalog.get("dropped.pdf")["mime_type"] == "application/pdf"
+
+def test_touched_documents_do_not_stay_pending(tmp_path):
+    import os
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    processor.save_upload("a.txt", b"same")
+    processor.extract_text("a.txt")
+    # Touched on the volume: the rescan resets the row, the next extraction records it again
+    path = tmp_path / "a.txt"
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    processor.catalog.rescan()
+    assert processor.catalog.get("a.txt")["extraction_status"] == "pending"
+    processor.extract_text("a.txt")
+    assert processor.catalog.get("a.txt")["extraction_status"] == "extracted"
+    # and a rescan after it has nothing to reset
+    processor.catalog.rescan()
+    assert processor.catalog.get("a.txt")["extraction_status"] == "extracted"
+
+def test_documents_list_resource(tmp_path, monkeypatch):
+    import src.server as server
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    for name in ["x.txt", "y.txt", "z.pdf"]:
+        processor.save_upload(name, b"data")
+    monkeypatch.setattr(server, "processor", processor)
+
+    data = json.loads(server.list_documents.fn(limit=2, pattern="*.txt", order="desc"))
+    assert data["total"] == 2
+    assert [d["name"] for d in data["documents"]] == ["y.txt", "x.txt"]
+    assert server.list_documents.fn(sort="bogus").startswith("Error")
@@ -0,0 +1,58 @@
+import json
+import asyncio
+from src.classifier import ConfigMatrix, classify
+
+def test_documents_are_routed_to_matching_configs():
+    results = classify([
+        "Applicant: Jane Doe. Annual Income: $55,000. Loan Amount: $10,000. Purpose: car",
+        "Patient Name: John Roe. MRN: 1234. Diagnosis: asthma. Medication: inhaler. Insurance: Aetna",
+        "",
+    ])
+    assert results[0]["template_id"] == "loan_application_v1"
+    assert (results[0]["rubric_id"], results[0]["checklist_id"]) == ("loan_risk_v1", "loan_checklist_v1")
+    assert results[1]["template_id"] in ("medical_record_v1", "medical_report_v1")
+    assert results[1]["checklist_id"] == "medical_checklist_v1"
+    scores = [match["score"] for match in results[0]["templates"]]
+    assert len(scores) <= 3 and scores == sorted(scores, reverse=True) and 0 < scores[0] <= 1
+    # Nothing in common with any config
+    assert results[2]["template_id"] is None and results[2]["templates"] == []
+
+def test_shared_terms_weigh_less_than_distinctive_ones():
+    matrix = ConfigMatrix([
+        ("a", {"name": "Invoice", "keywords": ["Signature", "Total"]}),
+        ("b", {"name": "Lease", "keywords": ["Signature", "Tenant"]}),
+    ])
+    scores = matrix.scores(["Signature: x. Tenant: y", "Signature only"])
+    assert scores.shape == (2, 2)
+    assert scores[0, 1] > scores[0, 0]
+    assert abs(scores[1, 0] - scores[1, 1]) < 1e-6
+
+def test_classify_document_tool_in_batch(tmp_path, monkeypatch):
+    import src.server as server
+    from src.document_processor import DocumentProcessor
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    processor.save_upload("loan.txt", b"Loan Amount: $5,000. Annual Income: $40,000. Employer: ACME")
+    processor.save_upload("cv.txt", b"Candidate resume. Education: BSc. Skills: Python. Experience: 5 years")
+    processor.save_upload("blob.xyz", b"?")
+    monkeypatch.setattr(server, "processor", processor)
+
+    single = json.loads(asyncio.run(server.classify_document.fn(document_id="loan.txt", top=1)))
+    assert single["template_id"] == "loan_application_v1" and len(single["templates"]) == 1
+
+    report = json.loads(asyncio.run(server.classify_document.fn(pattern="*")))
+    by_name = {r["document_id"]: r for r in report["results"]}
+    assert (report["total"], report["failed"]) == (3, 1)
+    assert by_name["cv.txt"]["template_id"] == "hr_resume_v1"
+    assert "error" in by_name["blob.xyz"]
+    assert asyncio.run(server.classify_document.fn(document_id="nope.txt")).startswith("Error")
+    # A batch has to be asked for, not classified by omission
+    assert asyncio.run(server.classify_document.fn()).startswith("Error")
+
+def test_server_import_does_not_load_numpy():
+    import sys
+    import subprocess
+    from pathlib import Path
+    code = "import sys, server; print('numpy' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).resolve().parents[1] / "src",
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,39 @@
+import os
+import json
+import pytest
+import src.config_loader as config_loader
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "questions").mkdir()
+    monkeypatch.setattr(config_loader, "CONFIG_DIR", str(tmp_path))
+    monkeypatch.setattr(config_loader, "CONFIG_RELOAD_INTERVAL", 0)
+    return tmp_path
+
+def test_template_hot_reload(config_dir):
+    path = config_dir / "templates" / "t.yaml"
+    path.write_text('template_id: "t_v1"\nname: "First"\n')
+    assert config_loader.get_template("t_v1")["name"] == "First"
+    first_version = config_loader.config_version("templates", "t_v1")
+
+    path.write_text('template_id: "t_v1"\nname: "Second version"\n')
+    os.utime(path, ns=(0, 10**18))
+    assert config_loader.get_template("t_v1")["name"] == "Second version"
+    assert config_loader.config_version("templates", "t_v1") != first_version
+
+    path.unlink()
+    assert config_loader.get_template("t_v1") is None
+
+def test_serialized_cache_reused_until_change(config_dir):
+    (config_dir / "templates" / "a.yaml").write_text('template_id: "a_v1"\n')
+    first = config_loader.serialized("templates")
+    assert config_loader.serialized("templates") is first
+    assert json.loads(first) == [{"template_id": "a_v1"}]
+
+    (config_dir / "templates" / "b.yaml").write_text('template_id: "b_v1"\n')
+    assert len(json.loads(config_loader.serialized("templates"))) == 2
+
+def test_question_bank_lookup_by_bank_id(config_dir):
+    (config_dir / "questions" / "q.yaml").write_text('bank_id: "q_v1"\nquestions: []\n')
+    assert config_loader.get_question_bank("q_v1") is not None
@@ -0,0 +1,42 @@
+import re
+from indicator_matcher import AhoCorasick, RubricMatcher, risk_score
+
+def test_automaton_reports_overlapping_matches():
+    patterns = ["late payment", "payment", "pay", "he", "she", "hers"]
+    text = "she paid a late payment; ushers"
+    expected = sorted(
+        (m.start(), m.start() + len(p), i)
+        for i, p in enumerate(patterns)
+        for m in re.finditer("(?=%s)" % re.escape(p), text)
+    )
+    assert sorted(AhoCorasick(patterns).iter_matches(text)) == expected
+
+def test_rubric_scan_counts_whole_word_hits_per_criterion():
+    rubric = {
+        "rubric_id": "r",
+        "criteria": [
+            {"id": "credit", "risk_level": "High", "indicators": ["Bankruptcy", "default"]},
+            {"id": "gaps", "risk_level": "Medium", "indicators": ["unemployed"]},
+        ],
+    }
+    text = "Filed for BANKRUPTCY in 2019. No default by default-swap; defaulted once."
+    results = RubricMatcher(rubric).scan(text)
+    assert results["credit"]["hits"] == 3
+    assert results["credit"]["matches"][0] == {"indicator": "Bankruptcy", "start": 10, "end": 20}
+    assert results["gaps"] == {"hits": 0, "matches": []}
+
+def test_risk_score():
+    assert risk_score([]) == 0.0
+    assert risk_score(["High"]) == 0.8
+    assert risk_score(["Medium", "Medium"]) == 0.75
+
+def test_stream_scan_matches_whole_text_across_chunk_boundaries():
+    rubric = {"rubric_id": "r", "criteria": [
+        {"id": "credit", "indicators": ["Bankruptcy", "late payment", "default"]},
+    ]}
+    text = "Filed for BANKRUPTCY; one late payment, no default. defaults, late payments.\n" * 3
+    matcher = RubricMatcher(rubric)
+    expected = matcher.scan(text)
+    for size in (1, 5, 13):
+        chunks = [(i, text[i:i + size]) for i in range(0, len(text), size)]
+        assert matcher.scan_stream(chunks) == expected
@@ -0,0 +1,84 @@
+import time
+import threading
+import src.ingestion as ingestion
+from src.ingestion import IngestQueue, IngestWorkers, IngestError
+
+def test_jobs_run_by_priority_and_retry_with_backoff(tmp_path, monkeypatch):
+    queue = IngestQueue(tmp_path / "ingest.sqlite3")
+    assert queue.claim("w") is None and not queue.db_path.exists()
+    queue.enqueue("low.pdf", "h1")
+    queue.enqueue("high.pdf", "h2", priority=5)
+    queue.enqueue("bad.txt", "h3")
+    assert queue.status("bad.txt")["queue_position"] == 3
+
+    ran = []
+    def flaky(name, content_hash):
+        ran.append(name)
+        if name == "low.pdf":
+            raise OSError("disk hiccup")
+        if name == "bad.txt":
+            raise IngestError("Template 'x' not found.")
+    workers = IngestWorkers(queue, [("extract", flaky)])
+    while workers.run_once():
+        pass
+    assert ran == ["high.pdf", "low.pdf", "bad.txt"]
+    assert queue.status("high.pdf")["status"] == "done"
+    # Retried after a back-off, not right away
+    job = queue.status("low.pdf")
+    assert (job["status"], job["attempts"], job["error"]) == ("queued", 1, "extract: OSError: disk hiccup")
+    assert job["run_after"] > time.time() + 20
+    # Errors that cannot go away are not retried
+    assert queue.status("bad.txt")["status"] == "failed"
+    assert queue.counts() == {"queued": 1, "running": 0, "done": 1, "failed": 1}
+
+def test_jobs_survive_restarts_and_uploads_supersede_them(tmp_path, monkeypatch):
+    path = tmp_path / "ingest.sqlite3"
+    IngestQueue(path).enqueue("a.pdf", "h1")
+    # A worker claims the job and its process dies
+    monkeypatch.setattr(ingestion, "INGEST_LEASE_SECONDS", -1)
+    assert IngestQueue(path).claim("dead")["name"] == "a.pdf"
+    monkeypatch.setattr(ingestion, "INGEST_LEASE_SECONDS", 900)
+
+    queue = IngestQueue(path)
+    stages = []
+    def reupload(name, content_hash):
+        stages.append(content_hash)
+        queue.enqueue(name, "h2")
+    workers = IngestWorkers(queue, [("extract", reupload), ("analyse", lambda *args: stages.append("x"))])
+    assert workers.run_once()
+    # The new upload's job starts over instead of being marked done by the old one
+    job = queue.status("a.pdf")
+    assert stages == ["h1"] and (job["status"], job["content_hash"], job["attempts"]) == ("queued", "h2", 0)
+
+    queue.put_result("h1", ["identify_risks", "h1"], '{"n":1}')
+    queue.put_result("h2", ["identify_risks", "h2"], '{"n":2}')
+    queue.prune({"h2"})
+    assert queue.result(["identify_risks", "h1"]) is None
+    assert queue.result(["identify_risks", "h2"]) == '{"n":2}'
+
+def test_discovered_documents_queue_once_and_callers_wait_for_running_stages(tmp_path):
+    queue = IngestQueue(tmp_path / "ingest.sqlite3")
+    queue.enqueue("a.pdf", "h1")
+    assert queue.claim("w")["name"] == "a.pdf"
+    # Only content without a job is queued, behind uploads
+    assert queue.enqueue_new([("a.pdf", "h1"), ("dropped.pdf", "h2")]) == 1
+    assert queue.status("a.pdf")["status"] == "running"
+    assert queue.status("dropped.pdf")["priority"] == ingestion.DISCOVERED_PRIORITY
+    assert queue.enqueue_new([("dropped.pdf", "h2")]) == 0
+
+    # A caller needing extraction waits until the worker has finished that stage
+    queue.progress("a.pdf", "h1", "extract", 0)
+    def extracted():
+        time.sleep(0.1)
+        queue.progress("a.pdf", "h1", "summarize_sections", 1)
+    thread = threading.Thread(target=extracted)
+    thread.start()
+    queue.wait("a.pdf", "h1", 1, poll=0.01)
+    assert queue.status("a.pdf")["stages_done"] == 1
+    thread.join()
+    # Other content, and jobs not running, are not waited for
+    started = time.monotonic()
+    queue.wait("a.pdf", "other", 3)
+    queue.wait("dropped.pdf", "h2", 3)
+    queue.wait("a.pdf", "h1", 3, timeout=0.05, poll=0.01)
+    assert time.monotonic() - started < 1
@@ -0,0 +1,55 @@
+import time
+import asyncio
+from metrics import Registry
+from profiling import SlowRequestProfiler
+
+def test_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("reqs_total", "Requests.", ("name",))
+    latency = registry.histogram("latency_seconds", "Latency.", ("name",), buckets=(0.1, 1))
+    requests.inc(name='say "hi"')
+    latency.observe(0.05, name="a")
+    latency.observe(0.5, name="a")
+    lines = registry.render().splitlines()
+    assert 'reqs_total{name="say \\"hi\\""} 1' in lines
+    assert lines[lines.index("# TYPE latency_seconds histogram") + 1:][:5] == [
+        'latency_seconds_bucket{name="a",le="0.1"} 1',
+        'latency_seconds_bucket{name="a",le="1"} 2',
+        'latency_seconds_bucket{name="a",le="+Inf"} 2',
+        'latency_seconds_sum{name="a"} 0.55',
+        'latency_seconds_count{name="a"} 2',
+    ]
+
+def test_tool_calls_and_resources_are_instrumented(tmp_path, monkeypatch):
+    import server
+    from fastmcp import Client
+    from document_processor import DocumentProcessor
+    monkeypatch.setattr(server, "processor", DocumentProcessor(storage_dir=tmp_path))
+
+    async def scrape():
+        async with Client(server.mcp) as client:
+            await client.call_tool("identify_risks", {"document_id": "résumé.txt"})
+            return (await client.read_resource("system://metrics"))[0].text
+
+    text = asyncio.run(scrape())
+    assert 'idp_requests_total{kind="tool",name="identify_risks",outcome="error"}' in text
+    assert 'idp_request_duration_seconds_count{kind="tool",name="identify_risks"}' in text
+    assert 'idp_requests_in_flight{kind="resource",name="system://metrics"} 1' in text
+    assert 'idp_cache_hits_total{cache="results"}' in text
+    # Payload sizes are UTF-8 bytes, not characters
+    assert 'idp_request_bytes_total{kind="tool",name="identify_risks"} 12' in text.splitlines()
+
+def test_slow_request_profile_dumped_once(tmp_path):
+    profiler = SlowRequestProfiler(threshold=0.001, out_dir=tmp_path)
+    slow = lambda: sum(range(200000))
+    assert profiler.run("slow", slow) == sum(range(200000))
+    profiler.run("slow", slow)
+    assert len(profiler.dumps) == 1 and list(tmp_path.glob("*-slow-*.prof"))
+
+    def allocate():
+        time.sleep(0.01)
+        return [bytes(1000) for _ in range(1000)]
+
+    profiler = SlowRequestProfiler(threshold=0.001, mode="tracemalloc", out_dir=tmp_path)
+    profiler.run("alloc", allocate)
+    assert list(tmp_path.glob("*-alloc-*.tracemalloc"))
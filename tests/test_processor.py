@@ -20,3 +20,305 @@ def test_save_upload(tmp_path):
     path = processor.save_upload("test.txt", b"hello world")
     assert Path(path).exists()
     assert (tmp_path / "test.txt").read_text() == "hello world"
+
+def test_extraction_cache_reused_and_invalidated(tmp_path, monkeypatch):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    calls = []
+
+    def fake_extract(path, ext):
+        calls.append(path.name)
+        return {"text": Path(path).read_bytes().decode(), "page_offsets": [0]}
+
+    monkeypatch.setattr(processor, "_extract", fake_extract)
+    processor.save_upload("scan.pdf", b"first")
+    assert processor.extract_text("scan.pdf") == "first"
+    assert processor.extract_text("scan.pdf") == "first"
+    assert len(calls) == 1
+
+    # A fresh processor on the same storage is served from the disk tier.
+    other = DocumentProcessor(storage_dir=tmp_path)
+    monkeypatch.setattr(other, "_extract", fake_extract)
+    assert other.extract_text("scan.pdf") == "first"
+    assert len(calls) == 1
+
+    processor.save_upload("scan.pdf", b"second")
+    assert processor.extract_text("scan.pdf") == "second"
+    assert len(calls) == 2
+
+def test_identical_uploads_stored_once(tmp_path, monkeypatch):
+    import blob_store
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    calls = []
+    monkeypatch.setattr(processor, "_extract", lambda path, ext: calls.append(path.name) or {
+        "text": path.read_text(), "page_offsets": [0]})
+    processor.save_upload("a.pdf", b"same")
+    processor.save_upload("b.pdf", b"same")
+    assert processor.extract_text("a.pdf") == processor.extract_text("b.pdf") == "same"
+    assert calls == ["a.pdf"]
+    blobs = list((tmp_path / ".idp" / "blobs").glob("*/*"))
+    assert len(blobs) == 1
+
+    # Replacing one name keeps the shared content; replacing both drops it
+    processor.save_upload("a.pdf", b"other")
+    assert blobs[0].exists() and processor.extract_text("b.pdf") == "same"
+    processor.save_upload("b.pdf", b"other")
+    assert not blobs[0].exists()
+    assert len(list((tmp_path / ".idp" / "blobs").glob("*/*"))) == 1
+
+    # Blobs left behind by documents deleted from the volume are swept
+    (tmp_path / "a.pdf").unlink()
+    (tmp_path / "b.pdf").unlink()
+    monkeypatch.setattr(blob_store, "ORPHAN_GRACE_SECONDS", -1)
+    assert processor.collect_garbage() == 1
+    assert processor.list_documents() == []
+
+def test_editing_a_document_in_place_leaves_its_twins_and_blob_alone(tmp_path):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    processor.save_upload("a.txt", b"original")
+    processor.save_upload("b.txt", b"original")
+    with open(tmp_path / "a.txt", "r+b") as f:
+        f.write(b"EDITED!!")
+    blob, = (tmp_path / ".idp" / "blobs").glob("*/*")
+    assert (tmp_path / "b.txt").read_bytes() == blob.read_bytes() == b"original"
+    processor.save_upload("c.txt", b"original")
+    assert (tmp_path / "c.txt").read_bytes() == b"original"
+
+    # A blob altered outside the store is replaced rather than reused
+    blob.chmod(0o644)
+    blob.write_bytes(b"tampered")
+    (tmp_path / "d.tmp").write_bytes(b"original")
+    assert not processor.blobs.store(tmp_path / "d.tmp", blob.name, tmp_path / "d.txt")
+    assert (tmp_path / "d.txt").read_bytes() == blob.read_bytes() == b"original"
+
+def make_pdf(page_texts):
+    """
+    Build a minimal PDF with one line of Helvetica text per page ('' = no text
+    layer), or a list of (font size, text) lines.
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        lines = [(12, text)] if isinstance(text, str) else text
+        stream = " ".join(f"BT /F1 {size} Tf 72 {720 - 20 * i} Td ({line}) Tj ET"
+                          for i, (size, line) in enumerate(lines) if line)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+def test_pdf_parallel_extraction_matches_serial(tmp_path, monkeypatch):
+    import pdf_extraction
+    monkeypatch.setattr(pdf_extraction, "PDF_PARALLEL_MIN_PAGES", 2)
+    pages = [f"Page {i} text" for i in range(6)]
+    (tmp_path / "bundle.pdf").write_bytes(make_pdf(pages))
+
+    serial = DocumentProcessor(storage_dir=tmp_path / "serial", pdf_workers=1)
+    parallel = DocumentProcessor(storage_dir=tmp_path / "parallel", pdf_workers=2)
+    for p in (serial, parallel):
+        p.save_upload("bundle.pdf", (tmp_path / "bundle.pdf").read_bytes())
+
+    expected = serial.extract("bundle.pdf")
+    result = parallel.extract("bundle.pdf")
+    assert result == expected
+    assert result["text"] == "".join(p + "\n" for p in pages)
+    for offset, page in zip(result["page_offsets"], pages):
+        assert result["text"].startswith(page, offset)
+
+def test_layout_headings_from_pdf_and_docx(tmp_path):
+    import docx
+    processor = DocumentProcessor(storage_dir=tmp_path, pdf_workers=1)
+    processor.save_upload("form.pdf", make_pdf([
+        [(16, "Declaration"), (10, "Name: Bob"), (10, "Signed")],
+        [(10, "Notes"), (16, "Applicant"), (10, "Name: Jane")],
+    ]))
+    entry = processor.extract("form.pdf")
+    assert [entry["text"][h:].split("\n")[0] for h in entry["headings"]] == ["Declaration", "Applicant"]
+
+    document = docx.Document()
+    document.add_heading("Declaration", level=1)
+    document.add_paragraph("Name: Bob")
+    document.save(tmp_path / "form.docx")
+    entry = processor.extract("form.docx")
+    assert entry["headings"] == [0] and processor.headings("form.docx") == [0]
+
+def test_docx_tables_headers_and_footers_in_reading_order(tmp_path):
+    import docx
+    document = docx.Document()
+    document.add_heading("Loan Application", level=1)
+    table = document.add_table(rows=2, cols=2)
+    for row, (label, value) in enumerate([("Applicant Name", "Jane Doe"), ("Annual Income:", "$55,000")]):
+        table.cell(row, 0).text, table.cell(row, 1).text = label, value
+    ledger = document.add_table(rows=1, cols=3)
+    for column, value in enumerate(["01/02", "Deposit", "100.00"]):
+        ledger.cell(0, column).text = value
+    document.add_paragraph("Signature: J. Doe")
+    document.sections[0].header.paragraphs[0].text = "ACME Bank"
+    document.sections[0].footer.paragraphs[0].text = "Confidential"
+    document.save(tmp_path / "loan.docx")
+
+    entry = DocumentProcessor(storage_dir=tmp_path).extract("loan.docx")
+    assert entry["text"].split("\n") == [
+        "ACME Bank", "Loan Application", "Applicant Name: Jane Doe", "Annual Income: $55,000",
+        "01/02 | Deposit | 100.00", "Signature: J. Doe", "Confidential"]
+    assert entry["headings"] == [len("ACME Bank\n")]
+
+def test_ocr_only_scanned_pdf_pages(tmp_path, monkeypatch):
+    import ocr
+    seen = []
+
+    def fake_tesseract(image, options):
+        seen.append(image.size)
+        return "scanned text"
+
+    monkeypatch.setattr(ocr, "_tesseract", fake_tesseract)
+    processor = DocumentProcessor(storage_dir=tmp_path, pdf_workers=1, ocr_workers=1,
+                                  ocr_options=ocr.OCROptions(dpi=36))
+    processor.save_upload("mixed.pdf", make_pdf(["Digital page", ""]))
+
+    result = processor.extract("mixed.pdf")
+    assert result["text"] == "Digital page\nscanned text\n"
+    assert result["ocr_pages"] == [1]
+    # 612x792pt rasterized at 36 dpi
+    assert seen == [(306, 396)]
+
+def test_ocr_multi_frame_tiff(tmp_path, monkeypatch):
+    import ocr
+    from PIL import Image
+    monkeypatch.setattr(ocr, "_tesseract", lambda image, options: f"frame {image.size[0]}")
+    frames = [Image.new("L", (10 + i, 10)) for i in range(3)]
+    frames[0].save(tmp_path / "scan.tiff", save_all=True, append_images=frames[1:])
+
+    processor = DocumentProcessor(storage_dir=tmp_path, ocr_workers=1)
+    result = processor.extract("scan.tiff")
+    assert result["text"] == "frame 10\nframe 11\nframe 12\n"
+    assert result["page_offsets"] == [0, 9, 18]
+
+    # A failed frame is a placeholder, like a failed PDF page, and is retried next time
+    def tesseract(image, options):
+        if image.size[0] == 11:
+            raise ocr.OCRError("timed out after 60s")
+        return f"frame {image.size[0]}"
+    monkeypatch.setattr(ocr, "_tesseract", tesseract)
+    processor.save_upload("scan2.tiff", (tmp_path / "scan.tiff").read_bytes() + b"\0")
+    result = processor.extract("scan2.tiff")
+    assert result["text"] == "frame 10\n[OCR failed on frame 2: timed out after 60s]\nframe 12\n"
+    assert result["ocr_errors"] == 1
+    assert processor.catalog.get("scan2.tiff")["extraction_status"] == "partial"
+
+def test_iter_text_streams_pages_like_extract(tmp_path, monkeypatch):
+    import src.document_processor as document_processor
+    monkeypatch.setattr(document_processor, "STREAM_MIN_BYTES", 0)
+    processor = DocumentProcessor(storage_dir=tmp_path, pdf_workers=1)
+    pages = [f"Page {i} text" for i in range(4)]
+    processor.save_upload("big.pdf", make_pdf(pages))
+
+    streamed = list(processor.iter_text("big.pdf"))
+    # A stream read to the end caches the same entry extract builds
+    key = processor.cache.make_key(processor.content_hash("big.pdf"))
+    cached = processor.cache.get(key)
+    reference = DocumentProcessor(storage_dir=tmp_path / "ref", pdf_workers=1)
+    reference.save_upload("big.pdf", make_pdf(pages))
+    assert cached == reference.extract("big.pdf")
+    assert [offset for offset, _ in streamed] == cached["page_offsets"]
+    assert "".join(chunk for _, chunk in streamed) == cached["text"]
+    assert processor.catalog.get("big.pdf")["extraction_status"] == "extracted"
+    assert not list(processor.cache.cache_dir.glob(f"*/{key}.p*"))
+    # Served from the cache from now on
+    assert list(processor.iter_text("big.pdf")) == streamed
+
+def test_streamed_scans_ocr_each_page_once_in_batches(tmp_path, monkeypatch):
+    import ocr
+    import pdf_extraction
+    import src.document_processor as document_processor
+    monkeypatch.setattr(document_processor, "STREAM_MIN_BYTES", 0)
+    monkeypatch.setattr(ocr, "_tesseract", lambda image, options: "scanned text")
+    batches = []
+    run_ocr_jobs = pdf_extraction.run_ocr_jobs
+    monkeypatch.setattr(pdf_extraction, "run_ocr_jobs",
+                        lambda jobs, *args: batches.append([i for _, _, i in jobs]) or run_ocr_jobs(jobs, *args))
+    processor = DocumentProcessor(storage_dir=tmp_path, pdf_workers=1, ocr_workers=1,
+                                  ocr_options=ocr.OCROptions(dpi=36))
+    processor.save_upload("scan.pdf", make_pdf([""] * 10))
+
+    # Paging through the scan OCRs every page once, a window at a time
+    part = processor.read("scan.pdf", limit=20)
+    while part["next_offset"] is not None:
+        part = processor.read("scan.pdf", offset=part["next_offset"], limit=20)
+    assert batches == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert processor.extract("scan.pdf")["ocr_pages"] == list(range(10))
+    assert len(batches) == 3
+
+def test_ranged_reads_and_document_info(tmp_path, monkeypatch):
+    import src.document_processor as document_processor
+    monkeypatch.setattr(document_processor, "STREAM_MIN_BYTES", 0)
+    processor = DocumentProcessor(storage_dir=tmp_path, pdf_workers=1)
+    processor.save_upload("notes.txt", b"0123456789" * 5)
+    first = processor.read("notes.txt", limit=20)
+    assert first == {"offset": 0, "end": 20, "text": "01234567890123456789", "next_offset": 20}
+    assert processor.read("notes.txt", offset=40, limit=20)["next_offset"] is None
+    with pytest.raises(ValueError):
+        processor.read("notes.txt", offset=20, limit=0)
+
+    # Pages of a streamed PDF are read only as far as the slice reaches
+    processor.save_upload("big.pdf", make_pdf([f"Page {i}" for i in range(1, 6)]))
+    info = processor.info("big.pdf")
+    assert (info["page_count"], info["chars"], info["outline"]) == (5, None, [])
+    pages = processor.read("big.pdf", first_page=2, last_page=3)
+    assert (pages["text"], pages["pages"], pages["next_offset"]) == ("Page 2\nPage 3\n", [2, 3], None)
+    part = processor.read("big.pdf", first_page=2, limit=4)
+    assert (part["text"], part["offset"], part["next_offset"]) == ("Page", 7, 11)
+    rest = processor.read("big.pdf", offset=11, limit=100, last_page=3)
+    assert rest["text"] == " 2\nPage 3\n"
+    assert processor.cache.get(processor.cache.make_key(processor.content_hash("big.pdf"))) is None
+
+def test_document_info_does_not_extract(tmp_path, monkeypatch):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    processor.save_upload("big.docx", b"PK fake")
+    processor.save_upload("notes.txt", b"hello")
+    def extract(path, ext):
+        raise AssertionError("info extracted the document")
+    monkeypatch.setattr(processor, "_extract", extract)
+    info = processor.info("big.docx")
+    assert (info["size"], info["page_count"], info["chars"], info["extraction_status"]) == (7, None, None, "pending")
+    assert info["mime_type"].endswith("wordprocessingml.document")
+    assert (processor.info("notes.txt")["page_count"], processor.info("notes.txt")["chars"]) == (1, None)
+
+    # Once extracted, the cached extraction answers
+    monkeypatch.setattr(processor, "_extract", lambda path, ext: {"text": "Title\nbody", "page_offsets": [0],
+                                                                 "headings": [0]})
+    processor.extract("big.docx")
+    monkeypatch.setattr(processor, "_extract", extract)
+    info = processor.info("big.docx")
+    assert (info["page_count"], info["chars"], info["extraction_status"]) == (1, 10, "extracted")
+    assert info["outline"] == [{"title": "Title", "offset": 0, "page": 1}]
+
+def test_page_range_reads_of_a_scan_reuse_pages_read_before(tmp_path, monkeypatch):
+    import ocr
+    import src.document_processor as document_processor
+    monkeypatch.setattr(document_processor, "STREAM_MIN_BYTES", 0)
+    seen = []
+    monkeypatch.setattr(ocr, "_tesseract", lambda image, options: seen.append(1) or "scanned text")
+    processor = DocumentProcessor(storage_dir=tmp_path, pdf_workers=1, ocr_workers=1,
+                                  ocr_options=ocr.OCROptions(dpi=36))
+    processor.save_upload("scan.pdf", make_pdf([""] * 12))
+
+    first = processor.read("scan.pdf", first_page=5, last_page=5)
+    assert (first["pages"], first["offset"]) == ([5, 5], 4 * len("scanned text\n"))
+    assert len(seen) == 8
+    # Pages up to 8 are cached; only the window holding page 9 is OCR'd
+    assert processor.read("scan.pdf", first_page=9, last_page=9)["pages"] == [9, 9]
+    assert processor.read("scan.pdf", first_page=2, last_page=3)["text"] == "scanned text\n" * 2
+    assert len(seen) == 12
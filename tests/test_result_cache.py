@@ -0,0 +1,17 @@
+from result_cache import ResultCache
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    import result_cache
+    now = [0.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_entries=2, ttl=10)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 2}
@@ -0,0 +1,99 @@
+import re
+from pathlib import Path
+from src.config_loader import get_templates
+from rule_engine import CompiledTemplate, compile_template
+
+SAMPLE = (Path(__file__).resolve().parents[1] / "data" / "sample_loan.txt").read_text()
+
+def per_rule_loop(template, text):
+    extracted = {}
+    for rule in template.get('extraction_rules', []):
+        match = re.search(rule['pattern'], text, re.IGNORECASE)
+        if match:
+            val = match.group(1) if match.groups() else match.group(0)
+            extracted[rule['field']] = val.strip()
+    return extracted
+
+def test_matches_per_rule_loop_for_every_template():
+    filler = "Lorem ipsum dolor sit amet.\n" * 50
+    text = filler + SAMPLE + "\n\nCompany: Other Corp\nDate: 2024-01-01\n"
+    for template in get_templates():
+        values, offsets = CompiledTemplate(template).extract(text, restrict_to_sections=False)
+        assert values == per_rule_loop(template, text), template['template_id']
+        for field, (start, end) in offsets.items():
+            assert text[start:end] == values[field]
+
+def test_rules_limited_to_section_keyword_paragraphs():
+    template = {
+        "template_id": "t",
+        "sections": [{"id": "applicant", "keywords": ["Name"]}],
+        "extraction_rules": [{"field": "company", "pattern": "Company:\\s*(\\w+)"}],
+    }
+    compiled = CompiledTemplate(template)
+    text = "Company: Outside\n\nName: Jane\nCompany: Inside\n"
+    assert compiled.extract(text)[0] == {"company": "Inside"}
+    assert compiled.extract(text, restrict_to_sections=False)[0] == {"company": "Outside"}
+
+LOAN = {
+    "template_id": "loan",
+    "sections": [{"id": "applicant", "keywords": ["Name", "Address"]},
+                 {"id": "income", "keywords": ["Employer", "Annual Income"]},
+                 {"id": "declarations", "keywords": ["Declaration", "Witness"]}],
+    "extraction_rules": [{"field": "applicant_name", "pattern": "(?:Name|Applicant):\\s*([A-Za-z\\s]+)"},
+                         {"field": "employer", "pattern": "Employer:\\s*([A-Za-z\\s]+)"}],
+}
+
+def test_rules_run_inside_their_own_section():
+    compiled = CompiledTemplate(LOAN)
+    assert [rule.section for rule in compiled.rules] == ["applicant", "income"]
+    text = "Witness: Bob\nSpouse Name: Joe\nName: Jane Doe\nEmployer: Acme\n"
+    sections = compiled.sections(text)
+    assert list(zip(sections.starts, sections.ids)) == [(0, "declarations"), (30, "applicant"), (45, "income")]
+    # "Spouse Name" is no label, and the name stops where the income section starts
+    assert compiled.extract(text)[0] == {"applicant_name": "Jane Doe", "employer": "Acme"}
+
+    # With layout headings only the headings delimit sections
+    text = "Declaration\nName: Bob Witness\nApplicant\nName: Jane Doe\n"
+    headings = [0, text.index("Applicant")]
+    assert compiled.extract(text)[0]["applicant_name"].startswith("Bob Witness")
+    assert compiled.extract(text, headings=headings)[0] == {"applicant_name": "Jane Doe"}
+    for size in (5, 300):
+        assert compiled.extract_stream(chunked(text, size), headings=headings, window_chars=4096)[0] == \
+            {"applicant_name": "Jane Doe"}
+
+def test_compiled_once_per_version():
+    template = {"template_id": "t", "extraction_rules": []}
+    assert compile_template(template, "v1") is compile_template(template, "v1")
+    assert compile_template(template, "v2") is not compile_template(template, "v1")
+
+def chunked(text, size):
+    return [(i, text[i:i + size]) for i in range(0, len(text), size)]
+
+def test_stream_matches_whole_text_and_stops_early():
+    text = ("Lorem ipsum dolor sit amet.\n" * 50 + "\n\n") * 3 + SAMPLE + "\n\nCompany: Other Corp\n"
+    for template in get_templates():
+        compiled = CompiledTemplate(template)
+        for restrict in (True, False):
+            expected = compiled.extract(text, restrict)
+            for size in (7, 300):
+                streamed = compiled.extract_stream(chunked(text, size), restrict, window_chars=4096)
+                assert streamed == expected, (template['template_id'], restrict, size)
+
+    template = {"template_id": "t", "extraction_rules": [{"field": "name", "pattern": "Name:\\s*(\\w+)"}]}
+    chunks = iter(chunked("Name: Jane\n\n" + "filler\n\n" * 1000, 64))
+    assert CompiledTemplate(template).extract_stream(chunks)[0] == {"name": "Jane"}
+    assert next(chunks, None) is not None
+
+def test_top_level_alternation_falls_back_to_regex_search():
+    from rule_engine import _literal_labels
+    assert _literal_labels(r"Name|Applicant: (\w+)") is None
+    assert _literal_labels(r"(?:Foo)|Bar: (\w+)") is None
+    assert _literal_labels(r"(?:Name|Applicant):\s*(\w+)") == ["name", "applicant"]
+    assert _literal_labels(r"Total[|:]\s*(\d+)") == ["total"]
+    template = {"template_id": "t", "extraction_rules": [
+        {"field": "applicant", "pattern": r"Name|Applicant: (\w+)"},
+        {"field": "bar", "pattern": r"(?:Foo)|Bar: (\w+)"},
+    ]}
+    text = "Applicant: Jane\nBar: baz"
+    values, _ = CompiledTemplate(template).extract(text, restrict_to_sections=False)
+    assert values == per_rule_loop(template, text) == {"applicant": "Jane", "bar": "baz"}
@@ -0,0 +1,21 @@
+import schema_validation
+from schema_validation import annotate, get_validator, validate_many
+
+def test_reports_every_error():
+    data = annotate({"annual_income": "55,000", "loan_amount": "lots", "risks_identified": [1]}, "loan_output")
+    assert data["_validation"].startswith("failed: ")
+    assert [e["path"] for e in data["_validation_errors"]] == ["$", "$", "$.loan_amount", "$.risks_identified[0]"]
+    assert annotate({}, "no_such_schema") == {"_validation": "no_schema_found"}
+
+def test_partial_record_requires_only_its_own_fields():
+    summary = annotate({}, "loan_output", {"applicant_name": "Jane", "annual_income": "$55,000"},
+                       ["applicant_name", "annual_income", "loan_amount"])
+    assert summary == {"_validation": "passed"}
+
+def test_validator_built_once_and_shared_by_bulk_validation(monkeypatch):
+    first = get_validator("loan_output")
+    assert get_validator("loan_output") is first
+    monkeypatch.setattr(schema_validation, "_build", None)
+    results = validate_many([{"applicant_name": "A", "risk_score": 3}, {"risk_score": "high"}], "loan_output")
+    assert [r["_validation"] == "passed" for r in results] == [True, False]
+    assert len(results[1]["_validation_errors"]) == 2
@@ -0,0 +1,52 @@
+import json
+import pytest
+from src.document_processor import DocumentProcessor
+from search_index import rebuild
+
+DOCS = {
+    "loan_a.txt": "Applicant filed for bankruptcy in 2019.\nLate payment on the car loan.",
+    "loan_b.txt": "Loan paid in full. No late payments.",
+    "resume.txt": "Python developer with bankruptcy law experience.",
+}
+
+def make_store(tmp_path):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    for name, text in DOCS.items():
+        processor.save_upload(name, text.encode())
+        processor.extract(name)
+    return processor
+
+def names(results):
+    return sorted(r["document_id"] for r in results[0])
+
+def test_phrase_boolean_and_prefix_queries(tmp_path):
+    processor = make_store(tmp_path)
+    search = processor.search.search
+    assert names(search('"late payment"')) == ["loan_a.txt", "loan_b.txt"]
+    assert names(search("bankruptcy NOT python")) == ["loan_a.txt"]
+    assert names(search("loan AND bankrupt*")) == ["loan_a.txt"]
+    results, total = search("loan", limit=1)
+    assert total == 2 and len(results) == 1
+    assert "**" in results[0]["snippet"] and results[0]["page"] == 1
+    with pytest.raises(ValueError):
+        search('"unbalanced')
+
+def test_index_follows_reuploads_and_rebuilds(tmp_path):
+    processor = make_store(tmp_path)
+    processor.save_upload("loan_b.txt", b"Completely different text.")
+    assert names(processor.search.search("payments")) == ["loan_a.txt"]
+
+    (tmp_path / "dropped.txt").write_text("A late payment notice.")
+    (tmp_path / "resume.txt").unlink()
+    stats = rebuild(processor, workers=2)
+    assert stats == {"indexed": 2, "unchanged": 1, "failed": 0, "removed": 1}
+    assert names(processor.search.search("different OR notice")) == ["dropped.txt", "loan_b.txt"]
+    assert rebuild(processor, workers=1)["unchanged"] == 3
+
+def test_search_documents_tool(tmp_path, monkeypatch):
+    import asyncio
+    import src.server as server
+    monkeypatch.setattr(server, "processor", make_store(tmp_path))
+    data = json.loads(asyncio.run(server.search_documents.fn(query="bankruptcy")))
+    assert data["total"] == 2
+    assert asyncio.run(server.search_documents.fn(query="AND")).startswith("Error")
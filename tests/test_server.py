@@ -1,4 +1,8 @@
 import pytest
+import asyncio
+import time
+import base64
+import threading
 from src.server import list_templates, list_rubrics, list_checklists, identify_risks
 import json
 
@@ -27,14 +31,164 @@ def test_identify_risks_found(monkeypatch):
     import src.server as server
     
     class MockProcessor:
-        def extract_text(self, filename):
-            return "This document is blank and incomplete."
+        def content_hash(self, filename):
+            return "blank"
+
+        def iter_text(self, filename):
+            yield 0, "This document is blank and incomplete."
 
     monkeypatch.setattr(server, "processor", MockProcessor())
 
-    response = identify_risks.fn(document_id="fake_doc.txt", rubric_id="loan_risk_v1")
+    response = asyncio.run(identify_risks.fn(document_id="fake_doc.txt", rubric_id="loan_risk_v1"))
     data = json.loads(response)
     
     # We expect 'missing_info' risk because 'signature' is missing in mock text
     found_missing_info = any(r['id'] == 'missing_info' for r in data.get('risks', []))
     assert found_missing_info, "Should detect missing signature risk"
+
+def test_identify_risks_scores_rubric_indicators(monkeypatch):
+    import src.server as server
+
+    class MockProcessor:
+        def content_hash(self, filename):
+            return "bankruptcy"
+
+        def iter_text(self, filename):
+            yield 0, "Applicant filed for Bankruptcy in 2019 and has a late payment. Signature: J. Doe"
+
+    monkeypatch.setattr(server, "processor", MockProcessor())
+
+    data = json.loads(asyncio.run(identify_risks.fn(document_id="fake_doc.txt", rubric_id="loan_risk_v1")))
+    assert data["risks_identified"] == ["credit_history"]
+    assert data["criteria_hits"]["credit_history"] == 2
+    assert data["risk_score"] == 0.8
+    assert data["manual_review_required"] is True
+
+def test_results_memoized_until_document_or_config_changes(tmp_path, monkeypatch):
+    import src.server as server
+    from src.document_processor import DocumentProcessor
+    from src.result_cache import ResultCache
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    processor.save_upload("loan.txt", b"Notes: filed for bankruptcy")
+    monkeypatch.setattr(server, "processor", processor)
+    monkeypatch.setattr(server, "results", ResultCache())
+    calls = []
+    monkeypatch.setattr(server, "assess_risk_chunks", lambda *args: calls.append(args) or {"n": len(calls)})
+
+    def risks(**kwargs):
+        return asyncio.run(identify_risks.fn(document_id="loan.txt", **kwargs))
+
+    assert risks() == '{"n":1}'
+    assert risks(pretty=True) == '{\n  "n": 1\n}'
+    assert server.results.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    processor.save_upload("loan.txt", b"Notes: paid in full")
+    assert risks() == '{"n":2}'
+    # Identical content under another name shares the cached output
+    processor.save_upload("copy.txt", b"Notes: paid in full")
+    assert asyncio.run(identify_risks.fn(document_id="copy.txt")) == '{"n":2}'
+    monkeypatch.setattr(server, "config_versions", lambda kind, config_id: ("edited", None))
+    assert risks() == '{"n":3}'
+
+def test_validate_outputs_in_bulk():
+    from src.server import validate_outputs
+    report = json.loads(validate_outputs.fn(
+        outputs=[{"plaintiff": "A", "defendant": "B"}, {"plaintiff": 1}], schema_name="law_output"))
+    assert (report["passed"], report["failed"]) == (1, 1)
+    assert len(report["results"][1]["errors"]) == 2
+    assert validate_outputs.fn(outputs=[{}], schema_name="nope").startswith("Error")
+
+def test_server_serves_while_prewarming_and_reports_startup(monkeypatch):
+    import server
+    serving = threading.Event()
+    calls = []
+    monkeypatch.setattr(server, "PREWARM", True)
+    monkeypatch.setattr(server, "compile_configs", lambda: serving.wait(5) and calls.append("configs"))
+    monkeypatch.setattr(server, "shutdown_workers", lambda: calls.append("stop"))
+
+    async def serve():
+        async with server.lifespan(server.mcp):
+            # Pre-warming blocks on this, so serving must not wait for it
+            serving.set()
+            for _ in range(500):
+                if json.loads(server.startup_report.fn())["prewarm"] == "done":
+                    break
+                await asyncio.sleep(0.01)
+
+    asyncio.run(serve())
+    assert calls == ["configs", "stop"]
+    report = json.loads(server.startup_report.fn())
+    assert {"fastmcp", "server", "pdf_extraction", "docx_extraction", "ocr"} <= set(report["import_seconds"])
+
+def test_uploads_are_processed_in_background_and_serve_precomputed_results(tmp_path, monkeypatch):
+    import src.server as server
+    from src.document_processor import DocumentProcessor
+    from src.result_cache import ResultCache
+    from src.ingestion import IngestQueue, IngestWorkers
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    monkeypatch.setattr(server, "processor", processor)
+    monkeypatch.setattr(server, "results", ResultCache())
+    monkeypatch.setattr(server, "ingest", IngestQueue(tmp_path / "ingest.sqlite3"))
+    pipeline = IngestWorkers(server.ingest, server.stages)
+    monkeypatch.setattr(server, "pipeline", pipeline)
+    pipeline.start(1)
+    try:
+        content = base64.b64encode(b"Applicant filed for Bankruptcy. Signature: J. Doe").decode()
+        response = asyncio.run(server.upload_document.fn(filename="loan.txt", file_content_base64=content))
+        assert "queued for processing" in response
+        for _ in range(500):
+            status = json.loads(asyncio.run(server.document_status.fn(document_id="loan.txt")))
+            if status["status"] == "done":
+                break
+            time.sleep(0.01)
+    finally:
+        pipeline.stop()
+    assert status["stages_done"] == 3 and status["extraction_status"] == "extracted"
+    assert json.loads(asyncio.run(server.search_documents.fn(query="bankruptcy")))["total"] == 1
+
+    # A fresh process finds the outputs the pipeline stored
+    monkeypatch.setattr(server, "results", ResultCache())
+    monkeypatch.setattr(server, "assess_risk_chunks", lambda *args: {"recomputed": True})
+    data = json.loads(asyncio.run(identify_risks.fn(document_id="loan.txt")))
+    assert data["document_id"] == "loan.txt" and "credit_history" in data["risks_identified"]
+    assert json.loads(asyncio.run(server.document_status.fn()))["jobs"]["done"] == 1
+    assert asyncio.run(server.document_status.fn(document_id="nope.txt")).startswith("Error")
+
+def test_failed_ocr_requeues_ingestion_and_tools_wait_for_running_jobs(tmp_path, monkeypatch):
+    import ocr
+    import src.server as server
+    from test_processor import make_pdf
+    from src.document_processor import DocumentProcessor
+    from src.result_cache import ResultCache
+    # The classes the server's stages were written against, so IngestError is caught
+    IngestQueue, IngestWorkers = server.IngestQueue, server.IngestWorkers
+    def broken_tesseract(image, options):
+        raise ocr.OCRError("tesseract crashed")
+    monkeypatch.setattr(ocr, "_tesseract", broken_tesseract)
+    processor = DocumentProcessor(storage_dir=tmp_path, ocr_options=ocr.OCROptions(dpi=36))
+    monkeypatch.setattr(server, "processor", processor)
+    monkeypatch.setattr(server, "results", ResultCache())
+    monkeypatch.setattr(server, "ingest", IngestQueue(tmp_path / "ingest.sqlite3"))
+    processor.save_upload("scan.pdf", make_pdf(["", "typed page"]))
+    server.ingest.enqueue("scan.pdf", processor.content_hash("scan.pdf"))
+    assert IngestWorkers(server.ingest, server.stages).run_once()
+    job = server.ingest.status("scan.pdf")
+    assert (job["status"], job["attempts"], job["error"]) == ("queued", 1, "extract: OCR failed on 1 page(s)")
+
+    # A tool called while another worker runs the job takes the job's output
+    processor.save_upload("loan.txt", b"Applicant filed for Bankruptcy.")
+    key, _ = server.risks_call("loan.txt", server.INGEST_RUBRIC)
+    server.ingest.enqueue("loan.txt", key[2], priority=1)
+    assert server.ingest.claim("elsewhere")["name"] == "loan.txt"
+    server.ingest.progress("loan.txt", key[2], "identify_risks", 2)
+    def worker():
+        time.sleep(0.1)
+        server.ingest.put_result(key[2], key, '{"document_id":"loan.txt","from":"job"}')
+        server.ingest.finish("loan.txt", key[2], 3)
+    thread = threading.Thread(target=worker)
+    thread.start()
+    monkeypatch.setattr(server, "assess_risk_chunks", lambda *args: {"recomputed": True})
+    try:
+        assert json.loads(asyncio.run(identify_risks.fn(document_id="loan.txt")))["from"] == "job"
+    finally:
+        thread.join()
@@ -0,0 +1,58 @@
+import hashlib
+import pytest
+from src.document_processor import DocumentProcessor
+from uploads import UploadManager, UploadError
+
+def test_chunked_upload_resume_and_commit(tmp_path):
+    processor = DocumentProcessor(storage_dir=tmp_path)
+    uploads = UploadManager(processor)
+    content = b"0123456789" * 100
+
+    upload_id = uploads.begin("big.txt")
+    assert uploads.append(upload_id, 0, content[:400]) == 400
+    with pytest.raises(UploadError):
+        uploads.append(upload_id, 600, content[600:])
+    # Resume from whatever the server reports
+    offset = uploads.offset(upload_id)
+    assert uploads.append(upload_id, offset, content[offset:]) == len(content)
+    assert "big.txt" not in processor.list_documents()
+
+    with pytest.raises(UploadError):
+        uploads.commit(upload_id, hashlib.sha256(b"other").hexdigest())
+    path = uploads.commit(upload_id, hashlib.sha256(content).hexdigest())
+    assert (tmp_path / "big.txt").read_bytes() == content
+    assert path == str(tmp_path / "big.txt")
+    assert list((tmp_path / ".idp" / "uploads").iterdir()) == []
+
+def test_upload_shared_by_server_processes(tmp_path):
+    # Managers on the same storage stand in for two server processes
+    first = UploadManager(DocumentProcessor(storage_dir=tmp_path))
+    second = UploadManager(DocumentProcessor(storage_dir=tmp_path))
+    upload_id = first.begin("doc.txt")
+    assert second.append(upload_id, 0, b"hello") == 5
+    first.commit(upload_id, hashlib.sha256(b"hello").hexdigest())
+    with pytest.raises(UploadError):
+        second.append(upload_id, 5, b" again")
+    assert (tmp_path / "doc.txt").read_bytes() == b"hello"
+
+def test_upload_rejects_path_names(tmp_path):
+    uploads = UploadManager(DocumentProcessor(storage_dir=tmp_path))
+    with pytest.raises(ValueError):
+        uploads.begin("../escape.txt")
+
+def test_expired_uploads_and_stray_temp_files_are_swept(tmp_path):
+    import os
+    import time
+    uploads = UploadManager(DocumentProcessor(storage_dir=tmp_path))
+    stale = uploads.begin("old.txt")
+    upload_dir = tmp_path / ".idp" / "uploads"
+    # Left behind by a crashed upload and a crashed blob store write
+    for name in ["crashed.tmp", "crashed.link", f"{stale}.part"]:
+        (upload_dir / name).touch()
+    (upload_dir / "recent.tmp").touch()
+    day_ago = time.time() - 2 * 24 * 3600
+    for name in ["crashed.tmp", "crashed.link", f"{stale}.part", f"{stale}.json"]:
+        os.utime(upload_dir / name, (day_ago, day_ago))
+    uploads.begin("new.txt")
+    left = {p.name for p in upload_dir.iterdir()}
+    assert "recent.tmp" in left and not {"crashed.tmp", "crashed.link", f"{stale}.part"} & left
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+import pytest
+from workers import ToolLimiter, ServerBusy, offloaded
+
+def test_tool_limiter_rejects_beyond_queue():
+    async def scenario():
+        limiter = ToolLimiter("slow_tool", concurrency=1, queue_limit=1)
+        release = asyncio.Event()
+
+        async def call():
+            async with limiter:
+                await release.wait()
+
+        running = asyncio.create_task(call())
+        queued = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        assert limiter.running == 1 and limiter.waiting == 1
+        with pytest.raises(ServerBusy):
+            async with limiter:
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        assert limiter.running == 0 and limiter.waiting == 0
+
+    asyncio.run(scenario())
+
+def test_offloaded_handler_runs_off_the_event_loop_thread():
+    @offloaded
+    def blocking_tool(value: int) -> str:
+        """Doc."""
+        return f"{value} on {threading.current_thread().name}"
+
+    assert blocking_tool.__doc__ == "Doc."
+    result = asyncio.run(blocking_tool(3))
+    assert result.startswith("3 on tool")